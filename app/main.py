@@ -1,19 +1,36 @@
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
 import uvicorn
 import os
+from contextlib import asynccontextmanager
 
 from app.user.user_router import user
 from app.review.review_router import router as review_router  # ✅ 추가
 from app.config import PORT
+from st_app.rag.warmup import is_ready, start_warmup, warmup_enabled, warmup_status
 
-app = FastAPI()
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # RAG_WARMUP=1 이면 검색기/LLM 클라이언트를 백그라운드에서 미리 구축
+    if warmup_enabled():
+        start_warmup()
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 
 @app.get("/")
 async def read_root():
     return {"status": "running"}
 
 
+@app.get("/ready")
+async def read_ready():
+    # warm-up이 끝나기 전에는 503 (로드밸런서 readiness probe용)
+    return JSONResponse(warmup_status(), status_code=200 if is_ready() else 503)
+
+
 static_path = os.path.join(os.path.dirname(__file__), "static")
 app.mount("/static", StaticFiles(directory=static_path), name="static")
 
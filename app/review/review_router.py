@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import Optional
+from datetime import date
+from pydantic import BaseModel, ConfigDict, model_validator
+from typing import List, Optional
 
 # MongoDB 연결은 실제 사용 시점에 import하도록 변경
 # from database.mongodb_connection import mongo_db
@@ -55,9 +56,30 @@ def preprocess_reviews(site_name: str):
         raise HTTPException(status_code=500, detail=f"MongoDB connection error: {str(e)}")
 
 
+class ReviewFilterModel(BaseModel):
+    """검색 필터 (st_app.rag.store.ReviewFilter와 같은 필드, 모르는 키는 422)"""
+
+    model_config = ConfigDict(extra="forbid")
+
+    sites: Optional[List[str]] = None
+    min_score: Optional[float] = None
+    max_score: Optional[float] = None
+    date_from: Optional[date] = None
+    date_to: Optional[date] = None
+
+    @model_validator(mode="after")
+    def _check_ranges(self) -> "ReviewFilterModel":
+        if self.min_score is not None and self.max_score is not None and self.min_score > self.max_score:
+            raise ValueError("min_score must be <= max_score")
+        if self.date_from is not None and self.date_to is not None and self.date_from > self.date_to:
+            raise ValueError("date_from must be <= date_to")
+        return self
+
+
 class RAGQuery(BaseModel):
     question: str
     k: Optional[int] = 4
+    filters: Optional[ReviewFilterModel] = None
 
 
 @router.post("/rag")
@@ -72,6 +94,11 @@ def answer_with_rag(payload: RAGQuery):
         "messages": [{"role": "user", "content": payload.question}],
         "k": payload.k or 4,
     }
+    if payload.filters:
+        # 날짜는 ReviewFilter가 비교하는 "YYYY-MM-DD" 문자열로
+        filters = payload.filters.model_dump(mode="json", exclude_none=True)
+        if filters:
+            state["filters"] = filters
     out = rag_review_node(state)
 
     # Extract assistant message and citations
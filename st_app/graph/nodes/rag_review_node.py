@@ -3,9 +3,11 @@ from __future__ import annotations
 from typing import Any, Dict, List
 import traceback
 
-from st_app.rag.retriever import get_retriever, get_faiss_retriever
+from st_app.rag.cache import cached_retriever
+from st_app.rag.retriever import get_dense_retriever, get_sparse_retriever
 from st_app.rag.llm import get_llm
 from st_app.rag.prompt import build_review_prompt
+from st_app.rag.upstage_client import EmbeddingAPIError
 
 
 def _get_last_user_message(messages: List[Dict[str, Any]]) -> str:
@@ -15,12 +17,41 @@ def _get_last_user_message(messages: List[Dict[str, Any]]) -> str:
     return ""
 
 
+_SITE_KEYWORDS = {
+    "알라딘": "aladin",
+    "aladin": "aladin",
+    "교보": "kyobo",
+    "kyobo": "kyobo",
+    "예스24": "yes24",
+    "yes24": "yes24",
+}
+_LOW_SCORE_KEYWORDS = ["평점 낮은", "낮은 평점", "별점 낮은", "낮은 별점", "혹평", "악평"]
+_HIGH_SCORE_KEYWORDS = ["평점 높은", "높은 평점", "별점 높은", "높은 별점", "호평"]
+
+
+def _infer_filters(question: str, state: Dict[str, Any]) -> Dict[str, Any]:
+    """state["filters"]와 질문 속 사이트/평점 키워드로 검색 필터 구성"""
+    filters: Dict[str, Any] = dict(state.get("filters") or {})
+    q = question.lower()
+    sites = sorted({site for kw, site in _SITE_KEYWORDS.items() if kw in q})
+    if sites:
+        filters.setdefault("sites", sites)
+    if any(kw in q for kw in _LOW_SCORE_KEYWORDS):
+        filters.setdefault("max_score", 6.0)
+    elif any(kw in q for kw in _HIGH_SCORE_KEYWORDS):
+        filters.setdefault("min_score", 8.0)
+    return filters
+
+
 def _format_docs(docs: List[Any], max_chars: int = 1400) -> str:
     chunks = []
     for i, d in enumerate(docs, 1):
         page = getattr(d, "page_content", str(d))
         meta = getattr(d, "metadata", {}) or {}
         src = meta.get("source") or meta.get("file") or meta.get("path") or "unknown"
+        dup = int(meta.get("dup_count") or 1)
+        if dup > 1:
+            src = f"{src} (유사 리뷰 {dup}건)"
         chunks.append(f"[DOC {i}]\nSOURCE: {src}\nCONTENT: {page}\n")
     context = "\n\n".join(chunks)
     if len(context) > max_chars:
@@ -37,6 +68,14 @@ def _extract_citations(docs: List[Any]) -> List[Dict[str, Any]]:
     return cites
 
 
+def _search(retriever: Any, question: str, k: int, filters: Dict[str, Any]) -> List[Any]:
+    docs: List[Any] = retriever.get_relevant_documents(question, k=k, filters=filters or None)
+    if not docs and filters:
+        # 필터 조건에 맞는 리뷰가 없으면 전체에서 다시 검색
+        docs = retriever.get_relevant_documents(question, k=k)
+    return docs
+
+
 def rag_review_node(state: Dict[str, Any]) -> Dict[str, Any]:
     try:
         messages: List[Dict[str, Any]] = state.get("messages", [])
@@ -46,16 +85,24 @@ def rag_review_node(state: Dict[str, Any]) -> Dict[str, Any]:
 
         k: int = int(state.get("k", 4))
 
-        # 우선 API 임베딩 사용, 실패 시 TF-IDF 폴백
+        # 우선 API 임베딩 사용 (faiss가 없으면 NumPy 전수 검색), 실패 시 희소 검색(BM25/TF-IDF) 폴백
         try:
-            retriever = get_faiss_retriever(use_api=True)
+            retriever = get_dense_retriever(use_api=True)
             print("API 임베딩 사용")
         except Exception as e:
-            print(f"API 임베딩 실패, TF-IDF 폴백: {e}")
-            retriever = get_retriever()
+            print(f"API 임베딩 실패, 희소 검색 폴백: {e}")
+            retriever = get_sparse_retriever()
         llm = get_llm()
+        # 같은 인덱스 버전에서 같은 질의/k/필터는 검색 결과를 재사용
+        retriever = cached_retriever(retriever)
 
-        docs: List[Any] = retriever.get_relevant_documents(question)[:k]
+        filters = _infer_filters(question, state)
+        try:
+            docs = _search(retriever, question, k, filters)
+        except EmbeddingAPIError as e:
+            # 질의 임베딩이 재시도 후에도 실패하면(엄격 모드) 오류 대신 희소 검색 결과로 답변
+            print(f"질의 임베딩 실패, 희소 검색 폴백: {e}")
+            docs = _search(cached_retriever(get_sparse_retriever()), question, k, filters)
         context = _format_docs(docs)
         citations = _extract_citations(docs)
 
@@ -15,6 +15,7 @@ from st_app.graph.nodes.rag_review_node import rag_review_node
 class GraphState(TypedDict, total=False):
     messages: Annotated[List[Dict[str, Any]], operator.add]
     k: int
+    filters: Dict[str, Any]
     last_route: str
     citations: Annotated[List[Dict[str, Any]], operator.add]
     error: Dict[str, Any]
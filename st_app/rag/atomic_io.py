@@ -0,0 +1,103 @@
+"""여러 프로세스가 같은 인덱스 디렉토리를 쓰는 경우를 위한 파일 도구.
+
+- write_files: 파일마다 고유한 임시 파일(mkstemp)에 다 쓴 뒤 순서대로 os.replace
+  (고정된 `<name>.tmp`를 쓰면 동시에 저장하는 워커끼리 서로의 임시 파일을 덮어씀)
+- temp_file: mkstemp는 0600으로 만들므로 일반 파일처럼 0666 & ~umask로 권한을 맞춤
+  (빌드한 사용자와 서버 사용자가 달라도 게시된 인덱스를 읽을 수 있도록)
+- dir_lock: `<dir>/.lock`에 대한 fcntl.flock 배타 잠금. 같은 스레드 안에서는 다시 잡아도 막히지 않음
+  (fcntl이 없는 플랫폼에서는 프로세스 간 잠금 없이 진행)
+"""
+from __future__ import annotations
+
+import json
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import IO, Any, Callable, Dict, Iterator, List, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+
+Writer = Callable[[str], None]
+
+# 프로세스 umask (조회하려면 잠시 바꿔야 하므로 시작할 때 한 번만 읽음)
+_UMASK = os.umask(0)
+os.umask(_UMASK)
+
+
+def temp_file(directory: str, prefix: str = "", suffix: str = ".tmp") -> Tuple[int, str]:
+    """directory 안에 고유한 임시 파일 생성 (fd, 경로). 권한은 open()으로 만든 파일과 같게 0666 & ~umask"""
+    fd, path = tempfile.mkstemp(dir=directory, prefix=prefix, suffix=suffix)
+    try:
+        os.fchmod(fd, 0o666 & ~_UMASK)
+    except BaseException:
+        os.close(fd)
+        os.remove(path)
+        raise
+    return fd, path
+
+
+def write_json(data: Dict[str, Any]) -> Writer:
+    def write(tmp_path: str) -> None:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+
+    return write
+
+
+def write_binary(write_fn: Callable[[IO[bytes]], Any]) -> Writer:
+    """파일 객체에 쓰는 함수를 Writer로 (np.save/savez/save_npz는 경로를 주면 확장자를 붙이므로)"""
+    def write(tmp_path: str) -> None:
+        with open(tmp_path, "wb") as f:
+            write_fn(f)
+
+    return write
+
+
+def write_files(files: List[Tuple[str, Writer]]) -> None:
+    """(최종 경로, 임시 경로에 쓰는 함수) 목록을 모두 쓴 뒤 목록 순서대로 교체 (마지막 파일을 메타로)"""
+    written: List[Tuple[str, str]] = []
+    try:
+        for path, write in files:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = temp_file(directory, prefix=f".{os.path.basename(path)}.")
+            os.close(fd)
+            written.append((tmp_path, path))
+            write(tmp_path)
+        for tmp_path, path in written:
+            os.replace(tmp_path, path)
+    finally:
+        for tmp_path, _ in written:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+
+_held = threading.local()
+
+
+@contextmanager
+def dir_lock(directory: str) -> Iterator[None]:
+    """디렉토리 단위 배타 잠금 (구축/저장하는 동안 다른 프로세스는 기다렸다가 결과를 다시 확인)"""
+    key = os.path.abspath(directory)
+    held = getattr(_held, "dirs", None)
+    if held is None:
+        held = _held.dirs = set()
+    if key in held or fcntl is None:
+        yield
+        return
+    os.makedirs(key, exist_ok=True)
+    with open(os.path.join(key, ".lock"), "a") as f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        held.add(key)
+        try:
+            yield
+        finally:
+            held.discard(key)
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
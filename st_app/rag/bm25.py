@@ -0,0 +1,226 @@
+from __future__ import annotations
+
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from st_app.rag.store import (
+    DocumentStore,
+    RetrievedDocument,
+    ReviewFilter,
+    as_document_store,
+    top_k_indices,
+)
+
+
+_NON_WORD = re.compile(r"[^0-9a-z가-힣ㄱ-ㅎㅏ-ㅣ]+")
+
+
+def char_ngrams(text: str, n: int = 2) -> List[str]:
+    """어절 단위 문자 n-gram 토크나이저.
+
+    한국어는 조사/어미가 붙어 어절 형태가 자주 바뀌므로('소설이', '소설을')
+    형태소 분석기 없이도 어간이 겹치도록 어절 내부 n-gram을 사용합니다.
+    n보다 짧은 어절은 그대로 토큰으로 씁니다.
+    """
+    tokens: List[str] = []
+    for word in _NON_WORD.sub(" ", text.lower()).split():
+        if len(word) <= n:
+            tokens.append(word)
+        else:
+            tokens.extend(word[i : i + n] for i in range(len(word) - n + 1))
+    return tokens
+
+
+@dataclass(frozen=True)
+class _Postings:
+    """한 시점의 저장소와 postings. 교체는 속성 하나 대입으로 하므로 검색은 항상 일관된 묶음을 봄"""
+
+    store: DocumentStore
+    vocab: Dict[str, int]
+    offsets: np.ndarray
+    docs: np.ndarray
+    weights: np.ndarray
+    max_weight: np.ndarray
+
+    def with_store(self, store: DocumentStore) -> "_Postings":
+        # 삭제(묘비)만 바뀐 경우: 문서 위치가 같으므로 postings는 그대로 재사용
+        return _Postings(store, self.vocab, self.offsets, self.docs, self.weights, self.max_weight)
+
+
+class BM25Retriever:
+    """역색인(postings) 기반 BM25 검색기.
+
+    - 용어별 postings: 문서 id(오름차순)와 미리 계산한 BM25 가중치(impact)
+    - 질의 시 용어별 최대 가중치(상한)를 이용한 MaxScore 방식 조기 종료:
+      남은 용어 상한 합이 현재 k번째 점수보다 작아지면 새 문서를 더 보지 않고
+      기존 후보만 갱신하며, 가망 없는 후보는 그때그때 제외합니다.
+    """
+
+    def __init__(
+        self,
+        texts: "List[str] | DocumentStore",
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+        ngram: int = 2,
+    ):
+        self._k1 = k1
+        self._b = b
+        self._ngram = ngram
+        # 문서 추가/삭제마다 증가 (결과 캐시 무효화용)
+        self.index_version = 0
+        # 쓰는 쪽(추가/삭제)끼리만 직렬화. 검색은 잠금 없이 self._index를 한 번 읽어 끝까지 사용
+        self._write_lock = threading.Lock()
+        self._index = self._build(as_document_store(texts, metadatas))
+
+    def _build(self, store: DocumentStore) -> _Postings:
+        vocab: Dict[str, int] = {}
+        term_ids: List[int] = []
+        doc_ids: List[int] = []
+        tfs: List[int] = []
+        doc_len = np.zeros(len(store), dtype=np.float32)
+
+        for doc_id, text in enumerate(store.iter_texts()):
+            counts = Counter(char_ngrams(text, self._ngram))
+            doc_len[doc_id] = sum(counts.values())
+            for term, tf in counts.items():
+                term_ids.append(vocab.setdefault(term, len(vocab)))
+                doc_ids.append(doc_id)
+                tfs.append(tf)
+
+        n_docs = len(store)
+        t = np.asarray(term_ids, dtype=np.int64)
+        d = np.asarray(doc_ids, dtype=np.int32)
+        tf = np.asarray(tfs, dtype=np.float32)
+
+        # 용어 → 문서 순으로 정렬해 CSR 형태의 postings 구성
+        order = np.lexsort((d, t))
+        t, d, tf = t[order], d[order], tf[order]
+        df = np.bincount(t, minlength=len(vocab)).astype(np.float32)
+        offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+        np.cumsum(df.astype(np.int64), out=offsets[1:])
+
+        avgdl = float(doc_len.mean()) if n_docs else 0.0
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        norm = self._k1 * (1.0 - self._b + self._b * doc_len[d] / (avgdl or 1.0))
+        impacts = idf[t] * tf * (self._k1 + 1.0) / (tf + norm)
+
+        weights = impacts.astype(np.float32)
+        max_weight = np.maximum.reduceat(weights, offsets[:-1]) if len(vocab) else np.zeros(0, dtype=np.float32)
+        return _Postings(store, vocab, offsets, d, weights, max_weight)
+
+    @property
+    def _store(self) -> DocumentStore:
+        return self._index.store
+
+    def __len__(self) -> int:
+        return self._index.store.num_alive
+
+    def add_documents(
+        self,
+        texts: "List[str] | DocumentStore",
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ) -> List[int]:
+        """문서 추가 (idf/평균 길이가 바뀌므로 postings를 다시 구성). 추가된 review id 반환"""
+        with self._write_lock:
+            current = self._index
+            store, positions = current.store.add(as_document_store(texts, metadatas))
+            if len(store) != len(current.store):
+                self._index = self._build(store)
+            else:
+                self._index = current.with_store(store)
+            if len(positions):
+                self.index_version += 1
+        return [int(i) for i in store.review_ids[positions]]
+
+    def remove_documents(self, review_ids: List[int]) -> int:
+        """review id로 문서 삭제 (postings는 두고 검색 시 마스크로 제외). 삭제된 문서 수 반환"""
+        with self._write_lock:
+            store, positions = self._index.store.remove(review_ids)
+            self._index = self._index.with_store(store)
+            if len(positions):
+                self.index_version += 1
+        return len(positions)
+
+    def _query_terms(self, index: _Postings, query: str) -> List[Tuple[int, float]]:
+        """(용어 id, 질의 내 빈도) 목록. 사전에 없는 용어는 제외."""
+        counts = Counter(char_ngrams(query, self._ngram))
+        return [(index.vocab[t], float(c)) for t, c in counts.items() if t in index.vocab]
+
+    @staticmethod
+    def _postings(index: _Postings, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        start, end = index.offsets[term_id], index.offsets[term_id + 1]
+        return index.docs[start:end], index.weights[start:end]
+
+    def _score(
+        self, index: _Postings, query: str, k: Optional[int], mask: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """(후보 문서 id, 점수) 반환. k가 있으면 MaxScore로 후보를 줄임.
+
+        mask가 있으면 postings를 읽을 때 바로 걸러내므로 필터 밖 문서는 점수 계산도 하지 않습니다.
+        """
+        terms = self._query_terms(index, query)
+        if not terms:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        # 상한이 큰 용어부터 처리해야 임계값이 빨리 올라감
+        terms.sort(key=lambda x: index.max_weight[x[0]] * x[1], reverse=True)
+        upper = [float(index.max_weight[tid]) * qtf for tid, qtf in terms]
+        remaining = float(sum(upper))
+
+        acc = np.zeros(len(index.store), dtype=np.float32)
+        cand = np.empty(0, dtype=np.int32)
+        pruning = False
+        for (tid, qtf), ub in zip(terms, upper):
+            docs, weights = self._postings(index, tid)
+            if mask is not None:
+                keep = mask[docs]
+                docs, weights = docs[keep], weights[keep]
+            remaining -= ub
+            if pruning:
+                # 기존 후보 중 이 용어를 가진 문서만 점수 갱신
+                pos = np.searchsorted(docs, cand)
+                pos_ok = pos < len(docs)
+                hit = np.zeros(len(cand), dtype=bool)
+                hit[pos_ok] = docs[pos[pos_ok]] == cand[pos_ok]
+                acc[cand[hit]] += weights[pos[hit]] * qtf
+            else:
+                acc[docs] += weights * qtf
+                cand = np.union1d(cand, docs)
+
+            if k is not None and 0 < k <= len(cand):
+                theta = np.partition(acc[cand], len(cand) - k)[len(cand) - k]
+                if not pruning and theta >= remaining:
+                    # 남은 용어만으로는 새 문서가 top-k에 들 수 없음
+                    pruning = True
+                if pruning:
+                    cand = cand[acc[cand] + remaining >= theta]
+
+        return cand.astype(np.int64), acc[cand]
+
+    def get_relevant_documents(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filters: "ReviewFilter | Dict[str, Any] | None" = None,
+    ) -> List[RetrievedDocument]:
+        """관련 문서 검색 (질의 용어가 하나라도 있는 문서만 점수순 반환)"""
+        index = self._index
+        if not query or not len(index.store):
+            return []
+        cand, scores = self._score(index, query, k, index.store.filter_mask(filters))
+        top = top_k_indices(scores, k)
+        return [RetrievedDocument.from_store(index.store, int(cand[i]), float(scores[i])) for i in top]
+
+    def get_relevant_documents_batch(
+        self,
+        queries: List[str],
+        k: Optional[int] = None,
+        filters: "ReviewFilter | Dict[str, Any] | None" = None,
+    ) -> List[List[RetrievedDocument]]:
+        return [self.get_relevant_documents(q, k=k, filters=filters) for q in queries]
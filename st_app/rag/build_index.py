@@ -0,0 +1,165 @@
+"""오프라인 FAISS 인덱스 구축 CLI.
+
+첫 사용자 요청 안에서 코퍼스 전체를 임베딩하지 않도록 인덱스를 미리 만들어 둡니다.
+
+1) 코퍼스(CSV + 증분 기록 + 준중복 묶기, 서빙과 같은 저장소)를 청크 단위로 임베딩해
+   메모리 매핑 배열(<index_dir>/.build/vectors.npy)에 쓰고, 청크마다 체크포인트(checkpoint.json)를 갱신
+2) 중간에 끊긴 뒤 다시 실행하면 코퍼스 지문/모델/차원이 같을 때 체크포인트 다음 청크부터 이어서 임베딩
+3) 끝나면 인덱스를 만들어 index.faiss / meta.json 을 원자적으로 교체하고 작업 파일 삭제
+
+서빙 프로세스는 FAISS_PREBUILT_ONLY=1 이면 여기서 만든 인덱스를 로드만 합니다.
+
+사용 예:
+    python -m st_app.rag.build_index
+    python -m st_app.rag.build_index --local --chunk-size 512
+    python -m st_app.rag.build_index --stub --index-dir /tmp/faiss_index --index-type hnsw
+"""
+from __future__ import annotations
+
+import argparse
+import dataclasses
+import json
+import os
+import shutil
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+from st_app.rag.atomic_io import dir_lock, write_files, write_json
+from st_app.rag.faiss_index import INDEX_TYPES, STORAGE_TYPES, IndexConfig, build_index, publish_index
+from st_app.rag.retriever import (
+    DEFAULT_FAISS_INDEX_DIR,
+    embedder_id,
+    l2_normalize,
+    load_store,
+    index_meta,
+)
+from st_app.rag.store import DocumentStore
+
+
+def _read_json(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json_atomic(path: str, data: Dict[str, Any]) -> None:
+    write_files([(path, write_json(data))])
+
+
+def embed_corpus(
+    store: DocumentStore,
+    embedder: Any,
+    workdir: str,
+    chunk_size: int = 256,
+    restart: bool = False,
+) -> "tuple[np.ndarray, Dict[str, float]]":
+    """삭제되지 않은 문서를 저장소 순서대로 임베딩한 (문서 수, dim) 메모리 매핑 배열과 처리량 통계"""
+    alive = store.alive_positions()
+    n, dim = len(alive), int(embedder.dimension)
+    key = {"corpus_fingerprint": store.fingerprint(), "model": embedder_id(embedder), "dim": dim, "num_texts": n}
+    vec_path = os.path.join(workdir, "vectors.npy")
+    ckpt_path = os.path.join(workdir, "checkpoint.json")
+    os.makedirs(workdir, exist_ok=True)
+
+    state = None if restart else _read_json(ckpt_path)
+    if state is not None and state.get("key") == key and os.path.exists(vec_path):
+        done = int(state.get("done", 0))
+        vecs = np.lib.format.open_memmap(vec_path, mode="r+")
+        print(f"[build_index] 체크포인트에서 이어서 임베딩: {done}/{n}")
+    else:
+        done = 0
+        vecs = np.lib.format.open_memmap(vec_path, mode="w+", dtype="float32", shape=(n, dim))
+        _write_json_atomic(ckpt_path, {"key": key, "done": 0})
+
+    resumed_from = done
+    t0 = time.perf_counter()
+    for start in range(done, n, chunk_size):
+        end = min(n, start + chunk_size)
+        vecs[start:end] = l2_normalize(embedder.encode([store.text(int(i)) for i in alive[start:end]]))
+        # 벡터를 디스크에 내린 뒤에 체크포인트를 옮겨야 재시작 시 빈 행을 완료로 보지 않음
+        vecs.flush()
+        _write_json_atomic(ckpt_path, {"key": key, "done": end})
+        elapsed = time.perf_counter() - t0
+        rate = (end - resumed_from) / elapsed if elapsed > 0 else float("inf")
+        eta = (n - end) / rate if rate > 0 else 0.0
+        print(f"[build_index] {end}/{n} 임베딩 ({rate:.1f} texts/s, 남은 시간 약 {eta:.0f}s)")
+
+    elapsed = time.perf_counter() - t0
+    embedded = n - resumed_from
+    stats = {
+        "embedded": embedded,
+        "resumed_from": resumed_from,
+        "embed_s": elapsed,
+        "texts_per_s": embedded / elapsed if elapsed > 0 else 0.0,
+    }
+    return vecs, stats
+
+
+def build(
+    store: DocumentStore,
+    embedder: Any,
+    index_dir: str,
+    config: Optional[IndexConfig] = None,
+    chunk_size: int = 256,
+    restart: bool = False,
+) -> Dict[str, Any]:
+    """임베딩 → 인덱스 구축 → index.faiss / meta.json 원자적 교체. 통계 반환"""
+    config = config or IndexConfig.from_env()
+    workdir = os.path.join(index_dir, ".build")
+    vecs, stats = embed_corpus(store, embedder, workdir, chunk_size=chunk_size, restart=restart)
+    dim = int(vecs.shape[1])
+
+    t0 = time.perf_counter()
+    alive = store.alive_positions()
+    index = build_index(np.asarray(vecs), config, dim=dim, ids=store.review_ids[alive])
+    stats["index_s"] = time.perf_counter() - t0
+
+    # 같은 디렉토리를 여는 서빙 프로세스와 저장이 겹치지 않도록 잠금
+    with dir_lock(index_dir):
+        paths = publish_index(index_dir, index, index_meta(store, embedder, dim, config))
+    del vecs
+    shutil.rmtree(workdir, ignore_errors=True)
+    stats.update({"num_texts": len(alive), "dim": dim, "factory": config.factory_string(len(alive), dim)})
+    print(f"[build_index] 게시 완료: {paths['index']} ({stats['factory']})")
+    return stats
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="오프라인 FAISS 인덱스 구축 (중단 후 이어서 구축 가능)")
+    parser.add_argument("--index-dir", default=DEFAULT_FAISS_INDEX_DIR)
+    parser.add_argument("--chunk-size", type=int, default=256, help="체크포인트 단위 (문서 수)")
+    parser.add_argument("--local", action="store_true", help="API 대신 로컬 임베딩 모델 사용")
+    parser.add_argument("--stub", action="store_true", help="해싱 임베딩 (네트워크/모델 없이 점검용)")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default=None, help="기본값은 FAISS_INDEX_TYPE")
+    parser.add_argument("--storage", choices=STORAGE_TYPES, default=None, help="기본값은 FAISS_STORAGE")
+    parser.add_argument("--restart", action="store_true", help="체크포인트를 무시하고 처음부터 임베딩")
+    args = parser.parse_args(argv)
+
+    from st_app.rag.embedder import DEFAULT_EMBEDDING_CACHE_DIR, HashingEmbedder, get_embedder
+
+    if args.stub:
+        embedder = HashingEmbedder()
+    else:
+        cache_dir = os.getenv("EMBEDDING_CACHE_DIR", DEFAULT_EMBEDDING_CACHE_DIR)
+        embedder = get_embedder(use_api=not args.local, cache_dir=cache_dir)
+
+    config = IndexConfig.from_env()
+    overrides = {k: v for k, v in (("index_type", args.index_type), ("storage", args.storage)) if v}
+    if overrides:
+        config = dataclasses.replace(config, **overrides)
+
+    store = load_store()
+    print(f"[build_index] 리뷰 {store.num_alive}개, 모델 {embedder_id(embedder)}, 인덱스 {args.index_dir}")
+    stats = build(store, embedder, args.index_dir, config, chunk_size=args.chunk_size, restart=args.restart)
+    print(
+        f"[build_index] 임베딩 {stats['embedded']}개 {stats['embed_s']:.1f}s ({stats['texts_per_s']:.1f} texts/s), "
+        f"인덱스 구축 {stats['index_s']:.2f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
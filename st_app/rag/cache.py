@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import os
+import re
+import threading
+import time
+import unicodedata
+import weakref
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from st_app.rag.store import RetrievedDocument, ReviewFilter
+
+
+_MISSING = object()
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(text: str) -> str:
+    """캐시 키용 질의 정규화 (유니코드 NFC, 소문자, 공백 정리)"""
+    return _SPACES.sub(" ", unicodedata.normalize("NFC", text)).strip().lower()
+
+
+class LRUCache:
+    """스레드 안전한 크기 제한 LRU 캐시 (선택적 TTL).
+
+    - maxsize를 넘으면 가장 오래 사용하지 않은 항목부터 제거
+    - ttl(초)이 지나면 조회 시 만료 처리
+    - hits/misses 카운터 제공
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 1024,
+        ttl: Optional[float] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def from_env(cls, prefix: str, maxsize: int, ttl: Optional[float]) -> "LRUCache":
+        """환경변수 {prefix}_SIZE / {prefix}_TTL 로 크기와 TTL(초, 0이면 무제한) 조정"""
+        try:
+            maxsize = int(os.getenv(f"{prefix}_SIZE", maxsize))
+            ttl = float(os.getenv(f"{prefix}_TTL", ttl or 0)) or None
+        except ValueError:
+            pass
+        return cls(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._data.get(key, _MISSING)
+            if entry is not _MISSING:
+                value, expires = entry
+                if expires is None or expires > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key: Hashable, value: Any) -> None:
+        if self.maxsize <= 0:
+            return
+        expires = None if self.ttl is None else self._clock() + self.ttl
+        with self._lock:
+            self._data[key] = (value, expires)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+        }
+
+
+class CachedRetriever:
+    """get_relevant_documents 결과 캐시 래퍼.
+
+    키는 (정규화 질의, k, 필터, 검색기 index_version)이며, 문서 추가/삭제로
+    버전이 바뀌면 이전 결과를 모두 비웁니다. 재구축은 새 검색기 객체이므로 캐시도 새로 만들어집니다.
+    그 밖의 속성/메서드는 감싼 검색기로 그대로 위임합니다.
+    """
+
+    def __init__(self, retriever: Any, cache: Optional[LRUCache] = None) -> None:
+        self._retriever = retriever
+        self._cache = cache if cache is not None else LRUCache.from_env("RETRIEVAL_CACHE", 512, 600)
+        self._version = getattr(retriever, "index_version", 0)
+
+    @property
+    def retriever(self) -> Any:
+        return self._retriever
+
+    @property
+    def cache(self) -> LRUCache:
+        return self._cache
+
+    def get_relevant_documents(
+        self,
+        query: str,
+        k: Any = _MISSING,
+        filters: "ReviewFilter | Dict[str, Any] | None" = None,
+    ) -> List[RetrievedDocument]:
+        version = getattr(self._retriever, "index_version", 0)
+        if version != self._version:
+            self._cache.clear()
+            self._version = version
+
+        key = (normalize_query(query), k, ReviewFilter.coerce(filters), version)
+        docs = self._cache.get(key)
+        if docs is None:
+            kwargs = {} if k is _MISSING else {"k": k}
+            docs = tuple(self._retriever.get_relevant_documents(query, filters=filters, **kwargs))
+            self._cache.put(key, docs)
+        return list(docs)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._retriever, name)
+
+
+_WRAPPERS: "weakref.WeakKeyDictionary[Any, CachedRetriever]" = weakref.WeakKeyDictionary()
+_WRAPPERS_LOCK = threading.Lock()
+
+
+def cached_retriever(retriever: Any) -> CachedRetriever:
+    """검색기별 결과 캐시 래퍼 (같은 검색기에는 같은 래퍼/캐시를 반환)"""
+    with _WRAPPERS_LOCK:
+        wrapper = _WRAPPERS.get(retriever)
+        if wrapper is None:
+            wrapper = CachedRetriever(retriever)
+            _WRAPPERS[retriever] = wrapper
+        return wrapper
@@ -0,0 +1,141 @@
+"""준중복(near-duplicate) 리뷰 묶기.
+
+1) 소문자/기호 제거로 정규화한 텍스트가 같으면 완전 중복
+2) 문자 3-gram 집합의 MinHash 서명을 LSH 밴드로 나눠 후보를 찾고,
+   서명 일치율(자카드 유사도 추정치)이 임계값 이상이면 같은 묶음으로 합침
+
+묶음마다 가장 앞 행 하나만 대표로 남기고 묶인 개수는 dup_counts에 기록합니다.
+같은 사이트 안에서만 묶으므로(대표는 자기 사이트 메타데이터만 가짐) 사이트 필터/사이트별 샤드에서
+다른 사이트의 리뷰가 사라지지 않습니다. 정규화하면 빈 문자열인 리뷰(기호/이모지만)는 묶지 않습니다.
+"""
+from __future__ import annotations
+
+import re
+import zlib
+from typing import List, Optional, Sequence
+
+import numpy as np
+
+from st_app.rag.store import DocumentStore
+
+
+_NON_WORD = re.compile(r"[^0-9a-z가-힣ㄱ-ㅎㅏ-ㅣ]+")
+_PRIME = (1 << 31) - 1  # (a*h + b) mod p 가 uint64 안에서 넘치지 않도록 31비트 소수
+
+
+def normalize_text(text: str) -> str:
+    """중복 판정용 정규화 (소문자, 한글/영숫자 외 문자는 공백 하나로)"""
+    return _NON_WORD.sub(" ", text.lower()).strip()
+
+
+def _shingles(text: str, size: int) -> List[int]:
+    if len(text) <= size:
+        grams = {text}
+    else:
+        grams = {text[i : i + size] for i in range(len(text) - size + 1)}
+    return [zlib.crc32(g.encode("utf-8")) % _PRIME for g in grams]
+
+
+def minhash_signatures(texts: Sequence[str], num_perm: int = 64, shingle: int = 3, seed: int = 0) -> np.ndarray:
+    """(문서 수, num_perm) MinHash 서명. 문서별 shingle 해시를 이어붙여 reduceat으로 한 번에 최솟값 계산"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    hashes = [_shingles(t, shingle) for t in texts]
+    lengths = np.array([len(h) for h in hashes], dtype=np.int64)
+    flat = np.fromiter((x for h in hashes for x in h), dtype=np.uint64, count=int(lengths.sum()))
+    starts = np.zeros(len(texts), dtype=np.int64)
+    np.cumsum(lengths[:-1], out=starts[1:])
+
+    sig = np.empty((len(texts), num_perm), dtype=np.uint64)
+    for p in range(num_perm):
+        permuted = (a[p] * flat + b[p]) % _PRIME
+        sig[:, p] = np.minimum.reduceat(permuted, starts)
+    return sig
+
+
+def _find(parent: np.ndarray, i: int) -> int:
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def _union(parent: np.ndarray, i: int, j: int) -> None:
+    ri, rj = _find(parent, i), _find(parent, j)
+    if ri != rj:
+        # 앞쪽 행이 대표가 되도록 작은 번호를 루트로
+        parent[max(ri, rj)] = min(ri, rj)
+
+
+def duplicate_groups(
+    texts: Sequence[str],
+    threshold: float = 0.8,
+    num_perm: int = 64,
+    bands: int = 16,
+    groups: Optional[Sequence[int]] = None,
+) -> np.ndarray:
+    """문서별 대표 행 번호 (대표 자신은 자기 번호, 묶음 안에서 가장 앞 행이 대표)
+
+    groups가 있으면 값(예: 사이트 코드)이 같은 문서끼리만 묶습니다.
+    """
+    n = len(texts)
+    parent = np.arange(n, dtype=np.int64)
+    if n == 0:
+        return parent
+    group = np.zeros(n, dtype=np.int64) if groups is None else np.asarray(groups, dtype=np.int64)
+
+    # 1) 정규화 후 완전 일치 (빈 문자열은 서로 다른 리뷰이므로 제외)
+    first_of = {}
+    uniques: List[int] = []
+    for i, text in enumerate(texts):
+        key = normalize_text(text)
+        if not key:
+            continue
+        j = first_of.setdefault((int(group[i]), key), i)
+        if j == i:
+            uniques.append(i)
+        else:
+            parent[i] = j
+
+    # 2) MinHash LSH: 밴드가 같으면 후보, 서명 일치율로 확인
+    if threshold < 1.0 and len(uniques) > 1:
+        idx = np.asarray(uniques, dtype=np.int64)
+        sig = minhash_signatures([normalize_text(texts[i]) for i in idx], num_perm=num_perm)
+        rows = num_perm // bands
+        for band in range(bands):
+            # 그룹 번호를 밴드 키 앞에 붙여 다른 그룹 문서는 같은 버킷에 들지 않도록 함
+            block = np.ascontiguousarray(
+                np.column_stack([group[idx].astype(np.uint64), sig[:, band * rows : (band + 1) * rows]])
+            )
+            _, bucket = np.unique(
+                block.view(np.dtype((np.void, block.dtype.itemsize * (rows + 1)))), return_inverse=True
+            )
+            bucket = bucket.reshape(-1)
+            order = np.argsort(bucket, kind="stable")
+            sorted_bucket = bucket[order]
+            heads = order[np.searchsorted(sorted_bucket, sorted_bucket)]  # 버킷의 첫 문서
+            pair = order != heads
+            members, heads = order[pair], heads[pair]
+            similar = (sig[members] == sig[heads]).mean(axis=1) >= threshold
+            for member, head in zip(members[similar], heads[similar]):
+                _union(parent, int(idx[head]), int(idx[member]))
+
+    return np.array([_find(parent, i) for i in range(n)], dtype=np.int64)
+
+
+def collapse_duplicates(store: DocumentStore, threshold: float = 0.8) -> DocumentStore:
+    """사이트별 준중복 묶음마다 대표 하나만 남긴 저장소 (dup_counts에 묶인 문서 수, 삭제된 행은 제외)"""
+    alive = store.alive_positions()
+    rep = duplicate_groups(
+        [store.text(int(i)) for i in alive], threshold=threshold, groups=store.site_codes[alive]
+    )
+    keep = np.flatnonzero(rep == np.arange(len(alive)))
+    weights = store.dup_counts[alive] if store.dup_counts is not None else None
+    counts = np.bincount(rep, weights=weights, minlength=len(alive))[keep]
+
+    collapsed = store.subset(alive[keep])
+    collapsed.dup_counts = counts.astype(np.int32)
+    collapsed.removed = None
+    return collapsed
@@ -1,15 +1,47 @@
 from __future__ import annotations
 
+import atexit
 import os
-from typing import List
-import requests
+import zlib
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
 import numpy as np
 
 from sklearn.feature_extraction.text import TfidfVectorizer
 
+from st_app.rag.bm25 import char_ngrams
+from st_app.rag.embedding_cache import EmbeddingCache, cached_encode
+from st_app.rag.model_registry import check_dimension, known_dimension
+from st_app.rag.upstage_client import UpstageEmbeddingClient
+
+
+DEFAULT_EMBEDDING_CACHE_DIR = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "db", "embedding_cache")
+)
+
+
+@contextmanager
+def _env_default(name: str, value: str) -> Iterator[None]:
+    """블록 안에서만 환경변수 기본값 설정 (사용자가 이미 정했으면 그대로 둠)"""
+    if name in os.environ:
+        yield
+        return
+    os.environ[name] = value
+    try:
+        yield
+    finally:
+        os.environ.pop(name, None)
+
+
+def _make_cache(cache_dir: str | None, model_name: str) -> EmbeddingCache | None:
+    if not cache_dir:
+        return None
+    return EmbeddingCache(cache_dir, model_name)
+
 
 class TfidfEmbedder:
     def __init__(self, max_features: int = 5000) -> None:
+        self.max_features = max_features
         self.vectorizer = TfidfVectorizer(max_features=max_features)
 
     def fit_transform(self, texts: List[str]):
@@ -18,68 +50,115 @@ class TfidfEmbedder:
     def transform(self, texts: List[str]):
         return self.vectorizer.transform(texts)
 
+    @property
+    def vocab_size(self) -> int:
+        return len(getattr(self.vectorizer, "vocabulary_", {}))
+
+    def save(self, f) -> None:
+        """학습된 어휘(열 순서)와 idf 가중치를 npz로 저장 (f: 경로 또는 바이너리 파일 객체)"""
+        vocab = self.vectorizer.vocabulary_
+        terms = sorted(vocab, key=vocab.get)
+        np.savez(f, terms=np.asarray(terms, dtype=str), idf=self.vectorizer.idf_)
+
+    @classmethod
+    def load(cls, f, max_features: int = 5000) -> "TfidfEmbedder":
+        """save()로 저장한 어휘/idf로 학습 없이 복원"""
+        data = np.load(f, allow_pickle=False)
+        embedder = cls(max_features=max_features)
+        embedder.vectorizer.vocabulary_ = {str(t): i for i, t in enumerate(data["terms"])}
+        embedder.vectorizer.idf_ = data["idf"]
+        return embedder
+
+
+class HashingEmbedder:
+    """모델/네트워크 없이 동작하는 결정적 임베딩 (오프라인 벤치마크/테스트용 스텁).
+
+    어절 내부 문자 n-gram을 부호 있는 해싱(crc32)으로 dim차원에 누적한 뒤 L2 정규화합니다.
+    """
+
+    def __init__(self, dim: int = 256, ngram: int = 2) -> None:
+        self.dimension = dim
+        self.ngram = ngram
+        self.model = f"hashing-char{ngram}-{dim}"
+
+    def encode(self, texts: List[str], use_cache: bool = True) -> np.ndarray:
+        out = np.zeros((len(texts), self.dimension), dtype="float32")
+        for row, text in enumerate(texts):
+            for gram in char_ngrams(text, self.ngram):
+                h = zlib.crc32(gram.encode("utf-8"))
+                out[row, h % self.dimension] += 1.0 if (h >> 31) & 1 else -1.0
+        norms = np.linalg.norm(out, axis=1, keepdims=True)
+        return out / np.maximum(norms, 1e-8)
+
 
 class UpstageEmbedder:
     """Upstage 임베딩 API 래퍼"""
 
-    def __init__(self, api_key: str | None = None, model_name: str | None = None) -> None:
+    def __init__(
+        self,
+        api_key: str | None = None,
+        model_name: str | None = None,
+        cache_dir: str | None = None,
+    ) -> None:
         self.api_key = api_key or os.getenv("UPSTAGE_API_KEY")
         if not self.api_key:
             raise RuntimeError("UPSTAGE_API_KEY가 설정되지 않았습니다.")
         
         self.model = model_name or os.getenv("EMBEDDING_MODEL", "solar-1-mini-embedding")
-        self.base_url = "https://api.upstage.ai"
-        self._dimension = None
+        self._client = UpstageEmbeddingClient.from_env(self.api_key, self.model)
+        self._dimension: Optional[int] = None
+        self.assume_dimension(known_dimension(self.model))
+        self.cache = _make_cache(cache_dir, self.model)
+
+    @property
+    def known_dimension(self) -> Optional[int]:
+        """API 호출 없이 알고 있는 차원 (레지스트리/인덱스 meta, 모르면 None)"""
+        return self._dimension
+
+    def assume_dimension(self, dim: Optional[int]) -> None:
+        """차원을 미리 정해 둠 (실제 첫 배치에서 검증)"""
+        if dim and self._dimension is None:
+            self._dimension = int(dim)
+            self._client.dimension = self._dimension
 
     @property
     def dimension(self) -> int:
         """임베딩 차원 반환"""
         if self._dimension is None:
-            # 테스트 임베딩으로 차원 확인
+            # 레지스트리에 없는 모델: 테스트 임베딩으로 차원 확인
+            print(f"{self.model} 차원을 알 수 없어 테스트 임베딩으로 확인합니다.")
             test_embedding = self.encode(["test"])
             self._dimension = test_embedding.shape[1]
         return self._dimension
 
-    def encode(self, texts: List[str]) -> np.ndarray:
-        """텍스트들을 임베딩으로 변환"""
+    def encode(self, texts: List[str], use_cache: bool = True) -> np.ndarray:
+        """텍스트들을 임베딩으로 변환 (디스크 캐시 우선 조회)"""
         if not texts:
             return np.array([])
-        
-        url = f"{self.base_url}/v1/embeddings"
-        headers = {
-            "Authorization": f"Bearer {self.api_key}",
-            "Content-Type": "application/json"
-        }
-        
-        embeddings = []
-        # 배치 크기 제한 (API 제한 고려)
-        batch_size = 10
-        
-        for i in range(0, len(texts), batch_size):
-            batch_texts = texts[i:i + batch_size]
-            
-            payload = {
-                "model": self.model,
-                "input": batch_texts
-            }
-            
-            try:
-                response = requests.post(url, headers=headers, json=payload, timeout=30)
-                response.raise_for_status()
-                data = response.json()
-                
-                batch_embeddings = [item["embedding"] for item in data["data"]]
-                embeddings.extend(batch_embeddings)
-                
-            except Exception as e:
-                print(f"임베딩 API 호출 실패: {e}")
-                print(f"URL: {url}")
-                print(f"Payload: {payload}")
-                # 폴백: 0으로 채운 임베딩 반환
-                fallback_embedding = [0.0] * 384  # 기본 차원
-                embeddings.extend([fallback_embedding] * len(batch_texts))
-        
-        return np.array(embeddings, dtype="float32")
+        return cached_encode(self.cache if use_cache else None, texts, self._encode_remote)
+
+    def _encode_remote(self, texts: List[str]) -> np.ndarray:
+        """Upstage API 호출 (연결 풀 + 동시 배치 + 재시도, upstage_client 참고)"""
+        vecs = self._client.embed(texts)
+        check_dimension(self.model, self._dimension, vecs)
+        return vecs
+
+
+LOCAL_BACKENDS = ("torch", "onnx", "onnx-int8")
+DEFAULT_ONNX_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "db", "onnx_models"))
+
+
+def encode_by_length(texts: List[str], encode_fn, batch_size: int) -> np.ndarray:
+    """길이순으로 정렬해 비슷한 길이끼리 배치를 만들고(패딩 감소) 결과를 원래 순서로 되돌림"""
+    order = np.argsort([-len(t) for t in texts], kind="stable")
+    out: np.ndarray | None = None
+    for start in range(0, len(texts), batch_size):
+        idx = order[start : start + batch_size]
+        vecs = np.asarray(encode_fn([texts[i] for i in idx]), dtype="float32")
+        if out is None:
+            out = np.empty((len(texts), vecs.shape[1]), dtype="float32")
+        out[idx] = vecs
+    return out if out is not None else np.zeros((0, 0), dtype="float32")
 
 
 class SentenceTransformerEmbedder:
@@ -87,9 +166,23 @@ class SentenceTransformerEmbedder:
 
     기본 모델: paraphrase-multilingual-MiniLM-L12-v2 (한국어 지원)
     환경변수 EMBEDDING_MODEL 로 교체 가능.
+
+    CPU 처리량 옵션 (환경변수 또는 인자):
+    - EMBEDDING_BACKEND=torch|onnx|onnx-int8: ONNX Runtime 백엔드, onnx-int8은 동적 int8 양자화 모델
+      (처음 한 번 st_app/db/onnx_models 아래로 내보냄, sentence-transformers>=3.2 + optimum[onnxruntime] 필요)
+    - EMBEDDING_WORKERS=N: N>1이면 큰 입력은 N개 프로세스 풀로 나눠 인코딩
+    - EMBEDDING_BATCH_SIZE: 배치 크기 (기본 32). 입력은 길이순으로 묶어 패딩을 줄임
+    백엔드를 쓸 수 없으면 torch로 폴백합니다.
     """
 
-    def __init__(self, model_name: str | None = None) -> None:
+    def __init__(
+        self,
+        model_name: str | None = None,
+        cache_dir: str | None = None,
+        backend: str | None = None,
+        workers: int | None = None,
+        batch_size: int | None = None,
+    ) -> None:
         name = model_name or os.getenv(
             "EMBEDDING_MODEL", "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
         )
@@ -99,40 +192,124 @@ class SentenceTransformerEmbedder:
             raise RuntimeError(
                 "sentence-transformers가 설치되어 있지 않습니다. requirements를 확인하세요."
             ) from e
-        self._model = SentenceTransformer(name)
+        backend = (backend or os.getenv("EMBEDDING_BACKEND", "torch")).lower()
+        if backend not in LOCAL_BACKENDS:
+            raise ValueError(f"EMBEDDING_BACKEND must be one of {LOCAL_BACKENDS}, got {backend!r}")
+        self.workers = max(1, int(workers or os.getenv("EMBEDDING_WORKERS", 1)))
+        self.batch_size = max(1, int(batch_size or os.getenv("EMBEDDING_BATCH_SIZE", 32)))
+        self._pool = None
 
-    @property
-    def dimension(self) -> int:
-        # 일부 모델은 get_sentence_embedding_dimension 제공
+        self._model, self.backend = self._load(SentenceTransformer, name, backend)
+        # torch가 아니면 벡터가 조금 달라지므로 캐시/인덱스 호환성 식별자에 백엔드를 붙임
+        self.model = name if self.backend == "torch" else f"{name}#{self.backend}"
+        self.cache = _make_cache(cache_dir, self.model)
+        self._dimension: Optional[int] = self._config_dimension() or known_dimension(self.model)
+
+    @staticmethod
+    def _load(SentenceTransformer, name: str, backend: str):
+        if backend == "torch":
+            return SentenceTransformer(name), "torch"
+        try:
+            if backend == "onnx":
+                return SentenceTransformer(name, backend="onnx"), "onnx"
+            return SentenceTransformerEmbedder._load_int8(SentenceTransformer, name), "onnx-int8"
+        except Exception as e:
+            print(f"{backend} 백엔드 로드 실패, torch로 폴백: {e}")
+            return SentenceTransformer(name), "torch"
+
+    @staticmethod
+    def _load_int8(SentenceTransformer, name: str):
+        """동적 int8 양자화 ONNX 모델 (없으면 한 번 내보낸 뒤 로드)"""
+        from sentence_transformers import export_dynamic_quantized_onnx_model  # type: ignore
+
+        config = os.getenv("EMBEDDING_ONNX_QUANT", "avx2")  # arm64 | avx2 | avx512 | avx512_vnni
+        local_dir = os.path.join(os.getenv("EMBEDDING_ONNX_DIR", DEFAULT_ONNX_DIR), name.replace("/", "__"))
+        file_name = f"onnx/model_qint8_{config}.onnx"
+        if not os.path.exists(os.path.join(local_dir, file_name)):
+            print(f"int8 ONNX 모델 내보내는 중: {local_dir}")
+            model = SentenceTransformer(name, backend="onnx")
+            model.save(local_dir)
+            export_dynamic_quantized_onnx_model(model, config, local_dir)
+        return SentenceTransformer(local_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+    def _config_dimension(self) -> Optional[int]:
+        # 일부 모델은 get_sentence_embedding_dimension 제공 (모델 설정값, 추론 없음)
         dim = getattr(self._model, "get_sentence_embedding_dimension", None)
         if callable(dim):
-            return int(dim())
-        # fallback: 한 문장을 encode하여 차원 확인
-        import numpy as np
+            value = dim()
+            return int(value) if value else None
+        return None
+
+    @property
+    def known_dimension(self) -> Optional[int]:
+        """인코딩 없이 알고 있는 차원 (모델 설정/레지스트리/인덱스 meta, 모르면 None)"""
+        return self._dimension
+
+    def assume_dimension(self, dim: Optional[int]) -> None:
+        """차원을 미리 정해 둠 (실제 첫 배치에서 검증)"""
+        if dim and self._dimension is None:
+            self._dimension = int(dim)
+
+    @property
+    def dimension(self) -> int:
+        if self._dimension is None:
+            # fallback: 한 문장을 encode하여 차원 확인
+            v = self._model.encode(["dim"])
+            self._dimension = int(np.asarray(v).shape[1])
+        return self._dimension
+
+    def encode(self, texts: List[str], use_cache: bool = True):
+        return cached_encode(self.cache if use_cache else None, texts, self._encode_local)
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        return self._model.encode(
+            texts, batch_size=self.batch_size, normalize_embeddings=False, convert_to_numpy=True
+        )
 
-        v = self._model.encode(["dim"])
-        return int(np.asarray(v).shape[1])
+    def _encode_local(self, texts: List[str]):
+        if self.workers > 1 and len(texts) >= self.workers * self.batch_size:
+            vecs = self._encode_pool(texts)
+        else:
+            vecs = encode_by_length(texts, self._encode_batch, self.batch_size)
+        check_dimension(self.model, self._dimension, vecs)
+        return vecs
 
-    def encode(self, texts: List[str]):
-        import numpy as np
+    def _encode_pool(self, texts: List[str]) -> np.ndarray:
+        """프로세스 풀 인코딩. 전체를 길이순으로 정렬해 넘기므로 워커별 청크도 길이가 비슷함"""
+        if self._pool is None:
+            # 워커 프로세스끼리 코어를 나눠 쓰도록 torch 스레드 수 제한.
+            # 워커를 띄우는 동안만 설정하고 되돌려서 부모 프로세스(와 이후 다른 자식)의 환경은 바꾸지 않음
+            threads = str(max(1, (os.cpu_count() or 1) // self.workers))
+            with _env_default("OMP_NUM_THREADS", threads):
+                self._pool = self._model.start_multi_process_pool(target_devices=["cpu"] * self.workers)
+            atexit.register(self.close)
+        order = np.argsort([-len(t) for t in texts], kind="stable")
+        vecs = self._model.encode_multi_process([texts[i] for i in order], self._pool, batch_size=self.batch_size)
+        out = np.empty((len(texts), vecs.shape[1]), dtype="float32")
+        out[order] = vecs
+        return out
 
-        vecs = self._model.encode(texts, normalize_embeddings=False)
-        return np.asarray(vecs, dtype="float32")
+    def close(self) -> None:
+        """프로세스 풀 종료"""
+        if self._pool is not None:
+            self._model.stop_multi_process_pool(self._pool)
+            self._pool = None
 
 
-def get_embedder(use_api: bool = True):
+def get_embedder(use_api: bool = True, cache_dir: str | None = None):
     """임베딩 모델 반환
     
     Args:
         use_api: True면 Upstage API 사용, False면 로컬 모델 사용
+        cache_dir: 디스크 임베딩 캐시 디렉토리 (None이면 캐시 미사용)
     """
     if use_api:
         try:
-            return UpstageEmbedder()
+            return UpstageEmbedder(cache_dir=cache_dir)
         except Exception as e:
             print(f"Upstage API 임베딩 실패, 로컬 모델로 폴백: {e}")
-            return SentenceTransformerEmbedder()
+            return SentenceTransformerEmbedder(cache_dir=cache_dir)
     else:
-        return SentenceTransformerEmbedder()
+        return SentenceTransformerEmbedder(cache_dir=cache_dir)
 
 
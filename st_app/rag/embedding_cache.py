@@ -0,0 +1,217 @@
+from __future__ import annotations
+
+import hashlib
+import os
+import re
+import uuid
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from st_app.rag.atomic_io import temp_file
+
+
+def text_key(text: str) -> str:
+    """텍스트 내용 해시 (캐시/인덱스 공통 키)"""
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+def _model_slug(model_name: str) -> str:
+    return re.sub(r"[^0-9A-Za-z._-]+", "_", model_name).strip("_") or "model"
+
+
+class EmbeddingCache:
+    """(모델명, 텍스트 해시) 기반 디스크 임베딩 캐시.
+
+    모델마다 `<cache_dir>/<model>/` 아래에 flush 한 번당 샤드 하나(`<id>.npy` 벡터 +
+    `<id>.keys.npy` 키)를 추가만 합니다. 기존 샤드는 다시 쓰지 않으므로 쓰기량은 새 벡터 크기에 비례하고,
+    벡터는 메모리 매핑으로만 읽어 프로세스마다 사본을 들고 있지 않습니다 (메모리에는 키 → 위치만).
+    샤드가 MAX_SHARDS개를 넘으면 하나로 합칩니다.
+    재시작 시 이미 임베딩한 텍스트는 API/로컬 모델을 다시 호출하지 않습니다.
+    """
+
+    MAX_SHARDS = 32
+
+    def __init__(self, cache_dir: str, model_name: str) -> None:
+        self.cache_dir = cache_dir
+        self.model_name = model_name
+        self.path = os.path.join(cache_dir, _model_slug(model_name))
+        # 이전 형식 (모델당 npz 하나)
+        self._legacy_path = self.path + ".npz"
+        self._index: Optional[Dict[str, Tuple[str, int]]] = None
+        self._shards: Dict[str, np.ndarray] = {}
+        self._pending: Dict[str, np.ndarray] = {}
+
+    def _shard_ids(self) -> List[str]:
+        try:
+            names = os.listdir(self.path)
+        except OSError:
+            return []
+        ids = [n[: -len(".keys.npy")] for n in names if n.endswith(".keys.npy")]
+        return sorted(i for i in ids if os.path.exists(os.path.join(self.path, f"{i}.npy")))
+
+    def _load(self, refresh: bool = False) -> None:
+        """키 → (샤드, 행) 색인 구성. refresh면 다른 프로세스가 추가한 샤드까지 다시 읽음"""
+        if self._index is not None and not refresh:
+            return
+        if self._index is None:
+            self._migrate_legacy()
+        index: Dict[str, Tuple[str, int]] = {}
+        for shard in self._shard_ids():
+            try:
+                keys = np.load(os.path.join(self.path, f"{shard}.keys.npy"), allow_pickle=False)
+            except Exception as e:
+                print(f"임베딩 캐시 샤드 로드 실패, 건너뜁니다 ({shard}): {e}")
+                continue
+            for row, key in enumerate(keys):
+                index.setdefault(key.decode("ascii"), (shard, row))
+        self._index = index
+        self._shards = {}
+
+    def _migrate_legacy(self) -> None:
+        if not os.path.exists(self._legacy_path):
+            return
+        try:
+            with np.load(self._legacy_path, allow_pickle=False) as data:
+                keys, vecs = [str(k) for k in data["keys"]], np.asarray(data["vecs"], dtype="float32")
+            if len(keys):
+                self._write_shard(keys, vecs)
+            os.remove(self._legacy_path)
+        except Exception as e:
+            print(f"이전 형식 임베딩 캐시 변환 실패, 무시합니다: {e}")
+
+    def _vectors(self, shard: str) -> Optional[np.ndarray]:
+        vecs = self._shards.get(shard)
+        if vecs is None:
+            try:
+                vecs = np.load(os.path.join(self.path, f"{shard}.npy"), mmap_mode="r", allow_pickle=False)
+            except Exception:
+                # 다른 프로세스가 합치면서 지운 샤드
+                return None
+            self._shards[shard] = vecs
+        return vecs
+
+    def __len__(self) -> int:
+        self._load()
+        return len(self._index or {}) + len(self._pending)
+
+    def _lookup(self, keys: List[str]) -> Dict[int, np.ndarray]:
+        assert self._index is not None
+        found: Dict[int, np.ndarray] = {}
+        for pos, key in enumerate(keys):
+            loc = self._index.get(key)
+            vecs = None if loc is None else self._vectors(loc[0])
+            if vecs is not None:
+                found[pos] = np.array(vecs[loc[1]], dtype="float32")
+            elif key in self._pending:
+                found[pos] = self._pending[key]
+        return found
+
+    def get_many(self, keys: List[str]) -> Dict[int, np.ndarray]:
+        """캐시에 있는 키의 위치 → 벡터 매핑 반환 (매핑에서 복사한 행)"""
+        self._load()
+        found = self._lookup(keys)
+        if len(found) < len(keys):
+            # 다른 워커가 그사이 추가/합친 샤드 반영
+            self._load(refresh=True)
+            found = self._lookup(keys)
+        return found
+
+    def put_many(self, keys: List[str], vecs: np.ndarray) -> None:
+        self._load()
+        assert self._index is not None
+        for key, vec in zip(keys, np.asarray(vecs, dtype="float32")):
+            if key in self._index or key in self._pending:
+                continue
+            # 실패로 0 벡터가 된 행은 캐시에 남기지 않음
+            if not np.any(vec):
+                continue
+            self._pending[key] = vec
+
+    def _write_shard(self, keys: List[str], vecs: np.ndarray) -> str:
+        """벡터 → 키 순서로 임시 파일에 쓴 뒤 교체 (키 파일이 있어야 샤드로 인식)"""
+        os.makedirs(self.path, exist_ok=True)
+        shard = uuid.uuid4().hex
+        for name, array in ((f"{shard}.npy", vecs), (f"{shard}.keys.npy", np.asarray(keys, dtype="S"))):
+            fd, tmp_path = temp_file(self.path)
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, array)
+                os.replace(tmp_path, os.path.join(self.path, name))
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+        return shard
+
+    def flush(self) -> None:
+        """새로 추가된 벡터만 새 샤드로 기록"""
+        if not self._pending:
+            return
+        assert self._index is not None
+        keys = list(self._pending.keys())
+        try:
+            shard = self._write_shard(keys, np.vstack(list(self._pending.values())).astype("float32"))
+        except Exception as e:
+            print(f"임베딩 캐시 저장 실패: {e}")
+            return
+        for row, key in enumerate(keys):
+            self._index[key] = (shard, row)
+        self._pending = {}
+        if len(self._shard_ids()) > self.MAX_SHARDS:
+            self.compact()
+
+    def compact(self) -> None:
+        """모든 샤드를 하나로 합침 (합친 샤드를 먼저 쓰고 나서 이전 샤드 삭제)"""
+        self._load(refresh=True)
+        assert self._index is not None
+        old = self._shard_ids()
+        keys = list(self._index.keys())
+        if len(old) <= 1 or not keys:
+            return
+        found = self._lookup(keys)
+        keys = [k for i, k in enumerate(keys) if i in found]
+        try:
+            self._write_shard(keys, np.vstack([found[i] for i in sorted(found)]).astype("float32"))
+        except Exception as e:
+            print(f"임베딩 캐시 합치기 실패: {e}")
+            return
+        for shard in old:
+            for name in (f"{shard}.keys.npy", f"{shard}.npy"):
+                try:
+                    os.remove(os.path.join(self.path, name))
+                except OSError:
+                    pass
+        self._load(refresh=True)
+
+
+def cached_encode(
+    cache: Optional[EmbeddingCache],
+    texts: List[str],
+    encode_fn: Callable[[List[str]], np.ndarray],
+) -> np.ndarray:
+    """캐시를 먼저 조회하고, 없는 텍스트만 encode_fn으로 임베딩"""
+    if cache is None:
+        return encode_fn(texts)
+
+    keys = [text_key(t) for t in texts]
+    found = cache.get_many(keys)
+    missing = [i for i in range(len(texts)) if i not in found]
+
+    new_vecs: Optional[np.ndarray] = None
+    if missing:
+        # 같은 텍스트가 여러 번 나와도 한 번만 임베딩
+        uniq: Dict[str, int] = {}
+        for i in missing:
+            uniq.setdefault(keys[i], i)
+        uniq_positions = list(uniq.values())
+        new_vecs = np.asarray(encode_fn([texts[i] for i in uniq_positions]), dtype="float32")
+        cache.put_many([keys[i] for i in uniq_positions], new_vecs)
+        cache.flush()
+        row_of = {keys[i]: r for r, i in enumerate(uniq_positions)}
+        for i in missing:
+            found[i] = new_vecs[row_of[keys[i]]]
+
+    if not found:
+        return np.zeros((0, 0), dtype="float32")
+    return np.vstack([found[i] for i in range(len(texts))]).astype("float32")
@@ -0,0 +1,122 @@
+"""로컬 임베딩(Sentence-Transformers) 모드별 처리량(texts/sec) 벤치마크.
+
+모드:
+    baseline     이전 방식 (한 프로세스, model.encode 기본 배치)
+    torch        길이순 배치 (EMBEDDING_BATCH_SIZE)
+    torch-mp     길이순 배치 + 프로세스 풀 (--workers)
+    onnx         ONNX Runtime 백엔드
+    onnx-int8    동적 int8 양자화 ONNX 백엔드
+    onnx-int8-mp int8 + 프로세스 풀
+
+첫 모드의 벡터를 기준으로 평균 코사인 유사도도 함께 출력합니다 (양자화 품질 확인용).
+설치되지 않은 백엔드는 건너뜁니다.
+
+사용 예:
+    python -m st_app.rag.encode_bench --n 2000 --workers 4
+    python -m st_app.rag.encode_bench --modes baseline torch onnx-int8 --batch-size 64
+"""
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from st_app.rag.embedder import SentenceTransformerEmbedder
+
+
+MODES: Dict[str, Dict[str, Any]] = {
+    "baseline": {"backend": "torch", "multi": False},
+    "torch": {"backend": "torch", "multi": False},
+    "torch-mp": {"backend": "torch", "multi": True},
+    "onnx": {"backend": "onnx", "multi": False},
+    "onnx-int8": {"backend": "onnx-int8", "multi": False},
+    "onnx-int8-mp": {"backend": "onnx-int8", "multi": True},
+}
+
+
+def corpus_texts(n: int) -> List[str]:
+    """번들된 리뷰 텍스트 n개 (모자라면 반복)"""
+    from st_app.rag.retriever import _database_dir
+    from st_app.rag.store import load_review_store
+
+    texts = load_review_store(_database_dir()).texts
+    return [texts[i % len(texts)] for i in range(n)]
+
+
+def _normalize(vecs: np.ndarray) -> np.ndarray:
+    return vecs / (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-8)
+
+
+def run_benchmark(
+    texts: List[str],
+    modes: Sequence[str] = ("baseline", "torch", "torch-mp", "onnx", "onnx-int8"),
+    workers: int = 4,
+    batch_size: int = 32,
+) -> List[Dict[str, Any]]:
+    rows: List[Dict[str, Any]] = []
+    reference: Optional[np.ndarray] = None
+    for mode in modes:
+        spec = MODES[mode]
+        try:
+            t0 = time.perf_counter()
+            embedder = SentenceTransformerEmbedder(
+                backend=spec["backend"], workers=workers if spec["multi"] else 1, batch_size=batch_size
+            )
+            load_s = time.perf_counter() - t0
+        except Exception as e:
+            print(f"[encode_bench] {mode} 건너뜀: {e}")
+            continue
+        if embedder.backend != spec["backend"]:
+            print(f"[encode_bench] {mode} 건너뜀: {spec['backend']} 백엔드를 쓸 수 없음")
+            continue
+
+        encode = embedder._model.encode if mode == "baseline" else embedder._encode_local
+        encode(texts[: min(len(texts), batch_size)])  # 워밍업 (프로세스 풀 시작 포함)
+        t0 = time.perf_counter()
+        vecs = np.asarray(encode(texts), dtype="float32")
+        elapsed = time.perf_counter() - t0
+        embedder.close()
+
+        vecs = _normalize(vecs)
+        if reference is None:
+            reference = vecs
+        rows.append(
+            {
+                "mode": mode,
+                "texts_per_s": len(texts) / elapsed if elapsed > 0 else float("inf"),
+                "encode_s": elapsed,
+                "load_s": load_s,
+                "cosine_vs_first": float(np.mean(np.sum(vecs * reference, axis=1))),
+            }
+        )
+    return rows
+
+
+def format_rows(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'mode':<14} {'texts/s':>10} {'encode(s)':>10} {'load(s)':>9} {'cos':>7}"]
+    for r in rows:
+        lines.append(
+            f"{r['mode']:<14} {r['texts_per_s']:>10.1f} {r['encode_s']:>10.2f} {r['load_s']:>9.2f}"
+            f" {r['cosine_vs_first']:>7.4f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="로컬 임베딩 처리량 벤치마크")
+    parser.add_argument("--modes", nargs="+", default=["baseline", "torch", "torch-mp", "onnx", "onnx-int8"],
+                        choices=list(MODES))
+    parser.add_argument("--n", type=int, default=2000, help="인코딩할 리뷰 수")
+    parser.add_argument("--workers", type=int, default=4, help="프로세스 풀 크기 (-mp 모드)")
+    parser.add_argument("--batch-size", type=int, default=32)
+    args = parser.parse_args(argv)
+
+    texts = corpus_texts(args.n)
+    print(f"리뷰 {len(texts)}개, 평균 {np.mean([len(t) for t in texts]):.0f}자")
+    print(format_rows(run_benchmark(texts, args.modes, workers=args.workers, batch_size=args.batch_size)))
+
+
+if __name__ == "__main__":
+    main()
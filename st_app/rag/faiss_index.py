@@ -0,0 +1,356 @@
+from __future__ import annotations
+
+import math
+import os
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from st_app.rag.atomic_io import write_files, write_json
+
+
+# 지원하는 인덱스 종류
+#   flat: 전수 탐색 (IndexFlatIP, 정확)
+#   ivf : IVF-Flat, nprobe개 클러스터만 탐색
+#   hnsw: HNSW 그래프, efSearch로 탐색 폭 조절
+INDEX_TYPES = ("flat", "ivf", "hnsw")
+
+# 벡터 저장 방식 (메모리 상주 코드 크기, dim=384 기준)
+#   flat: float32 원본 (1536B/벡터)
+#   fp16: 16비트 실수 스칼라 양자화 (768B)
+#   sq8 : 차원별 8비트 스칼라 양자화 (384B)
+#   pq  : product quantization, pq_m개 서브벡터 x 8비트 (기본 dim/4 → 96B), flat 구조는 IVF1로 구성
+# 압축 저장 시 rerank>0이면 상위 k*rerank 후보를 원본 float32(RFlat)로 정확히 재정렬합니다.
+# 원본 사본은 mmap 로드 시 디스크/페이지 캐시에 있고 후보 행만 읽힙니다.
+STORAGE_TYPES = ("flat", "fp16", "sq8", "pq")
+_STORAGE_CODECS = {"flat": "Flat", "fp16": "SQfp16", "sq8": "SQ8"}
+
+
+def _env_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    try:
+        return int(value) if value else None
+    except ValueError:
+        return None
+
+
+@dataclass
+class IndexConfig:
+    """FAISS 인덱스 구성 (meta.json에 함께 저장)"""
+
+    index_type: str = "flat"
+    nlist: Optional[int] = None  # None이면 코퍼스 크기에 맞춰 자동 결정
+    nprobe: int = 8
+    hnsw_m: int = 32
+    ef_search: int = 64
+    storage: str = "flat"
+    pq_m: Optional[int] = None  # PQ 서브벡터 수 (None이면 dim/4 이하의 최대 약수)
+    rerank: int = 4             # 압축 저장 시 재정렬 후보 배수 (0이면 재정렬 없음)
+
+    def __post_init__(self) -> None:
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"지원하지 않는 FAISS 인덱스 종류: {self.index_type} (가능: {INDEX_TYPES})")
+        if self.storage not in STORAGE_TYPES:
+            raise ValueError(f"지원하지 않는 벡터 저장 방식: {self.storage} (가능: {STORAGE_TYPES})")
+        if self.index_type == "hnsw" and self.storage == "pq":
+            # IndexHNSWPQ는 내적(코사인) 거리를 지원하지 않음
+            raise ValueError("HNSW 인덱스는 pq 저장 방식을 지원하지 않습니다 (fp16/sq8 사용)")
+
+    @property
+    def refined(self) -> bool:
+        return self.storage != "flat" and self.rerank > 0
+
+    @classmethod
+    def from_env(cls) -> "IndexConfig":
+        """환경변수 FAISS_INDEX_TYPE / FAISS_NLIST / FAISS_NPROBE / FAISS_HNSW_M / FAISS_EF_SEARCH
+        / FAISS_STORAGE / FAISS_PQ_M / FAISS_RERANK"""
+        defaults = cls()
+        return cls(
+            index_type=os.getenv("FAISS_INDEX_TYPE", defaults.index_type).lower(),
+            nlist=_env_int("FAISS_NLIST"),
+            nprobe=_env_int("FAISS_NPROBE") or defaults.nprobe,
+            hnsw_m=_env_int("FAISS_HNSW_M") or defaults.hnsw_m,
+            ef_search=_env_int("FAISS_EF_SEARCH") or defaults.ef_search,
+            storage=os.getenv("FAISS_STORAGE", defaults.storage).lower(),
+            pq_m=_env_int("FAISS_PQ_M"),
+            rerank=defaults.rerank if _env_int("FAISS_RERANK") is None else _env_int("FAISS_RERANK"),
+        )
+
+    @classmethod
+    def from_meta(cls, meta: Dict[str, Any], search: Optional["IndexConfig"] = None) -> "IndexConfig":
+        """meta.json["index"]에 기록된 구조(종류/저장 방식/nlist/M/PQ/재정렬)로 구성.
+
+        nprobe / efSearch처럼 파일과 무관한 검색 시점 파라미터는 search(없으면 환경변수)에서 가져옵니다.
+        """
+        search = search or cls.from_env()
+        structural = ("index_type", "nlist", "hnsw_m", "storage", "pq_m", "rerank")
+        defaults = asdict(cls())
+        values = {name: meta.get(name, defaults[name]) for name in structural}
+        return cls(nprobe=search.nprobe, ef_search=search.ef_search, **values)
+
+    def resolved_nlist(self, num_vectors: int) -> int:
+        """IVF 클러스터 수: 지정값 또는 4*sqrt(n), 클러스터당 학습 벡터가 39개 이상 되도록 제한"""
+        nlist = self.nlist or int(4 * math.sqrt(max(num_vectors, 1)))
+        return max(1, min(nlist, num_vectors // 39 or 1))
+
+    def resolved_pq_m(self, dim: int) -> int:
+        """dim을 나누어떨어지게 하는 PQ 서브벡터 수"""
+        target = min(self.pq_m or max(1, dim // 4), dim)
+        return max(m for m in range(1, target + 1) if dim % m == 0)
+
+    @staticmethod
+    def pq_nbits(num_vectors: int) -> int:
+        """PQ 코드 비트 수: 코드북(2^nbits)마다 학습 벡터가 39개 이상 되도록 작은 코퍼스에서는 줄임"""
+        return max(1, min(8, int(math.log2(max(num_vectors // 39, 2)))))
+
+    def codec(self, num_vectors: int, dim: Optional[int]) -> str:
+        if self.storage != "pq":
+            return _STORAGE_CODECS[self.storage]
+        if not dim:
+            raise ValueError("pq 저장 방식은 벡터 차원이 필요합니다")
+        return f"PQ{self.resolved_pq_m(dim)}x{self.pq_nbits(num_vectors)}"
+
+    def factory_string(self, num_vectors: int, dim: Optional[int] = None) -> str:
+        codec = self.codec(num_vectors, dim)
+        if self.index_type == "ivf":
+            factory = f"IVF{self.resolved_nlist(num_vectors)},{codec}"
+        elif self.index_type == "hnsw":
+            factory = f"HNSW{self.hnsw_m},{codec}"
+        elif self.storage == "pq":
+            # IndexPQ는 IDSelector 필터를 지원하지 않으므로 리스트 1개짜리 IVF(=전수 탐색)로 구성
+            factory = f"IVF1,{codec}"
+        else:
+            factory = codec
+        return factory + ",RFlat" if self.refined else factory
+
+    def to_meta(self, num_vectors: int, dim: Optional[int] = None) -> Dict[str, Any]:
+        meta = asdict(self)
+        meta["factory"] = self.factory_string(num_vectors, dim)
+        return meta
+
+
+def build_index(vecs: np.ndarray, config: IndexConfig, dim: Optional[int] = None, ids: Optional[np.ndarray] = None):
+    """정규화된 벡터로 내적(코사인) 인덱스를 학습/생성.
+
+    벡터는 외부 id(리뷰 id, 없으면 0..n-1)로 저장되어 개별 추가/삭제가 가능합니다.
+    - IVF: 자체적으로 id를 저장하므로 Hashtable direct map만 붙여 id로 복원/삭제
+    - Flat/HNSW: IndexIDMap2로 감싸 id → 내부 위치 매핑
+    """
+    import faiss  # type: ignore
+
+    vecs = np.ascontiguousarray(vecs, dtype="float32")
+    dim = int(dim or vecs.shape[1])
+    ids = np.arange(len(vecs), dtype=np.int64) if ids is None else np.ascontiguousarray(ids, dtype=np.int64)
+    if len(vecs) == 0:
+        config = IndexConfig(index_type="flat")
+    base = faiss.index_factory(dim, config.factory_string(len(vecs), dim), faiss.METRIC_INNER_PRODUCT)
+    if not base.is_trained:
+        base.train(vecs)
+    if isinstance(faiss.downcast_index(base), faiss.IndexIVF):
+        faiss.extract_index_ivf(base).set_direct_map_type(faiss.DirectMap.Hashtable)
+        index = base
+    else:
+        # 재정렬(IndexRefine)로 감싼 IVF도 IDMap2로 id 관리
+        index = faiss.IndexIDMap2(base)
+    if len(vecs):
+        index.add_with_ids(vecs, ids)
+    apply_search_params(index, config)
+    return index
+
+
+def _base_index(index):
+    """IndexIDMap2로 감싼 경우 안쪽 인덱스 반환"""
+    import faiss  # type: ignore
+
+    index = faiss.downcast_index(index)
+    if hasattr(index, "id_map"):
+        return faiss.downcast_index(index.index)
+    return index
+
+
+def _refine_index(index):
+    """재정렬 인덱스(IndexRefine)면 반환, 아니면 None"""
+    import faiss  # type: ignore
+
+    base = _base_index(index)
+    return base if isinstance(base, faiss.IndexRefine) else None
+
+
+def _core_index(index):
+    """IDMap/재정렬 래퍼를 벗긴 실제 탐색 인덱스"""
+    import faiss  # type: ignore
+
+    refine = _refine_index(index)
+    return _base_index(index) if refine is None else faiss.downcast_index(refine.base_index)
+
+
+def supports_ids(index) -> bool:
+    """외부 id로 추가/삭제/복원이 가능한 인덱스인지 (이전 형식은 False)"""
+    import faiss  # type: ignore
+
+    if hasattr(faiss.downcast_index(index), "id_map"):
+        return True
+    ivf = faiss.try_extract_index_ivf(index)
+    return ivf is not None and ivf.direct_map.type == faiss.DirectMap.Hashtable
+
+
+def index_ids(index) -> np.ndarray:
+    """인덱스에 들어 있는 외부 id 전체"""
+    import faiss  # type: ignore
+
+    downcast = faiss.downcast_index(index)
+    if hasattr(downcast, "id_map"):
+        return faiss.vector_to_array(downcast.id_map).astype(np.int64)
+    ivf = faiss.try_extract_index_ivf(index)
+    parts = []
+    for list_no in range(ivf.nlist):
+        size = ivf.invlists.list_size(list_no)
+        if size:
+            parts.append(faiss.rev_swig_ptr(ivf.invlists.get_ids(list_no), size).copy())
+    return np.concatenate(parts).astype(np.int64) if parts else np.empty(0, dtype=np.int64)
+
+
+def add_vectors(index, vecs: np.ndarray, ids: np.ndarray) -> None:
+    if len(ids):
+        index.add_with_ids(np.ascontiguousarray(vecs, dtype="float32"), np.ascontiguousarray(ids, dtype=np.int64))
+
+
+def remove_vectors(index, ids: np.ndarray) -> bool:
+    """id로 벡터 삭제. HNSW처럼 삭제를 지원하지 않으면 False (호출 측에서 재구축)"""
+    import faiss  # type: ignore
+
+    if not len(ids):
+        return True
+    try:
+        index.remove_ids(faiss.IDSelectorArray(np.ascontiguousarray(ids, dtype=np.int64)))
+        return True
+    except RuntimeError:
+        return False
+
+
+def reconstruct_ids(index, ids: np.ndarray) -> np.ndarray:
+    """외부 id 순서대로 저장된 벡터 복원"""
+    ids = np.ascontiguousarray(ids, dtype=np.int64)
+    if not len(ids):
+        return np.zeros((0, index.d), dtype="float32")
+    return index.reconstruct_batch(ids)
+
+
+def apply_search_params(index, config: IndexConfig) -> None:
+    """nprobe / efSearch 같은 검색 시점 파라미터 적용 (저장 파일과 무관)"""
+    import faiss  # type: ignore
+
+    ivf = faiss.try_extract_index_ivf(index)
+    if ivf is not None:
+        ivf.nprobe = min(config.nprobe, ivf.nlist)
+    hnsw = getattr(_core_index(index), "hnsw", None)
+    if hnsw is not None:
+        hnsw.efSearch = config.ef_search
+    refine = _refine_index(index)
+    if refine is not None:
+        refine.k_factor = float(max(config.rerank, 1))
+
+
+def _core_search_parameters(core, config: IndexConfig, selector):
+    import faiss  # type: ignore
+
+    ivf = faiss.try_extract_index_ivf(core)
+    if ivf is not None:
+        return faiss.SearchParametersIVF(sel=selector, nprobe=min(config.nprobe, ivf.nlist))
+    if getattr(core, "hnsw", None) is not None:
+        return faiss.SearchParametersHNSW(sel=selector, efSearch=config.ef_search)
+    return None if selector is None else faiss.SearchParameters(sel=selector)
+
+
+def id_selector(index, allowed_ids: np.ndarray):
+    """허용된 외부 id 집합 → 인덱스 탐색 안에서 쓸 IDSelectorBatch.
+
+    만드는 비용이 허용 id 수(재정렬 인덱스는 전체 벡터 수)에 비례하므로, 호출하는 쪽에서
+    필터별로 한 번 만들어 같은 인덱스에 대해 재사용합니다.
+    재정렬 인덱스는 IDMap2가 바깥 selector를 안쪽 탐색에 넘기지 않으므로 내부 위치 기준으로 만듭니다.
+    """
+    import faiss  # type: ignore
+
+    ids = np.ascontiguousarray(allowed_ids, dtype=np.int64)
+    if _refine_index(index) is not None:
+        id_map = faiss.vector_to_array(faiss.downcast_index(index).id_map)
+        ids = np.flatnonzero(np.isin(id_map, ids)).astype(np.int64)
+    return faiss.IDSelectorBatch(ids)
+
+
+def search_parameters(index, config: IndexConfig, selector=None):
+    """id_selector로 만든 selector를 인덱스 탐색 안에 적용하는 SearchParameters (질의마다 만들어도 가벼움).
+
+    반환값 (params, refs): refs(selector 등)는 검색이 끝날 때까지 참조를 유지해야 합니다.
+    """
+    import faiss  # type: ignore
+
+    if _refine_index(index) is None:
+        if selector is None:
+            return None, None
+        return _core_search_parameters(_core_index(index), config, selector), selector
+
+    base_params = _core_search_parameters(_core_index(index), config, selector)
+    params = faiss.IndexRefineSearchParameters(k_factor=float(max(config.rerank, 1)), base_index_params=base_params)
+    return params, (selector, base_params)
+
+
+def index_memory(index) -> Dict[str, float]:
+    """벡터당 메모리(바이트): resident는 탐색용 코드, rerank는 재정렬용 float32 원본.
+
+    벡터당 바이트 = 리뷰 100만 개당 MB.
+    """
+    import faiss  # type: ignore
+
+    n = max(int(index.ntotal), 1)
+    total = float(faiss.serialize_index(index).nbytes)
+    refine = _refine_index(index)
+    rerank = float(refine.refine_index.ntotal * refine.refine_index.d * 4) if refine is not None else 0.0
+    return {"resident": (total - rerank) / n, "rerank": rerank / n}
+
+
+def read_index(path: str, mmap: bool = False):
+    """인덱스 파일 로드.
+
+    mmap=True면 벡터/그래프 데이터를 복사하지 않고 파일을 읽기 전용으로 메모리 매핑합니다.
+    매핑된 페이지는 OS 페이지 캐시를 공유하므로 같은 파일을 여는 워커 N개가 사본 1개 분량만 씁니다.
+    매핑된 인덱스는 수정(add/remove)하면 안 되며, 수정 전에는 mmap=False로 다시 읽어야 합니다.
+    """
+    import faiss  # type: ignore
+
+    if not mmap:
+        return faiss.read_index(path)
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None)
+    if flag is None:
+        # 예전 faiss의 IO_FLAG_MMAP은 IVF 역리스트만 매핑하므로 Flat/HNSW 코드는 워커마다 메모리에 올라감
+        _warn_once(
+            "mmap",
+            f"faiss {getattr(faiss, '__version__', '?')}에 IO_FLAG_MMAP_IFC가 없어 IO_FLAG_MMAP으로 로드합니다. "
+            "Flat/HNSW 인덱스는 메모리 매핑되지 않고 프로세스마다 전체가 메모리에 올라갑니다 (faiss-cpu 업그레이드 필요).",
+        )
+        flag = faiss.IO_FLAG_MMAP
+    return faiss.read_index(path, flag | faiss.IO_FLAG_READ_ONLY)
+
+
+_WARNED: set = set()
+
+
+def _warn_once(key: str, message: str) -> None:
+    if key not in _WARNED:
+        _WARNED.add(key)
+        print(f"[faiss] 경고: {message}")
+
+
+def publish_index(index_dir: str, index, meta: Dict[str, Any]) -> Dict[str, str]:
+    """index.faiss / meta.json 저장 (파일 경로 반환).
+
+    각 파일을 고유한 임시 파일에 다 쓴 뒤 os.replace로 교체하므로 읽는 쪽은 반쯤 쓴 파일을 보지 않습니다.
+    여러 프로세스가 같은 디렉토리에 저장할 수 있으면 호출하는 쪽에서 dir_lock으로 감싸세요.
+    메타를 마지막에 교체해, 새 메타가 보이면 그에 맞는 인덱스도 이미 제자리에 있습니다.
+    """
+    import faiss  # type: ignore
+
+    paths = {"index": os.path.join(index_dir, "index.faiss"), "meta": os.path.join(index_dir, "meta.json")}
+    write_files([(paths["index"], lambda tmp: faiss.write_index(index, tmp)), (paths["meta"], write_json(meta))])
+    return paths
@@ -0,0 +1,190 @@
+"""FAISS 인덱스 종류별 recall@k / 질의 지연시간 / 메모리 벤치마크.
+
+flat(전수 탐색) 결과를 정답으로 두고 IVF(nprobe별), HNSW(efSearch별), 압축 저장
+(fp16/sq8/pq, 재정렬 유무별)의 recall@k와 p50/p99 지연시간, 학습·구축 시간,
+리뷰 100만 개당 메모리(MB, 탐색 코드 + 재정렬용 원본)를 출력합니다.
+
+사용 예:
+    python -m st_app.rag.index_bench --local --k 10
+    python -m st_app.rag.index_bench --synthetic 200000 --dim 384 --nprobe 1 8 32 --ef-search 16 64 256
+    python -m st_app.rag.index_bench --synthetic 100000 --storage fp16 sq8 pq --rerank 4
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+from st_app.rag.faiss_index import IndexConfig, apply_search_params, build_index, index_memory
+
+
+def _normalize(vecs: np.ndarray) -> np.ndarray:
+    vecs = np.asarray(vecs, dtype="float32")
+    return np.ascontiguousarray(vecs / (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-8))
+
+
+def synthetic_vectors(n: int, dim: int, seed: int = 0, n_clusters: int = 256) -> np.ndarray:
+    """군집 구조가 있는 임의 정규화 벡터 (대규모 코퍼스 모의용)"""
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((n_clusters, dim)).astype("float32")
+    labels = rng.integers(0, n_clusters, size=n)
+    vecs = centers[labels] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    return _normalize(vecs)
+
+
+def corpus_vectors(use_api: bool) -> np.ndarray:
+    """번들된 리뷰 CSV를 임베딩 (디스크 임베딩 캐시 사용)"""
+    from st_app.rag.embedder import DEFAULT_EMBEDDING_CACHE_DIR, get_embedder
+    from st_app.rag.retriever import _database_dir
+    from st_app.rag.store import load_review_store
+
+    store = load_review_store(_database_dir())
+    cache_dir = os.getenv("EMBEDDING_CACHE_DIR", DEFAULT_EMBEDDING_CACHE_DIR)
+    embedder = get_embedder(use_api=use_api, cache_dir=cache_dir)
+    return _normalize(embedder.encode(store.texts))
+
+
+def make_queries(vecs: np.ndarray, n_queries: int, seed: int = 1, noise: float = 0.3) -> np.ndarray:
+    """코퍼스 벡터에 잡음을 섞어 질의 벡터 생성"""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(vecs), size=n_queries)
+    noisy = vecs[picks] + noise * rng.standard_normal((n_queries, vecs.shape[1])).astype("float32") / np.sqrt(vecs.shape[1])
+    return _normalize(noisy)
+
+
+def recall_at_k(truth: np.ndarray, found: np.ndarray) -> float:
+    """정답 상위 k개 중 찾은 비율의 평균"""
+    k = truth.shape[1]
+    hits = sum(len(set(t[t >= 0]) & set(f[f >= 0])) for t, f in zip(truth, found))
+    return hits / float(k * len(truth))
+
+
+def _search_one_by_one(index, queries: np.ndarray, k: int):
+    ids = np.empty((len(queries), k), dtype=np.int64)
+    latencies = np.empty(len(queries), dtype=np.float64)
+    for i in range(len(queries)):
+        t0 = time.perf_counter()
+        _, found = index.search(queries[i : i + 1], k)
+        latencies[i] = time.perf_counter() - t0
+        ids[i] = found[0]
+    return ids, latencies
+
+
+def run_benchmark(
+    vecs: np.ndarray,
+    queries: np.ndarray,
+    k: int = 10,
+    nprobes: Sequence[int] = (1, 4, 16),
+    ef_searches: Sequence[int] = (16, 64, 128),
+    hnsw_m: int = 32,
+    nlist: Optional[int] = None,
+    storages: Sequence[str] = (),
+    rerank: int = 4,
+) -> List[Dict[str, Any]]:
+    """인덱스 종류/파라미터별 측정 결과 목록 반환"""
+    k = min(k, len(vecs))
+    dim = vecs.shape[1]
+    rows: List[Dict[str, Any]] = []
+
+    def _measure(label: str, index, config: IndexConfig, build_s: float, truth=None):
+        apply_search_params(index, config)
+        ids, lat = _search_one_by_one(index, queries, k)
+        memory = index_memory(index)
+        rows.append(
+            {
+                "index": label,
+                "recall": 1.0 if truth is None else recall_at_k(truth, ids),
+                "p50_ms": float(np.percentile(lat, 50) * 1000),
+                "p99_ms": float(np.percentile(lat, 99) * 1000),
+                "build_s": build_s,
+                "mb_per_1m": memory["resident"],
+                "rerank_mb_per_1m": memory["rerank"],
+            }
+        )
+        return ids
+
+    def _build(config: IndexConfig):
+        t0 = time.perf_counter()
+        index = build_index(vecs, config)
+        return index, time.perf_counter() - t0
+
+    flat_cfg = IndexConfig(index_type="flat")
+    flat, build_s = _build(flat_cfg)
+    truth = _measure("flat", flat, flat_cfg, build_s)
+
+    ivf_cfg = IndexConfig(index_type="ivf", nlist=nlist)
+    ivf, build_s = _build(ivf_cfg)
+    for nprobe in nprobes:
+        cfg = IndexConfig(index_type="ivf", nlist=nlist, nprobe=nprobe)
+        _measure(f"{cfg.factory_string(len(vecs))} nprobe={nprobe}", ivf, cfg, build_s, truth)
+
+    hnsw_cfg = IndexConfig(index_type="hnsw", hnsw_m=hnsw_m)
+    hnsw, build_s = _build(hnsw_cfg)
+    for ef in ef_searches:
+        cfg = IndexConfig(index_type="hnsw", hnsw_m=hnsw_m, ef_search=ef)
+        _measure(f"{cfg.factory_string(len(vecs))} efSearch={ef}", hnsw, cfg, build_s, truth)
+
+    # 압축 저장: 재정렬 없이 / 원본 재정렬 포함
+    for storage in storages:
+        for rr in sorted({0, rerank}):
+            cfg = IndexConfig(index_type="flat", storage=storage, rerank=rr)
+            index, build_s = _build(cfg)
+            _measure(cfg.factory_string(len(vecs), dim), index, cfg, build_s, truth)
+
+    return rows
+
+
+def format_rows(rows: List[Dict[str, Any]], k: int) -> str:
+    lines = [
+        f"{'index':<32} {'recall@' + str(k):>10} {'p50(ms)':>9} {'p99(ms)':>9} {'build(s)':>9}"
+        f" {'MB/1M':>9} {'+rerank':>9}"
+    ]
+    for r in rows:
+        lines.append(
+            f"{r['index']:<32} {r['recall']:>10.4f} {r['p50_ms']:>9.3f} {r['p99_ms']:>9.3f} {r['build_s']:>9.2f}"
+            f" {r['mb_per_1m']:>9.0f} {r['rerank_mb_per_1m']:>9.0f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="FAISS 인덱스 recall/지연시간 벤치마크")
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[16, 64, 128])
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--nlist", type=int, default=None)
+    parser.add_argument("--storage", nargs="*", default=["fp16", "sq8", "pq"], help="비교할 압축 저장 방식")
+    parser.add_argument("--rerank", type=int, default=4, help="압축 저장 재정렬 후보 배수")
+    parser.add_argument("--synthetic", type=int, default=0, help="N>0이면 리뷰 대신 N개의 모의 벡터 사용")
+    parser.add_argument("--dim", type=int, default=384, help="모의 벡터 차원")
+    parser.add_argument("--local", action="store_true", help="API 대신 로컬 임베딩 모델 사용")
+    args = parser.parse_args(argv)
+
+    if args.synthetic > 0:
+        vecs = synthetic_vectors(args.synthetic, args.dim)
+    else:
+        vecs = corpus_vectors(use_api=not args.local)
+    queries = make_queries(vecs, args.queries)
+    print(f"코퍼스 {len(vecs)}개 x {vecs.shape[1]}차원, 질의 {len(queries)}개")
+
+    rows = run_benchmark(
+        vecs,
+        queries,
+        k=args.k,
+        nprobes=args.nprobe,
+        ef_searches=args.ef_search,
+        hnsw_m=args.hnsw_m,
+        nlist=args.nlist,
+        storages=args.storage,
+        rerank=args.rerank,
+    )
+    print(format_rows(rows, args.k))
+
+
+if __name__ == "__main__":
+    main()
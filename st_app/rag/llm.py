@@ -1,7 +1,9 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Optional
+from typing import Any
+
+from st_app.rag.singleton import SingleFlight
 
 
 # 1) 우선 LangChain-Upstage 사용 시도
@@ -70,7 +72,7 @@ class _HttpUpstageClient:
         return type("LLMResult", (), {"content": content})()
 
 
-_CACHED: Optional[Any] = None
+_CACHED: SingleFlight[Any] = SingleFlight()
 
 
 def get_llm() -> Any:
@@ -78,10 +80,10 @@ def get_llm() -> Any:
 
     - 환경변수: UPSTAGE_API_KEY (필수), UPSTAGE_MODEL, UPSTAGE_TEMPERATURE, UPSTAGE_BASE_URL
     """
-    global _CACHED
-    if _CACHED is not None:
-        return _CACHED
+    return _CACHED.get(_create_llm)
+
 
+def _create_llm() -> Any:
     api_key = os.getenv("UPSTAGE_API_KEY")
     if not api_key:
         raise RuntimeError("UPSTAGE_API_KEY is not set in environment")
@@ -99,11 +101,9 @@ def get_llm() -> Any:
         temperature = 0.2
 
     if _HAS_LANGCHAIN_UPSTAGE:
-        _CACHED = _LangChainUpstageWrapper(api_key=api_key, model=model, temperature=temperature)
-        return _CACHED
+        return _LangChainUpstageWrapper(api_key=api_key, model=model, temperature=temperature)
 
     base_url = os.getenv("UPSTAGE_BASE_URL", "https://api.upstage.ai")
-    _CACHED = _HttpUpstageClient(api_key=api_key, model=model, base_url=base_url, temperature=temperature)
-    return _CACHED
+    return _HttpUpstageClient(api_key=api_key, model=model, base_url=base_url, temperature=temperature)
 
 
@@ -0,0 +1,50 @@
+"""임베딩 모델별 차원 레지스트리.
+
+알려진 모델은 시작할 때 테스트 문장을 임베딩(API 왕복/모델 추론)하지 않고 차원을 정합니다.
+레지스트리에 없는 모델은 같은 모델로 만든 인덱스의 meta.json(model/dim)에 기록된 차원을 쓰고,
+둘 다 없을 때만 한 번 인코딩해 확인합니다. 가정한 차원은 실제 첫 배치에서 검증합니다.
+"""
+from __future__ import annotations
+
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+MODEL_DIMENSIONS: Dict[str, int] = {
+    # Upstage Solar 임베딩
+    "solar-1-mini-embedding": 4096,
+    "solar-1-mini-embedding-query": 4096,
+    "solar-1-mini-embedding-passage": 4096,
+    "solar-embedding-1-large": 4096,
+    "solar-embedding-1-large-query": 4096,
+    "solar-embedding-1-large-passage": 4096,
+    "embedding-query": 4096,
+    "embedding-passage": 4096,
+    # Sentence-Transformers (로컬 폴백)
+    "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2": 384,
+    "sentence-transformers/paraphrase-multilingual-mpnet-base-v2": 768,
+    "sentence-transformers/all-MiniLM-L6-v2": 384,
+}
+
+
+def known_dimension(model: Optional[str]) -> Optional[int]:
+    """레지스트리에 등록된 차원 (백엔드 접미사 '#onnx' 등과 'sentence-transformers/' 접두사는 무시)"""
+    if not model:
+        return None
+    name = model.split("#", 1)[0]
+    dim = MODEL_DIMENSIONS.get(name)
+    if dim is None and "/" not in name:
+        dim = MODEL_DIMENSIONS.get(f"sentence-transformers/{name}")
+    return dim
+
+
+def check_dimension(model: str, expected: Optional[int], vecs: Any) -> None:
+    """실제 임베딩 차원이 가정한 차원과 다르면 RuntimeError (잘못된 차원으로 인덱스/캐시를 만들지 않음)"""
+    vecs = np.asarray(vecs)
+    if expected is None or vecs.ndim != 2 or not len(vecs) or vecs.shape[1] == expected:
+        return
+    raise RuntimeError(
+        f"{model} 임베딩 차원 불일치: 예상 {expected}, 실제 {vecs.shape[1]} "
+        "(st_app/rag/model_registry.py 또는 인덱스 meta.json의 dim 확인)"
+    )
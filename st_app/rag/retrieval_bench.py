@@ -0,0 +1,277 @@
+"""번들 리뷰 CSV(database/preprocessed_reviews_*.csv) 기반 검색 품질/지연시간 벤치마크.
+
+라벨 질의 세트(st_app/db/retrieval_bench_queries.json)의 각 질의는 관련 리뷰를 키워드로
+정의합니다(키워드 중 하나라도 포함하면 관련 문서). 검색기별로
+recall@k(관련 문서 수가 k보다 적으면 그 수로 나눔), MRR, 구축 시간, 상주 메모리,
+질의 지연시간 p50/p95/p99를 출력합니다.
+
+사용 예:
+    python -m st_app.rag.retrieval_bench --embedder stub          # 오프라인 (해싱 임베딩)
+    python -m st_app.rag.retrieval_bench --retrievers tfidf bm25 faiss --embedder local --k 5 10
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import types
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from st_app.rag.bm25 import BM25Retriever
+from st_app.rag.cache import LRUCache
+from st_app.rag.dedup import collapse_duplicates
+from st_app.rag.faiss_index import IndexConfig, index_memory
+from st_app.rag.retriever import FaissRetriever, NumpyDenseRetriever, TfIdfRetriever, _database_dir
+from st_app.rag.sharded import ShardedRetriever
+from st_app.rag.store import DocumentStore, load_review_store
+
+
+DEFAULT_QUERIES = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), "..", "db", "retrieval_bench_queries.json")
+)
+
+
+@dataclass(frozen=True)
+class LabeledQuery:
+    query: str
+    relevant_keywords: Tuple[str, ...]
+
+    def relevant_ids(self, store: DocumentStore) -> Set[int]:
+        """키워드를 하나라도 포함한 (삭제되지 않은) 리뷰의 review id"""
+        ids = store.review_ids
+        return {
+            int(ids[i])
+            for i in store.alive_positions()
+            if any(kw in store.text(int(i)) for kw in self.relevant_keywords)
+        }
+
+
+def load_queries(path: Optional[str] = None) -> List[LabeledQuery]:
+    with open(path or DEFAULT_QUERIES, encoding="utf-8") as f:
+        items = json.load(f)
+    return [LabeledQuery(item["query"], tuple(item["relevant_keywords"])) for item in items]
+
+
+def recall_at_k(found: Sequence[int], relevant: Set[int], k: int) -> float:
+    """상위 k개 중 관련 문서 수 / min(k, 관련 문서 수)"""
+    if not relevant:
+        return 0.0
+    return len(set(found[:k]) & relevant) / float(min(k, len(relevant)))
+
+
+def reciprocal_rank(found: Sequence[int], relevant: Set[int]) -> float:
+    for rank, rid in enumerate(found, 1):
+        if rid in relevant:
+            return 1.0 / rank
+    return 0.0
+
+
+def make_embedder(kind: str) -> Any:
+    """stub: 해싱 임베딩(오프라인), local: Sentence-Transformers, api: Upstage"""
+    from st_app.rag.embedder import HashingEmbedder, SentenceTransformerEmbedder, UpstageEmbedder
+
+    if kind == "stub":
+        return HashingEmbedder()
+    if kind == "local":
+        return SentenceTransformerEmbedder()
+    if kind == "api":
+        return UpstageEmbedder()
+    raise ValueError(f"unknown embedder: {kind}")
+
+
+def _faiss(config: IndexConfig) -> Callable[[DocumentStore, Callable[[], Any]], Any]:
+    def build(store: DocumentStore, embedder: Callable[[], Any]) -> FaissRetriever:
+        return FaissRetriever(store, embedder=embedder(), index_config=config)
+
+    return build
+
+
+def _sharded_faiss(store: DocumentStore, embedder: Callable[[], Any]) -> ShardedRetriever:
+    # 샤드끼리 모델과 질의 임베딩 캐시를 공유 (질의는 샤드 수와 관계없이 한 번만 임베딩)
+    model, query_cache = embedder(), LRUCache(maxsize=64)
+    return ShardedRetriever(
+        store,
+        factory=lambda shard, site: FaissRetriever(shard, embedder=model, query_cache=query_cache),
+    )
+
+
+# 이름 -> (저장소, 임베딩 모델 getter) -> 검색기. 새 검색기는 여기에 추가
+RETRIEVERS: Dict[str, Callable[[DocumentStore, Callable[[], Any]], Any]] = {
+    "tfidf": lambda store, embedder: TfIdfRetriever(store),
+    "bm25": lambda store, embedder: BM25Retriever(store),
+    "faiss": _faiss(IndexConfig(index_type="flat")),
+    "faiss-hnsw": _faiss(IndexConfig(index_type="hnsw")),
+    "faiss-sq8": _faiss(IndexConfig(index_type="flat", storage="sq8")),
+    "numpy": lambda store, embedder: NumpyDenseRetriever(store, embedder=embedder()),
+    "numpy-fp16": lambda store, embedder: NumpyDenseRetriever(store, embedder=embedder(), dtype="float16"),
+    "sharded-faiss": _sharded_faiss,
+    "sharded-bm25": lambda store, embedder: ShardedRetriever(store),
+}
+
+
+def memory_footprint(obj: Any) -> int:
+    """검색기가 붙잡고 있는 배열/희소 행렬/FAISS 인덱스/파이썬 컨테이너의 대략적인 바이트 수.
+
+    임베딩 모델(encode가 있는 객체)은 검색기끼리 공유하므로 제외합니다.
+    """
+    seen: Set[int] = set()
+
+    def size(o: Any) -> int:
+        if id(o) in seen or o is None:
+            return 0
+        seen.add(id(o))
+        if isinstance(o, np.ndarray):
+            return int(o.nbytes) if o.base is None else size(o.base)
+        if sparse.issparse(o):
+            return sum(size(getattr(o, a, None)) for a in ("data", "indices", "indptr"))
+        if hasattr(o, "ntotal") and hasattr(o, "d"):  # faiss.Index
+            memory = index_memory(o)
+            return int((memory["resident"] + memory["rerank"]) * o.ntotal)
+        if isinstance(o, (types.ModuleType, type, threading.Thread)) or callable(getattr(o, "encode", None)):
+            return 0
+        if isinstance(o, (str, bytes, int, float, bool)):
+            return sys.getsizeof(o)
+        if isinstance(o, dict):
+            return sys.getsizeof(o) + sum(size(k) + size(v) for k, v in o.items())
+        if isinstance(o, (list, tuple, set, frozenset)):
+            return sys.getsizeof(o) + sum(size(v) for v in o)
+        attrs = getattr(o, "__dict__", None)
+        if attrs is None:
+            return sys.getsizeof(o)
+        return sys.getsizeof(o) + size(attrs)
+
+    return size(obj)
+
+
+def _percentiles_ms(latencies: Sequence[float]) -> Dict[str, float]:
+    lat = np.asarray(latencies, dtype=np.float64) * 1000
+    return {f"p{p}_ms": float(np.percentile(lat, p)) for p in (50, 95, 99)}
+
+
+def evaluate(
+    retriever: Any,
+    store: DocumentStore,
+    queries: Sequence[LabeledQuery],
+    ks: Sequence[int] = (5, 10),
+    repeat: int = 3,
+) -> Dict[str, float]:
+    """recall@k, MRR(@max k), 질의 지연시간 백분위수"""
+    depth = max(ks)
+    recalls = {k: [] for k in ks}
+    rrs: List[float] = []
+    latencies: List[float] = []
+    # 매 측정 전에 질의 임베딩 캐시를 비워 임베딩 비용까지 측정
+    query_cache = getattr(retriever, "query_cache", None)
+    for q in queries:
+        relevant = q.relevant_ids(store)
+        docs: List[Any] = []
+        for _ in range(max(1, repeat)):
+            if query_cache is not None:
+                query_cache.clear()
+            t0 = time.perf_counter()
+            docs = retriever.get_relevant_documents(q.query, k=depth)
+            latencies.append(time.perf_counter() - t0)
+        found = [d.review_id for d in docs]
+        for k in ks:
+            recalls[k].append(recall_at_k(found, relevant, k))
+        rrs.append(reciprocal_rank(found, relevant))
+
+    row: Dict[str, float] = {f"recall@{k}": float(np.mean(recalls[k])) for k in ks}
+    row["mrr"] = float(np.mean(rrs))
+    row.update(_percentiles_ms(latencies))
+    return row
+
+
+def load_benchmark_store(database_dir: Optional[str] = None, dedup: bool = True) -> DocumentStore:
+    """번들 CSV 저장소 (증분 기록은 적용하지 않아 매번 같은 코퍼스)"""
+    store = load_review_store(database_dir or _database_dir())
+    return collapse_duplicates(store) if dedup else store
+
+
+def run_benchmark(
+    store: DocumentStore,
+    queries: Sequence[LabeledQuery],
+    retrievers: Sequence[str] = ("tfidf", "bm25", "faiss"),
+    ks: Sequence[int] = (5, 10),
+    embedder: str = "stub",
+    repeat: int = 3,
+) -> List[Dict[str, Any]]:
+    """검색기별 측정 결과 목록. 만들 수 없는 검색기(모델 미설치 등)는 건너뜀"""
+    shared: Dict[str, Any] = {"load_s": 0.0}
+
+    def get_embedder() -> Any:
+        # 모델은 한 번만 만들어 공유하고, 로딩 시간은 구축 시간에서 뺌
+        if "model" not in shared:
+            t0 = time.perf_counter()
+            shared["model"] = make_embedder(embedder)
+            shared["load_s"] += time.perf_counter() - t0
+        return shared["model"]
+
+    rows: List[Dict[str, Any]] = []
+    for name in retrievers:
+        build = RETRIEVERS[name]
+        try:
+            load_before = shared["load_s"]
+            t0 = time.perf_counter()
+            retriever = build(store, get_embedder)
+            build_s = time.perf_counter() - t0 - (shared["load_s"] - load_before)
+        except Exception as e:
+            print(f"[bench] {name} 건너뜀: {e}")
+            continue
+        row: Dict[str, Any] = {
+            "retriever": name,
+            "build_s": build_s,
+            "memory_mb": memory_footprint(retriever) / 1e6,
+        }
+        row.update(evaluate(retriever, store, queries, ks=ks, repeat=repeat))
+        rows.append(row)
+        del retriever
+    return rows
+
+
+def format_rows(rows: List[Dict[str, Any]], ks: Sequence[int]) -> str:
+    recall_cols = [f"recall@{k}" for k in ks]
+    lines = [
+        f"{'retriever':<14}"
+        + "".join(f" {c:>10}" for c in recall_cols)
+        + f" {'MRR':>7} {'build(s)':>9} {'mem(MB)':>8} {'p50(ms)':>8} {'p95(ms)':>8} {'p99(ms)':>8}"
+    ]
+    for r in rows:
+        lines.append(
+            f"{r['retriever']:<14}"
+            + "".join(f" {r[c]:>10.4f}" for c in recall_cols)
+            + f" {r['mrr']:>7.4f} {r['build_s']:>9.2f} {r['memory_mb']:>8.1f}"
+            f" {r['p50_ms']:>8.2f} {r['p95_ms']:>8.2f} {r['p99_ms']:>8.2f}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="리뷰 검색 품질/지연시간 벤치마크")
+    parser.add_argument("--retrievers", nargs="+", default=["tfidf", "bm25", "faiss"], choices=sorted(RETRIEVERS))
+    parser.add_argument("--k", type=int, nargs="+", default=[5, 10])
+    parser.add_argument("--embedder", choices=["stub", "local", "api"], default="local",
+                        help="FAISS 검색기 임베딩 (stub이면 네트워크/모델 없이 해싱 임베딩)")
+    parser.add_argument("--repeat", type=int, default=3, help="질의별 반복 횟수 (지연시간 표본)")
+    parser.add_argument("--queries", default=None, help="라벨 질의 JSON 경로")
+    parser.add_argument("--database-dir", default=None, help="preprocessed_reviews_*.csv 디렉토리")
+    parser.add_argument("--no-dedup", action="store_true", help="준중복 리뷰 묶기 없이 측정")
+    args = parser.parse_args(argv)
+
+    store = load_benchmark_store(args.database_dir, dedup=not args.no_dedup)
+    queries = load_queries(args.queries)
+    print(f"리뷰 {len(store)}개, 라벨 질의 {len(queries)}개, 임베딩 {args.embedder}")
+
+    rows = run_benchmark(store, queries, retrievers=args.retrievers, ks=args.k, embedder=args.embedder, repeat=args.repeat)
+    print(format_rows(rows, args.k))
+
+
+if __name__ == "__main__":
+    main()
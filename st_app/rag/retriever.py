@@ -1,22 +1,128 @@
 from __future__ import annotations
 
+import contextlib
 import os
 import json
+import threading
 from typing import List, Dict, Any, Optional
 
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import numpy as np
+from scipy import sparse
+from sklearn.preprocessing import normalize
 
-from st_app.rag.embedder import TfidfEmbedder, get_embedder
+from st_app.rag.atomic_io import dir_lock, write_binary, write_files, write_json
+from st_app.rag.bm25 import BM25Retriever
+from st_app.rag.cache import LRUCache, normalize_query
+from st_app.rag.dedup import collapse_duplicates
+from st_app.rag.sharded import ShardedRetriever
+from st_app.rag.singleton import SingleFlight
+from st_app.rag.embedder import (
+    DEFAULT_EMBEDDING_CACHE_DIR,
+    TfidfEmbedder,
+    UpstageEmbedder,
+    get_embedder,
+)
+from st_app.rag.faiss_index import (
+    IndexConfig,
+    add_vectors,
+    apply_search_params,
+    build_index,
+    id_selector,
+    index_ids,
+    publish_index,
+    read_index,
+    reconstruct_ids,
+    remove_vectors,
+    search_parameters,
+    supports_ids,
+)
+from st_app.rag.store import (
+    DeltaLog,
+    DocumentStore,
+    RetrievedDocument,
+    ReviewFilter,
+    as_document_store,
+    load_review_store,
+    top_k_indices,
+)
 
 
-class RetrievedDocument:
-    """검색된 문서를 나타내는 클래스"""
-    
-    def __init__(self, page_content: str, metadata: Dict[str, Any], score: float):
-        self.page_content = page_content
-        self.metadata = metadata
-        self.score = score
+# build_index CLI와 get_faiss_retriever가 함께 쓰는 인덱스 디렉토리
+DEFAULT_FAISS_INDEX_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "db", "faiss_index"))
+
+
+def l2_normalize(vecs: np.ndarray) -> np.ndarray:
+    vecs = np.asarray(vecs, dtype="float32")
+    return np.ascontiguousarray(vecs / (np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-8))
+
+
+def _env_flag(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    return value.strip().lower() not in ("0", "false", "no", "off")
+
+
+def embedder_id(embedder: Any) -> str:
+    """인덱스 호환성 검사에 쓰는 임베딩 모델 식별자"""
+    return str(getattr(embedder, "model", None) or type(embedder).__name__)
+
+
+def _default_embedder(use_api: bool, cache_dir: Optional[str]) -> Any:
+    """임베딩 모델 선택 (API 우선, 실패 시 로컬 폴백)"""
+    try:
+        embedder = get_embedder(use_api=use_api, cache_dir=cache_dir)
+        print(f"임베딩 모델 사용: {'API' if use_api else '로컬'}")
+        return embedder
+    except Exception as e:
+        print(f"API 임베딩 실패, 로컬 모델로 폴백: {e}")
+        return get_embedder(use_api=False, cache_dir=cache_dir)
+
+
+def _encode_queries(embedder: Any, embedder_id: str, cache: LRUCache, queries: List[str]) -> np.ndarray:
+    """정규화된 질의 벡터. 같은 모델로 임베딩한 적 있는 질의는 캐시에서 읽음"""
+    texts = [normalize_query(q) for q in queries]
+    vecs: List[Optional[np.ndarray]] = [cache.get((embedder_id, t)) for t in texts]
+    missing = sorted({t for t, v in zip(texts, vecs) if v is None})
+    if missing:
+        encoded = l2_normalize(embedder.encode(missing, use_cache=False))
+        fresh = dict(zip(missing, encoded))
+        for text, vec in fresh.items():
+            vec.setflags(write=False)
+            cache.put((embedder_id, text), vec)
+        vecs = [fresh[t] if v is None else v for t, v in zip(texts, vecs)]
+    return np.ascontiguousarray(np.stack(vecs), dtype="float32")
+
+
+def resolve_dimension(embedder: Any, meta: Optional[Dict[str, Any]] = None) -> int:
+    """임베딩 호출 없이 차원 결정.
+
+    모델 설정/레지스트리(model_registry)로 아는 차원 → 같은 모델로 만든 인덱스 meta의 dim 순서로 쓰고,
+    둘 다 없을 때만 embedder.dimension(테스트 임베딩)으로 확인합니다.
+    """
+    known = getattr(embedder, "known_dimension", None)
+    if known:
+        return int(known)
+    if meta and meta.get("model") == embedder_id(embedder) and meta.get("dim"):
+        dim = int(meta["dim"])
+        assume = getattr(embedder, "assume_dimension", None)
+        if callable(assume):
+            assume(dim)
+            return dim
+    return int(embedder.dimension)
+
+
+def index_meta(store: DocumentStore, embedder: Any, dim: int, config: IndexConfig) -> Dict[str, Any]:
+    """meta.json 내용 (서빙 시 재사용 여부 판단: 코퍼스 지문/모델/차원/인덱스 구성)"""
+    num_texts = store.num_alive
+    return {
+        "num_texts": num_texts,
+        "dim": dim,
+        "model": embedder_id(embedder),
+        "embedder_type": "api" if isinstance(embedder, UpstageEmbedder) else "local",
+        "corpus_fingerprint": store.fingerprint(),
+        "index": config.to_meta(num_texts, dim),
+    }
 
 
 def _load_review_texts(base_dir: str) -> List[RetrievedDocument]:
@@ -49,91 +155,225 @@ def _load_review_texts(base_dir: str) -> List[RetrievedDocument]:
     
     print("MongoDB 연결 비활성화 - CSV 파일 사용")
     
-    # 로컬 파일에서 데이터 로드 시도
+    # 로컬 파일에서 데이터 로드 (필요한 컬럼만 읽는 컬럼형 로더)
     if not docs:
-        try:
-            # CSV 파일들에서 데이터 로드
-            csv_files = [
-                ("preprocessed_reviews_yes24.csv", "yes24"),
-                ("preprocessed_reviews_aladin.csv", "aladin"), 
-                ("preprocessed_reviews_kyobo.csv", "kyobo")
-            ]
-            
-            import pandas as pd
-            for csv_file, site in csv_files:
-                file_path = os.path.join(base_dir, csv_file)
-                if os.path.exists(file_path):
-                    try:
-                        df = pd.read_csv(file_path, encoding='utf-8')
-                        # 텍스트 컬럼 찾기 (다양한 컬럼명 대응)
-                        text_col = None
-                        for col in ['text', 'review_text', 'content', 'review']:
-                            if col in df.columns:
-                                text_col = col
-                                break
-                        
-                        if text_col:
-                            for _, row in df.iterrows():
-                                text = str(row[text_col]).strip()
-                                if text and len(text) > 10 and text != 'nan':
-                                    metadata = {
-                                        "source": site,
-                                        "score": float(row.get('score', 0)) if 'score' in df.columns else 0,
-                                        "date": str(row.get('date', '')) if 'date' in df.columns else '',
-                                        "site": site
-                                    }
-                                    docs.append(RetrievedDocument(text, metadata, 0.0))
-                    except Exception as e:
-                        print(f"CSV 파일 {csv_file} 로드 실패: {e}")
-                        
-        except Exception as e:
-            print(f"로컬 파일 로드 실패: {e}")
+        store = load_review_store(base_dir)
+        docs = [RetrievedDocument(store.text(i), store.metadata(i), 0.0) for i in range(len(store))]
     
     return docs
 
 
 class TfIdfRetriever:
     """TF-IDF 기반 검색기"""
+
+    # 저장 형식이 바뀌면 올려서 이전 파일을 무시
+    INDEX_FORMAT = 1
+    MAX_FEATURES = 5000
     
-    def __init__(self, texts: List[str], metadatas: List[Dict[str, Any]]):
-        self._embedder = TfidfEmbedder(max_features=5000)
-        self._matrix = self._embedder.fit_transform(texts)
-        self._texts = texts
-        self._metas = metadatas
-
-    def get_relevant_documents(self, query: str) -> List[RetrievedDocument]:
-        """관련 문서 검색"""
-        if not query or not self._texts:
+    def __init__(
+        self,
+        texts: "List[str] | DocumentStore",
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        index_dir: Optional[str] = None,
+    ):
+        """
+        Args:
+            index_dir: 학습된 어휘/idf와 CSR 행렬을 저장할 디렉토리.
+                코퍼스 행 지문이 같으면 학습 없이 파일만 읽어 시작합니다.
+        """
+        self._store = as_document_store(texts, metadatas)
+        self._index_dir = index_dir
+        # _lock은 (저장소, 행렬) 교체에만 잡고, 벡터화/저장은 _write_lock으로 쓰는 쪽끼리만 직렬화
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        # 문서 추가/삭제마다 증가 (결과 캐시 무효화용)
+        self.index_version = 0
+
+        # 여러 워커가 동시에 시작해도 한 프로세스만 학습하고 나머지는 잠금을 얻은 뒤 저장된 결과를 로드
+        with self._dir_lock():
+            if not self._load_index():
+                self._embedder = TfidfEmbedder(max_features=self.MAX_FEATURES)
+                # 행 단위 L2 정규화된 CSR 행렬: 코사인 유사도 = 희소 행렬-벡터 곱
+                matrix = sparse.csr_matrix(self._embedder.fit_transform(self._store.iter_texts()), dtype=np.float32)
+                self._matrix = normalize(matrix, norm="l2", copy=False)
+                self._save_index(self._store, self._matrix)
+
+    def __len__(self) -> int:
+        return self._store.num_alive
+
+    def _snapshot(self):
+        """검색에 쓸 (저장소, 행렬). 두 가지는 항상 함께 교체됨"""
+        with self._lock:
+            return self._store, self._matrix
+
+    def _swap(self, store: DocumentStore, matrix) -> None:
+        with self._lock:
+            self._store, self._matrix = store, matrix
+            self.index_version += 1
+
+    def _dir_lock(self):
+        return dir_lock(self._index_dir) if self._index_dir else contextlib.nullcontext()
+
+    def _index_paths(self) -> Dict[str, str]:
+        assert self._index_dir is not None
+        return {
+            "model": os.path.join(self._index_dir, "tfidf_model.npz"),
+            "matrix": os.path.join(self._index_dir, "tfidf_matrix.npz"),
+            "manifest": os.path.join(self._index_dir, "manifest.json"),
+        }
+
+    def _manifest(self, store: DocumentStore) -> Dict[str, Any]:
+        return {
+            "format": self.INDEX_FORMAT,
+            "max_features": self.MAX_FEATURES,
+            "num_docs": len(store),
+            "corpus_fingerprint": store.row_fingerprint(),
+        }
+
+    def _load_index(self) -> bool:
+        """저장된 모델/행렬이 현재 코퍼스(행 순서 포함)와 맞으면 로드"""
+        if not self._index_dir:
+            return False
+        paths = self._index_paths()
+        if not all(os.path.exists(p) for p in paths.values()):
+            return False
+        try:
+            with open(paths["manifest"], "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+            expected = self._manifest(self._store)
+            stale = [key for key, value in expected.items() if manifest.get(key) != value]
+            if stale:
+                print(f"TF-IDF 인덱스가 코퍼스와 다름 ({', '.join(stale)}), 다시 학습")
+                return False
+            embedder = TfidfEmbedder.load(paths["model"], max_features=self.MAX_FEATURES)
+            matrix = sparse.load_npz(paths["matrix"]).tocsr().astype(np.float32, copy=False)
+            if matrix.shape != (len(self._store), embedder.vocab_size):
+                print(f"TF-IDF 행렬 크기 불일치 {matrix.shape}, 다시 학습")
+                return False
+        except Exception as e:
+            print(f"TF-IDF 인덱스 로드 실패: {e}")
+            return False
+        self._embedder, self._matrix = embedder, matrix
+        print(f"기존 TF-IDF 인덱스 로드: {self._index_dir} ({matrix.shape[0]}개 문서, 어휘 {matrix.shape[1]}개)")
+        return True
+
+    def _save_index(self, store: DocumentStore, matrix) -> None:
+        if not self._index_dir:
+            return
+        paths = self._index_paths()
+        embedder = self._embedder
+        try:
+            # 임시 파일에 쓴 뒤 교체 (manifest를 마지막에 교체해 반쯤 쓴 상태를 읽지 않도록 함)
+            with self._dir_lock():
+                write_files(
+                    [
+                        (paths["model"], write_binary(embedder.save)),
+                        (paths["matrix"], write_binary(lambda f: sparse.save_npz(f, matrix, compressed=False))),
+                        (paths["manifest"], write_json(self._manifest(store))),
+                    ]
+                )
+            print(f"TF-IDF 인덱스 저장: {self._index_dir}")
+        except Exception as e:
+            print(f"TF-IDF 인덱스 저장 실패: {e}")
+
+    def add_documents(
+        self,
+        texts: "List[str] | DocumentStore",
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ) -> List[int]:
+        """문서 추가 (기존 어휘/idf로 새 문서만 벡터화해 행렬 끝에 덧붙임). 추가된 review id 반환"""
+        with self._write_lock:
+            current, matrix = self._snapshot()
+            store, positions = current.add(as_document_store(texts, metadatas))
+            fresh = positions[positions >= len(current)]
+            if len(fresh):
+                rows = self._embedder.transform([store.text(int(i)) for i in fresh])
+                rows = normalize(sparse.csr_matrix(rows, dtype=np.float32), norm="l2", copy=False)
+                matrix = sparse.vstack([matrix, rows], format="csr")
+            if len(positions):
+                self._swap(store, matrix)
+            if len(fresh):
+                # 검색은 이미 새 행렬을 쓰고, 디스크 저장은 교체 잠금 밖에서
+                self._save_index(store, matrix)
+            return [int(i) for i in store.review_ids[positions]]
+
+    def remove_documents(self, review_ids: List[int]) -> int:
+        """review id로 문서 삭제 (행은 남기고 검색 대상에서 제외). 삭제된 문서 수 반환"""
+        with self._write_lock:
+            store, matrix = self._snapshot()
+            store, positions = store.remove(review_ids)
+            if len(positions):
+                self._swap(store, matrix)
+            return len(positions)
+
+    @staticmethod
+    def _rank(
+        store: DocumentStore, sims: np.ndarray, rows: Optional[np.ndarray], k: Optional[int]
+    ) -> List[RetrievedDocument]:
+        top = top_k_indices(sims, k)
+        ids = top if rows is None else rows[top]
+        return [RetrievedDocument.from_store(store, int(i), float(sims[j])) for i, j in zip(ids, top)]
+
+    @staticmethod
+    def _filtered_rows(store: DocumentStore, matrix, filters) -> "tuple[Any, Optional[np.ndarray]]":
+        """(점수 계산에 쓸 행렬, 원래 문서 id) — 필터가 좁으면 해당 행만 잘라 계산"""
+        mask = store.filter_mask(filters)
+        if mask is None:
+            return matrix, None
+        rows = np.flatnonzero(mask)
+        return matrix[rows], rows
+
+    def get_relevant_documents(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filters: "ReviewFilter | Dict[str, Any] | None" = None,
+    ) -> List[RetrievedDocument]:
+        """관련 문서 검색
+
+        Args:
+            query: 질의 문자열
+            k: 반환할 상위 문서 수 (None이면 전체를 점수순으로 반환)
+            filters: site/평점/날짜 필터 (조건에 맞는 행만 점수 계산)
+        """
+        store, full = self._snapshot()
+        if not query or not len(store):
             return []
         
         try:
-            qv = self._embedder.transform([query])
-            sims = cosine_similarity(qv, self._matrix)[0]
-            ranked = sorted(enumerate(sims), key=lambda x: x[1], reverse=True)
-            
-            docs: List[RetrievedDocument] = []
-            for idx, score in ranked:
-                docs.append(
-                    RetrievedDocument(
-                        page_content=self._texts[idx],
-                        metadata={**self._metas[idx], "score": float(score)},
-                        score=float(score),
-                    )
-                )
-            return docs
+            matrix, rows = self._filtered_rows(store, full, filters)
+            if matrix.shape[0] == 0:
+                return []
+            qv = normalize(self._embedder.transform([query]), norm="l2")
+            sims = matrix @ qv.toarray().ravel().astype(np.float32)
+            return self._rank(store, sims, rows, k)
         except Exception as e:
             print(f"TF-IDF 검색 오류: {e}")
-            # 폴백: 모든 문서 반환
-            docs: List[RetrievedDocument] = []
-            for i, text in enumerate(self._texts):
-                docs.append(
-                    RetrievedDocument(
-                        page_content=text,
-                        metadata={**self._metas[i], "score": 0.5},
-                        score=0.5,
-                    )
-                )
-            return docs
+            # 폴백: 앞쪽 문서를 그대로 반환
+            alive = store.alive_positions()
+            return [RetrievedDocument.from_store(store, int(i), 0.5) for i in alive[:k]]
+
+    def get_relevant_documents_batch(
+        self,
+        queries: List[str],
+        k: Optional[int] = None,
+        filters: "ReviewFilter | Dict[str, Any] | None" = None,
+    ) -> List[List[RetrievedDocument]]:
+        """여러 질의를 한 번의 희소 행렬 곱으로 검색"""
+        results: List[List[RetrievedDocument]] = [[] for _ in queries]
+        valid = [i for i, q in enumerate(queries) if q]
+        store, full = self._snapshot()
+        if not valid or not len(store):
+            return results
+
+        matrix, rows = self._filtered_rows(store, full, filters)
+        if matrix.shape[0] == 0:
+            return results
+        qm = normalize(self._embedder.transform([queries[i] for i in valid]), norm="l2")
+        sims = (qm.astype(np.float32) @ matrix.T).toarray()
+        for row, qi in enumerate(valid):
+            results[qi] = self._rank(store, sims[row], rows, k)
+        return results
 
 
 class FaissRetriever:
@@ -141,124 +381,660 @@ class FaissRetriever:
 
     def __init__(
         self,
-        texts: List[str],
-        metadatas: List[Dict[str, Any]],
+        texts: "List[str] | DocumentStore",
+        metadatas: Optional[List[Dict[str, Any]]] = None,
         index_dir: Optional[str] = None,
         use_api: bool = True,
+        cache_dir: Optional[str] = None,
+        embedder: Optional[Any] = None,
+        index_config: Optional[IndexConfig] = None,
+        mmap: Optional[bool] = None,
+        query_cache: Optional[LRUCache] = None,
     ):
+        """
+        Args:
+            mmap: 저장된 인덱스를 읽기 전용 메모리 매핑으로 열지 여부
+                (None이면 환경변수 FAISS_MMAP, 기본 사용). 여러 워커 프로세스가 페이지 캐시를 공유합니다.
+            query_cache: 질의 임베딩 LRU 캐시 (None이면 QUERY_EMBEDDING_CACHE_SIZE/_TTL, 기본 1024개/1시간)
+        """
         try:
             import faiss  # type: ignore
-            import numpy as np
         except Exception as e:
             raise RuntimeError("faiss 라이브러리가 설치되어 있지 않습니다.") from e
         
         self._faiss = faiss
-        self._np = np
-        self._texts = texts
-        self._metas = metadatas
+        self._store = as_document_store(texts, metadatas)
         
         # 임베딩 모델 선택 (API 우선, 실패 시 로컬 폴백)
-        try:
-            self._embedder = get_embedder(use_api=use_api)
-            print(f"임베딩 모델 사용: {'API' if use_api else '로컬'}")
-        except Exception as e:
-            print(f"API 임베딩 실패, 로컬 모델로 폴백: {e}")
-            self._embedder = get_embedder(use_api=False)
+        self._embedder = embedder if embedder is not None else _default_embedder(use_api, cache_dir)
         
-        self._dim = self._embedder.dimension
+        self._index_dir = index_dir
+        meta = self._read_meta()
+        # 알려진 모델이거나 같은 모델로 만든 인덱스가 있으면 차원 확인용 API 호출을 하지 않음
+        self._dim = resolve_dimension(self._embedder, meta)
+        self._embedder_id = embedder_id(self._embedder)
+        self._index_config = index_config or IndexConfig.from_env()
+        # 서빙 프로세스는 build_index CLI가 만든 인덱스만 로드 (없거나 맞지 않으면 임베딩하지 않고 실패)
+        self._prebuilt_only = bool(index_dir) and _env_flag("FAISS_PREBUILT_ONLY", False)
+        if self._prebuilt_only and meta is not None and isinstance(meta.get("index"), dict):
+            # 구축할 때 쓴 구성(--index-type/--storage 등)을 따름. 검색 파라미터만 이 프로세스 설정 사용
+            self._index_config = IndexConfig.from_meta(meta["index"], search=self._index_config)
+        # _lock은 (인덱스, 저장소) 교체에만 잡고, 임베딩/인덱스 수정/저장은 _write_lock으로 쓰는 쪽끼리만 직렬화
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        # 문서 추가/삭제마다 증가 (결과 캐시 무효화용)
+        self.index_version = 0
+        self._query_cache = (
+            query_cache if query_cache is not None else LRUCache.from_env("QUERY_EMBEDDING_CACHE", 1024, 3600)
+        )
+
+        # 인덱스 디렉토리 설정 후 기존 인덱스 검증/증분 갱신/신규 생성
+        # (벡터는 인덱스에만 두고 프로세스 내 별도 사본은 만들지 않음)
+        self._mmap = bool(index_dir) and (_env_flag("FAISS_MMAP", True) if mmap is None else mmap)
+        self._mapped = False
+        # 같은 디렉토리를 여러 워커가 동시에 열면 한 프로세스만 구축/갱신하고 나머지는 잠금 뒤 다시 확인해 로드
+        with self._dir_lock():
+            self._index = self._load_or_build_index()
+        self._selectors = self._new_selector_cache(self._store, self._index)
+
+    def __len__(self) -> int:
+        return self._store.num_alive
+
+    @property
+    def query_cache(self) -> LRUCache:
+        """질의 임베딩 캐시 (stats()로 hit/miss 확인)"""
+        return self._query_cache
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """정규화된 질의 벡터. 같은 모델로 임베딩한 적 있는 질의는 API를 호출하지 않음"""
+        return _encode_queries(self._embedder, self._embedder_id, self._query_cache, queries)
+
+    def _snapshot(self):
+        """검색에 쓸 (저장소, 인덱스, 필터 selector 캐시). 세 가지는 항상 함께 교체됨"""
+        with self._lock:
+            return self._store, self._index, self._selectors
+
+    def _swap(self, store: DocumentStore, index) -> None:
+        selectors = self._new_selector_cache(store, index)
+        with self._lock:
+            self._store, self._index, self._selectors = store, index, selectors
+            self.index_version += 1
+
+    def _new_selector_cache(self, store: DocumentStore, index) -> LRUCache:
+        """필터 → (IDSelector, 허용 문서 수) 캐시. 사이트 필터는 미리 만들어 둠 (site 비트맵 기반)"""
+        selectors = LRUCache.from_env("FAISS_SELECTOR_CACHE", 32, None)
+        if len(store.site_names) > 1:
+            for site in store.site_names:
+                self._filter_selector(store, index, selectors, ReviewFilter(sites=(str(site),)))
+        return selectors
+
+    @staticmethod
+    def _filter_selector(store: DocumentStore, index, selectors: LRUCache, filters: ReviewFilter):
+        cached = selectors.get(filters)
+        if cached is None:
+            # 삭제된 문서는 인덱스에 없으므로 메타데이터 필터가 있을 때만 허용 id 집합 사용
+            allowed = store.review_ids[store.filter_mask(filters)]
+            cached = (id_selector(index, allowed) if len(allowed) else None, len(allowed))
+            selectors.put(filters, cached)
+        return cached
+
+    def _load_or_build_index(self):
+        """meta.json의 코퍼스 지문/임베딩 모델/차원/인덱스 구성을 검증해 인덱스 준비.
 
-        # 임베딩 생성
+        인덱스의 벡터 id는 review id이므로 저장된 인덱스와 현재 코퍼스를 id 집합으로 비교합니다.
+        - 모두 일치: 저장된 인덱스를 그대로 로드 (임베딩 호출 없음)
+        - 코퍼스만 변경: 사라진 id는 삭제, 새 id만 임베딩해 추가
+        - 인덱스 구성 변경(또는 삭제 미지원): 기존 벡터를 id로 복원해 재구축
+        - 모델/차원 불일치, 이전 형식 인덱스 또는 메타 없음: 전체 재구축
+        """
+        fingerprint = self._store.fingerprint()
+        factory = self._index_config.factory_string(self._store.num_alive, self._dim)
+
+        meta = self._read_meta()
+        index = None
+        if meta is not None:
+            # 그대로 쓸 수 있으면 공유 매핑으로, 고쳐 써야 하면 프로세스 사본으로 읽음
+            reusable = (
+                meta.get("corpus_fingerprint") == fingerprint and meta.get("index", {}).get("factory") == factory
+            )
+            index, self._mapped = self._read_index(shared=reusable)
+        if index is not None:
+            if meta.get("model") != self._embedder_id or int(meta.get("dim", -1)) != self._dim:
+                print(
+                    f"FAISS 인덱스 모델/차원 불일치 ({meta.get('model')}/{meta.get('dim')} → "
+                    f"{self._embedder_id}/{self._dim}), 전체 재구축"
+                )
+            elif not supports_ids(index):
+                print("이전 형식의 FAISS 인덱스(id 매핑 없음), 전체 재구축")
+            elif reusable:
+                print(f"기존 FAISS 인덱스 로드: {self._index_dir} ({factory}{', mmap' if self._mapped else ''})")
+                apply_search_params(index, self._index_config)
+                return index
+            elif not self._prebuilt_only:
+                index = self._sync_index(index, meta.get("index", {}).get("factory") == factory)
+                if index is not None:
+                    return self._publish(index)
+
+        if self._prebuilt_only:
+            raise RuntimeError(
+                f"사용할 수 있는 FAISS 인덱스가 없습니다 ({self._index_dir}). "
+                "python -m st_app.rag.build_index 로 먼저 구축하세요 "
+                "(Docker 이미지는 빌드 단계에서 구축, README의 'FAISS 인덱스 사전 구축' 참고)."
+            )
+
+        # 임베딩 생성 (디스크 캐시에 없는 텍스트만 실제로 인코딩)
         print("임베딩 생성 중...")
-        vecs = self._embedder.encode(texts)
-        
-        # 인덱스 디렉토리 설정
-        self._index_dir = index_dir
-        index_path = os.path.join(index_dir, "index.faiss") if index_dir else None
-        meta_path = os.path.join(index_dir, "meta.json") if index_dir else None
+        alive = self._store.alive_positions()
+        vecs = self._encode_normalized([self._store.text(int(i)) for i in alive])
+        return self._publish(self._new_index(vecs, self._store.review_ids[alive]))
 
-        # 기존 인덱스 로드 또는 새로 생성
-        if index_path and os.path.exists(index_path):
-            self._index = faiss.read_index(index_path)
-            print(f"기존 FAISS 인덱스 로드: {index_path}")
-        else:
-            self._index = faiss.IndexFlatIP(self._dim)
-            # 정규화된 벡터로 인덱스 생성
-            norms = np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-8
-            vecs_norm = vecs / norms
-            self._index.add(vecs_norm)
-            
-            # 새로 만든 경우 저장
-            if index_path:
-                try:
-                    os.makedirs(index_dir, exist_ok=True)
-                    faiss.write_index(self._index, index_path)
-                    
-                    # 메타데이터 저장
-                    meta = {
-                        "num_texts": len(texts),
-                        "dim": int(self._dim),
-                        "model": "solar-1-mini-embedding" if use_api else "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
-                        "embedder_type": "api" if use_api else "local"
-                    }
-                    with open(meta_path, "w", encoding="utf-8") as f:
-                        json.dump(meta, f, ensure_ascii=False)
-                    print(f"새 FAISS 인덱스 저장: {index_path}")
-                except Exception as e:
-                    print(f"FAISS 인덱스 저장 실패: {e}")
-
-        # 정규화된 벡터 저장 (검색용)
-        self._vecs_norm = vecs / (self._np.linalg.norm(vecs, axis=1, keepdims=True) + 1e-8)
-
-    def get_relevant_documents(self, query: str) -> List[RetrievedDocument]:
-        """관련 문서 검색"""
-        if not query:
+    def _dir_lock(self):
+        return dir_lock(self._index_dir) if self._index_dir else contextlib.nullcontext()
+
+    def _publish(self, index, store: Optional[DocumentStore] = None):
+        """인덱스를 저장하고, mmap 모드면 저장한 파일을 공유 매핑으로 다시 열어 사본을 버림"""
+        with self._dir_lock():
+            if self._save_index(index, store or self._store) and self._mmap:
+                mapped, self._mapped = self._read_index(shared=True)
+                if mapped is not None:
+                    apply_search_params(mapped, self._index_config)
+                    return mapped
+        self._mapped = False
+        return index
+
+    def _writable_index(self):
+        """수정용 인덱스 사본 (검색 중인 현재 인덱스는 건드리지 않음).
+
+        매핑된 인덱스는 파일에서 프로세스 사본으로 다시 읽고, 메모리 인덱스는 복제합니다.
+        """
+        if not self._mapped:
+            return self._faiss.clone_index(self._index)
+        index, _ = self._read_index(shared=False)
+        if index is None:
+            raise RuntimeError("FAISS 인덱스를 수정용으로 다시 읽지 못했습니다.")
+        apply_search_params(index, self._index_config)
+        return index
+
+    def _sync_index(self, index, same_factory: bool):
+        """저장된 인덱스를 현재 코퍼스에 맞춤 (기존 벡터 재사용, 새 문서만 임베딩)"""
+        alive = self._store.alive_positions()
+        current = self._store.review_ids[alive]
+        try:
+            saved_ids = index_ids(index)
+        except Exception as e:
+            print(f"기존 인덱스 id 읽기 실패, 전체 재구축: {e}")
+            return None
+        stale = np.setdiff1d(saved_ids, current)
+        new_ids = np.setdiff1d(current, saved_ids)
+        new_vecs = self._encode_normalized(
+            [self._store.text(int(i)) for i in self._store.positions_of(new_ids)]
+        )
+        print(f"FAISS 증분 갱신: 삭제 {len(stale)}개, 신규 임베딩 {len(new_ids)}개")
+
+        if same_factory and remove_vectors(index, stale):
+            add_vectors(index, new_vecs, new_ids)
+            apply_search_params(index, self._index_config)
+            return index
+        kept = np.intersect1d(saved_ids, current)
+        vecs = np.concatenate([reconstruct_ids(index, kept), new_vecs])
+        return self._new_index(vecs, np.concatenate([kept, new_ids]))
+
+    def _encode_normalized(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self._dim), dtype="float32")
+        return l2_normalize(self._embedder.encode(texts))
+
+    def _new_index(self, vecs: np.ndarray, ids: np.ndarray):
+        return build_index(vecs, self._index_config, dim=self._dim, ids=ids)
+
+    def add_documents(
+        self,
+        texts: "List[str] | DocumentStore",
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ) -> List[int]:
+        """문서 추가 (새 문서만 임베딩해 인덱스 사본에 추가 후 저장). 추가된 review id 반환
+
+        임베딩과 인덱스 수정/저장은 사본에서 하므로 그동안 검색은 이전 인덱스로 계속 진행됩니다.
+        """
+        added = as_document_store(texts, metadatas)
+        with self._write_lock:
+            store, positions = self._store.add(added)
+            ids = store.review_ids[positions]
+            if not len(ids):
+                return []
+            vecs = self._encode_normalized([store.text(int(i)) for i in positions])
+            index = self._writable_index()
+            add_vectors(index, vecs, ids)
+            self._swap(store, self._publish(index, store))
+            return [int(i) for i in ids]
+
+    def remove_documents(self, review_ids: List[int]) -> int:
+        """review id로 문서 삭제 후 저장. 삭제된 문서 수 반환
+
+        HNSW처럼 개별 삭제를 지원하지 않는 인덱스는 남은 벡터로 재구축합니다(임베딩 호출 없음).
+        """
+        with self._write_lock:
+            store, positions = self._store.remove(review_ids)
+            if not len(positions):
+                return 0
+            index = self._writable_index()
+            if not remove_vectors(index, self._store.review_ids[positions]):
+                kept = store.review_ids[store.alive_positions()]
+                index = self._new_index(reconstruct_ids(index, kept), kept)
+            self._swap(store, self._publish(index, store))
+            return len(positions)
+
+    def _index_paths(self) -> Dict[str, str]:
+        assert self._index_dir is not None
+        return {
+            "index": os.path.join(self._index_dir, "index.faiss"),
+            "meta": os.path.join(self._index_dir, "meta.json"),
+        }
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        if not self._index_dir:
+            return None
+        paths = self._index_paths()
+        if not (os.path.exists(paths["index"]) and os.path.exists(paths["meta"])):
+            return None
+        try:
+            with open(paths["meta"], "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"FAISS 인덱스 메타 로드 실패: {e}")
+            return None
+
+    def _read_index(self, shared: bool):
+        """저장된 인덱스 로드 → (인덱스, 매핑 여부). shared=True이고 mmap 모드면 읽기 전용 매핑"""
+        mapped = shared and self._mmap
+        try:
+            return read_index(self._index_paths()["index"], mmap=mapped), mapped
+        except Exception as e:
+            if not mapped:
+                print(f"기존 FAISS 인덱스 로드 실패: {e}")
+                return None, False
+            print(f"FAISS 인덱스 mmap 로드 실패, 메모리로 로드: {e}")
+            return self._read_index(shared=False)
+
+    def _save_index(self, index, store: DocumentStore) -> bool:
+        if not self._index_dir:
+            return False
+        meta = index_meta(store, self._embedder, self._dim, self._index_config)
+        try:
+            paths = publish_index(self._index_dir, index, meta)
+            print(f"새 FAISS 인덱스 저장: {paths['index']}")
+            return True
+        except Exception as e:
+            print(f"FAISS 인덱스 저장 실패: {e}")
+            return False
+
+    def get_relevant_documents(
+        self,
+        query: str,
+        k: int = 50,
+        filters: "ReviewFilter | Dict[str, Any] | None" = None,
+    ) -> List[RetrievedDocument]:
+        """관련 문서 검색 (상위 k개, filters는 IDSelector로 인덱스 탐색 중에 적용)"""
+        if not query or k <= 0:
             return []
+        return self.get_relevant_documents_batch([query], k=k, filters=filters)[0]
+
+    def get_relevant_documents_batch(
+        self,
+        queries: List[str],
+        k: int = 50,
+        filters: "ReviewFilter | Dict[str, Any] | None" = None,
+    ) -> List[List[RetrievedDocument]]:
+        """여러 질의를 한 번의 임베딩 호출과 한 번의 index.search로 검색"""
+        results: List[List[RetrievedDocument]] = [[] for _ in queries]
+        # 잠금은 (인덱스, 저장소) 쌍을 읽을 때만. 검색 자체는 잠금 없이 (faiss는 GIL을 놓음)
+        store, index, selectors = self._snapshot()
+        valid = [i for i, q in enumerate(queries) if q]
+        if not valid or k <= 0 or not store.num_alive:
+            return results
+
+        # 필터 selector는 필터별로 한 번만 만들어 재사용 (질의마다 허용 id 전체를 훑지 않음)
+        f = ReviewFilter.coerce(filters)
+        selector, n_allowed = (None, store.num_alive) if f is None else self._filter_selector(store, index, selectors, f)
+        if n_allowed == 0:
+            return results
+
+        # 쿼리 임베딩 및 정규화 (질의 캐시에 없는 것만 API 호출)
+        qv = self.encode_queries([queries[i] for i in valid])
         
-        # 쿼리 임베딩 및 정규화
-        qv = self._embedder.encode([query])
-        qv = qv / (self._np.linalg.norm(qv, axis=1, keepdims=True) + 1e-8)
-        
-        # FAISS 검색
-        scores, idxs = self._index.search(qv, k=min(50, len(self._texts)))
-        idxs = idxs.flatten()
-        scores = scores.flatten()
+        # FAISS 검색 (결과 id는 review id → 저장소 행 위치로 변환)
+        params, _refs = search_parameters(index, self._index_config, selector)
+        scores, ids = index.search(qv, min(k, n_allowed), params=params)
         
-        docs: List[RetrievedDocument] = []
-        for i, s in zip(idxs, scores):
-            if i < 0:
-                continue
-            docs.append(
-                RetrievedDocument(
-                    page_content=self._texts[i],
-                    metadata={**self._metas[i], "score": float(s)},
-                    score=float(s),
-                )
+        for row, qi in enumerate(valid):
+            found = ids[row] >= 0
+            positions = store.positions_of(ids[row][found])
+            results[qi] = [
+                RetrievedDocument.from_store(store, int(i), float(s))
+                for i, s in zip(positions, scores[row][found])
+                if i >= 0
+            ]
+        return results
+
+
+class NumpyDenseRetriever:
+    """faiss 없이 NumPy만으로 동작하는 전수(brute-force) 임베딩 검색기.
+
+    FaissRetriever와 같은 인터페이스입니다. 정규화된 문서 벡터를 저장소 행 순서대로
+    연속 배열(float32, NUMPY_DENSE_DTYPE=float16이면 메모리 절반) 하나에 둡니다.
+    float16은 메모리를 지연 시간과 맞바꾸는 선택입니다: 질의마다 행렬 전체를 청크 단위로 float32로
+    변환해 곱하므로 검색이 float32보다 수 배(retrieval_bench 기준 약 7배) 느립니다.
+    메모리가 부족한 경우에만 쓰세요.
+    - 질의 하나는 행렬-벡터 곱(GEMV), 여러 질의는 행렬 곱(GEMM) 한 번으로 점수 계산
+    - 상위 k개는 argpartition으로 고르고, 큰 코퍼스는 chunk_size행씩 나눠 훑으며 청크별 상위 k개만 유지
+    - 필터/삭제된 문서는 점수를 -inf로 가려 제외
+    - index_dir가 있으면 vectors.npy/ids.npy/meta.json으로 저장하고, 재시작 시 review id로 맞춰
+      바뀐 문서만 임베딩
+    """
+
+    DTYPES = ("float32", "float16")
+
+    def __init__(
+        self,
+        texts: "List[str] | DocumentStore",
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        index_dir: Optional[str] = None,
+        use_api: bool = True,
+        cache_dir: Optional[str] = None,
+        embedder: Optional[Any] = None,
+        query_cache: Optional[LRUCache] = None,
+        dtype: Optional[str] = None,
+        chunk_size: Optional[int] = None,
+    ):
+        """
+        Args:
+            dtype: 문서 벡터 저장 형식 (None이면 환경변수 NUMPY_DENSE_DTYPE, 기본 float32).
+                float16은 메모리 절반 대신 검색마다 float32 변환 비용이 듦
+            chunk_size: 한 번에 점수를 계산할 문서 수 (None이면 NUMPY_DENSE_CHUNK, 기본 65536)
+        """
+        self._store = as_document_store(texts, metadatas)
+        self._embedder = embedder if embedder is not None else _default_embedder(use_api, cache_dir)
+        self._dtype = (dtype or os.getenv("NUMPY_DENSE_DTYPE", "float32")).lower()
+        if self._dtype not in self.DTYPES:
+            raise ValueError(f"NUMPY_DENSE_DTYPE must be one of {self.DTYPES}, got {self._dtype!r}")
+        self._chunk_size = max(1, int(chunk_size or os.getenv("NUMPY_DENSE_CHUNK", 65536)))
+        self._index_dir = index_dir
+        self._dim = resolve_dimension(self._embedder, self._read_meta())
+        self._embedder_id = embedder_id(self._embedder)
+        # _lock은 (행렬, 저장소) 교체에만, 임베딩/행렬 복사/저장은 _write_lock으로 쓰는 쪽끼리만 직렬화
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+        # 문서 추가/삭제마다 증가 (결과 캐시 무효화용)
+        self.index_version = 0
+        self._query_cache = (
+            query_cache if query_cache is not None else LRUCache.from_env("QUERY_EMBEDDING_CACHE", 1024, 3600)
+        )
+        with self._dir_lock():
+            self._matrix = self._load_or_build_matrix()
+
+    def __len__(self) -> int:
+        return self._store.num_alive
+
+    @property
+    def query_cache(self) -> LRUCache:
+        return self._query_cache
+
+    def encode_queries(self, queries: List[str]) -> np.ndarray:
+        """정규화된 질의 벡터 (질의 캐시에 없는 것만 임베딩)"""
+        return _encode_queries(self._embedder, self._embedder_id, self._query_cache, queries)
+
+    def _encode_rows(self, store: DocumentStore, positions: np.ndarray) -> np.ndarray:
+        if not len(positions):
+            return np.zeros((0, self._dim), dtype=self._dtype)
+        return l2_normalize(self._embedder.encode([store.text(int(i)) for i in positions])).astype(self._dtype)
+
+    def _load_or_build_matrix(self) -> np.ndarray:
+        """저장된 벡터 중 현재 코퍼스에 남은 review id는 재사용하고 나머지 문서만 임베딩"""
+        matrix = np.zeros((len(self._store), self._dim), dtype=self._dtype)
+        todo = self._store.alive_positions()
+        saved = self._read_saved()
+        if saved is not None:
+            saved_ids, saved_vecs = saved
+            pos = self._store.positions_of(saved_ids)
+            found = pos >= 0
+            matrix[pos[found]] = saved_vecs[found]
+            filled = np.zeros(len(self._store), dtype=bool)
+            filled[pos[found]] = True
+            todo = todo[~filled[todo]]
+            if not len(todo) and found.all() and len(saved_ids) == len(self._store):
+                print(f"기존 NumPy 임베딩 행렬 로드: {self._index_dir}")
+                return matrix
+            print(f"NumPy 임베딩 행렬 증분 갱신: 재사용 {int(found.sum())}개, 신규 임베딩 {len(todo)}개")
+        else:
+            print("임베딩 생성 중...")
+        matrix[todo] = self._encode_rows(self._store, todo)
+        self._save(self._store, matrix)
+        return matrix
+
+    def _dir_lock(self):
+        return dir_lock(self._index_dir) if self._index_dir else contextlib.nullcontext()
+
+    def _index_paths(self) -> Dict[str, str]:
+        assert self._index_dir is not None
+        return {
+            "vectors": os.path.join(self._index_dir, "vectors.npy"),
+            "ids": os.path.join(self._index_dir, "ids.npy"),
+            "meta": os.path.join(self._index_dir, "meta.json"),
+        }
+
+    def _read_meta(self) -> Optional[Dict[str, Any]]:
+        if not self._index_dir or not all(os.path.exists(p) for p in self._index_paths().values()):
+            return None
+        try:
+            with open(self._index_paths()["meta"], "r", encoding="utf-8") as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"NumPy 임베딩 메타 로드 실패: {e}")
+            return None
+
+    def _read_saved(self) -> "Optional[tuple[np.ndarray, np.ndarray]]":
+        meta = self._read_meta()
+        if meta is None:
+            return None
+        if meta.get("model") != self._embedder_id or int(meta.get("dim", -1)) != self._dim:
+            print(
+                f"NumPy 임베딩 모델/차원 불일치 ({meta.get('model')}/{meta.get('dim')} → "
+                f"{self._embedder_id}/{self._dim}), 전체 재구축"
             )
-        return docs
+            return None
+        paths = self._index_paths()
+        try:
+            ids = np.load(paths["ids"], allow_pickle=False)
+            vecs = np.load(paths["vectors"], allow_pickle=False).astype(self._dtype, copy=False)
+        except Exception as e:
+            print(f"NumPy 임베딩 행렬 로드 실패: {e}")
+            return None
+        if vecs.shape != (len(ids), self._dim):
+            return None
+        return ids, vecs
 
+    def _save(self, store: DocumentStore, matrix: np.ndarray) -> None:
+        if not self._index_dir:
+            return
+        paths = self._index_paths()
+        meta = {
+            "num_texts": store.num_alive,
+            "dim": self._dim,
+            "model": self._embedder_id,
+            "embedder_type": "api" if isinstance(self._embedder, UpstageEmbedder) else "local",
+            "corpus_fingerprint": store.fingerprint(),
+            "dtype": self._dtype,
+        }
+        alive = store.alive_positions()
+        try:
+            # 삭제된 행은 저장하지 않음. meta를 마지막에 교체해 반쯤 쓴 상태를 읽지 않도록 함
+            with self._dir_lock():
+                write_files(
+                    [
+                        (paths["vectors"], write_binary(lambda f: np.save(f, matrix[alive]))),
+                        (paths["ids"], write_binary(lambda f: np.save(f, store.review_ids[alive]))),
+                        (paths["meta"], write_json(meta)),
+                    ]
+                )
+            print(f"NumPy 임베딩 행렬 저장: {paths['vectors']}")
+        except Exception as e:
+            print(f"NumPy 임베딩 행렬 저장 실패: {e}")
 
-# 캐시 변수들
-_CACHED: Optional[TfIdfRetriever] = None
-_CACHED_FAISS: Optional[FaissRetriever] = None
+    def add_documents(
+        self,
+        texts: "List[str] | DocumentStore",
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ) -> List[int]:
+        """문서 추가 (새 행만 임베딩, 되살린 문서는 기존 벡터 재사용). 추가된 review id 반환"""
+        added = as_document_store(texts, metadatas)
+        with self._write_lock:
+            store, positions = self._store.add(added)
+            if not len(positions):
+                return []
+            fresh = positions[positions >= len(self._store)]
+            vecs = self._encode_rows(store, fresh)
+            # 검색 중인 행렬은 그대로 두고 새 행렬을 만든 뒤 참조만 교체
+            matrix = np.zeros((len(store), self._dim), dtype=self._dtype)
+            matrix[: len(self._store)] = self._matrix
+            matrix[fresh] = vecs
+            self._save(store, matrix)
+            with self._lock:
+                self._store, self._matrix = store, matrix
+                self.index_version += 1
+            return [int(i) for i in store.review_ids[positions]]
 
+    def remove_documents(self, review_ids: List[int]) -> int:
+        """review id로 문서 삭제 (행은 남기고 검색에서만 제외). 삭제된 문서 수 반환"""
+        with self._write_lock:
+            store, positions = self._store.remove(review_ids)
+            if not len(positions):
+                return 0
+            self._save(store, self._matrix)
+            with self._lock:
+                self._store = store
+                self.index_version += 1
+            return len(positions)
 
-def get_retriever() -> TfIdfRetriever:
-    """TF-IDF 검색기 반환"""
-    global _CACHED
-    if _CACHED is not None:
-        return _CACHED
-    
-    # 데이터베이스 경로 찾기
+    def get_relevant_documents(
+        self,
+        query: str,
+        k: int = 50,
+        filters: "ReviewFilter | Dict[str, Any] | None" = None,
+    ) -> List[RetrievedDocument]:
+        """관련 문서 검색 (코사인 유사도 상위 k개)"""
+        if not query or k <= 0:
+            return []
+        return self.get_relevant_documents_batch([query], k=k, filters=filters)[0]
+
+    def get_relevant_documents_batch(
+        self,
+        queries: List[str],
+        k: int = 50,
+        filters: "ReviewFilter | Dict[str, Any] | None" = None,
+    ) -> List[List[RetrievedDocument]]:
+        """여러 질의를 한 번의 임베딩 호출과 청크별 행렬 곱으로 검색"""
+        results: List[List[RetrievedDocument]] = [[] for _ in queries]
+        valid = [i for i, q in enumerate(queries) if q]
+        if not valid or k <= 0 or not self._store.num_alive:
+            return results
+
+        qv = self.encode_queries([queries[i] for i in valid])
+        with self._lock:
+            store, matrix = self._store, self._matrix
+        mask = store.filter_mask(filters)
+        n_allowed = len(store) if mask is None else int(mask.sum())
+        if n_allowed == 0:
+            return results
+
+        scores, positions = self._search(qv, matrix, mask, min(k, n_allowed))
+        for row, qi in enumerate(valid):
+            found = np.isfinite(scores[row])
+            results[qi] = [
+                RetrievedDocument.from_store(store, int(i), float(s))
+                for i, s in zip(positions[row][found], scores[row][found])
+            ]
+        return results
+
+    def _search(
+        self, qv: np.ndarray, matrix: np.ndarray, mask: Optional[np.ndarray], k: int
+    ) -> "tuple[np.ndarray, np.ndarray]":
+        """(질의 수, k) 점수/행 위치. 청크마다 상위 k개 후보만 남겨 마지막에 한 번 더 고름"""
+        cand_scores: List[np.ndarray] = []
+        cand_pos: List[np.ndarray] = []
+        for start in range(0, len(matrix), self._chunk_size):
+            chunk = matrix[start : start + self._chunk_size]
+            if chunk.dtype != np.float32:
+                # float16 곱셈은 BLAS를 타지 않으므로 청크 단위로만 float32로 올려 계산.
+                # 비용은 할당이 아니라 변환 자체라서(재사용 버퍼로도 줄지 않음) 질의마다 행렬 전체만큼 듦
+                chunk = chunk.astype(np.float32)
+            if len(qv) == 1:
+                scores = (chunk @ qv[0])[None, :]
+            else:
+                scores = qv @ chunk.T
+            if mask is not None:
+                scores[:, ~mask[start : start + len(chunk)]] = -np.inf
+            top = self._top_k(scores, k)
+            cand_scores.append(np.take_along_axis(scores, top, axis=1))
+            cand_pos.append(top + start)
+
+        scores = np.concatenate(cand_scores, axis=1)
+        positions = np.concatenate(cand_pos, axis=1)
+        top = self._top_k(scores, k)
+        return np.take_along_axis(scores, top, axis=1), np.take_along_axis(positions, top, axis=1)
+
+    @staticmethod
+    def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+        """행별 점수 내림차순 상위 k개 열 위치 (argpartition 후 k개만 정렬)"""
+        if k < scores.shape[1]:
+            part = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        else:
+            part = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+        order = np.argsort(-np.take_along_axis(scores, part, axis=1), axis=1, kind="stable")
+        return np.take_along_axis(part, order, axis=1)
+
+
+def _database_dir() -> str:
+    """리뷰 CSV가 있는 database 디렉토리 경로"""
     base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "database"))
     if not os.path.exists(base_dir):
         base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "database"))
-    
-    docs = _load_review_texts(base_dir)
-    texts = [d.page_content for d in docs]
-    metas = [d.metadata for d in docs]
-    
-    _CACHED = TfIdfRetriever(texts, metas)
-    return _CACHED
+    return base_dir
+
+
+def _delta_log() -> DeltaLog:
+    """증분 추가/삭제 기록 (환경변수 REVIEW_DELTA_LOG로 경로 변경 가능)"""
+    default = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "db", "review_deltas.jsonl"))
+    return DeltaLog(os.getenv("REVIEW_DELTA_LOG", default))
+
+
+def load_store() -> DocumentStore:
+    """CSV 리뷰 + 증분 기록을 반영한 저장소 (REVIEW_DEDUP=0 이 아니면 준중복 리뷰를 하나로 묶음)"""
+    store = _delta_log().replay(load_review_store(_database_dir()))
+    if _env_flag("REVIEW_DEDUP", True):
+        before = store.num_alive
+        store = collapse_duplicates(store, threshold=float(os.getenv("REVIEW_DEDUP_THRESHOLD", "0.8")))
+        print(f"[RAG] near-duplicate reviews collapsed: {before} -> {len(store)}")
+    return store
+
+
+# 캐시 변수들 (동시에 불려도 한 번만 구축)
+_CACHED: SingleFlight[TfIdfRetriever] = SingleFlight()
+_CACHED_FAISS: SingleFlight[FaissRetriever] = SingleFlight()
+_CACHED_BM25: SingleFlight[BM25Retriever] = SingleFlight()
+_CACHED_SHARDED: SingleFlight[ShardedRetriever] = SingleFlight()
+_CACHED_NUMPY: SingleFlight[NumpyDenseRetriever] = SingleFlight()
+
+
+def get_retriever() -> TfIdfRetriever:
+    """TF-IDF 검색기 반환"""
+    def build() -> TfIdfRetriever:
+        store = load_store()
+
+        # 학습된 TF-IDF 모델/행렬 디렉토리 (코퍼스가 같으면 학습 없이 로드)
+        index_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "db", "tfidf_index"))
+        return TfIdfRetriever(store, index_dir=index_dir)
+
+    return _CACHED.get(build)
 
 
 def get_faiss_retriever(use_api: bool = True) -> FaissRetriever:
@@ -267,24 +1043,119 @@ def get_faiss_retriever(use_api: bool = True) -> FaissRetriever:
     Args:
         use_api: True면 API 임베딩 사용, False면 로컬 임베딩 사용
     """
-    global _CACHED_FAISS
-    if _CACHED_FAISS is not None:
-        return _CACHED_FAISS
-    
-    # 데이터베이스 경로 찾기
-    base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "database"))
-    if not os.path.exists(base_dir):
-        base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "..", "database"))
-    
-    docs = _load_review_texts(base_dir)
-    texts = [d.page_content for d in docs]
-    metas = [d.metadata for d in docs]
-    
-    # FAISS 인덱스 디렉토리 설정
-    index_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "db", "faiss_index"))
-    os.makedirs(index_dir, exist_ok=True)
-    
-    _CACHED_FAISS = FaissRetriever(texts, metas, index_dir=index_dir, use_api=use_api)
-    return _CACHED_FAISS
+    def build() -> FaissRetriever:
+        store = load_store()
+
+        # FAISS 인덱스 디렉토리 설정
+        index_dir = DEFAULT_FAISS_INDEX_DIR
+        os.makedirs(index_dir, exist_ok=True)
+        cache_dir = os.getenv("EMBEDDING_CACHE_DIR", DEFAULT_EMBEDDING_CACHE_DIR)
+
+        return FaissRetriever(store, index_dir=index_dir, use_api=use_api, cache_dir=cache_dir)
+
+    return _CACHED_FAISS.get(build)
+
+
+def get_numpy_dense_retriever(use_api: bool = True) -> NumpyDenseRetriever:
+    """faiss 없이 NumPy 전수 검색으로 동작하는 임베딩 검색기 반환"""
+    def build() -> NumpyDenseRetriever:
+        index_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "db", "numpy_dense_index"))
+        cache_dir = os.getenv("EMBEDDING_CACHE_DIR", DEFAULT_EMBEDDING_CACHE_DIR)
+        return NumpyDenseRetriever(load_store(), index_dir=index_dir, use_api=use_api, cache_dir=cache_dir)
+
+    return _CACHED_NUMPY.get(build)
+
+
+def faiss_available() -> bool:
+    try:
+        import faiss  # type: ignore  # noqa: F401
+    except Exception:
+        return False
+    return True
+
+
+def get_sharded_retriever(use_api: bool = True) -> ShardedRetriever:
+    """사이트별 FAISS 샤드 검색기 반환
+
+    샤드마다 인덱스 디렉토리(st_app/db/faiss_shards/<site>)를 따로 두고,
+    임베딩 모델과 질의 임베딩 캐시는 모든 샤드가 공유합니다.
+    faiss가 없으면 샤드마다 NumPy 전수 검색기를 씁니다.
+    """
+    def build() -> ShardedRetriever:
+        store = load_store()
+        shard_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "db", "faiss_shards"))
+        cache_dir = os.getenv("EMBEDDING_CACHE_DIR", DEFAULT_EMBEDDING_CACHE_DIR)
+        embedder = get_embedder(use_api=use_api, cache_dir=cache_dir)
+        query_cache = LRUCache.from_env("QUERY_EMBEDDING_CACHE", 1024, 3600)
+
+        shard_cls = FaissRetriever if faiss_available() else NumpyDenseRetriever
+
+        def make_shard(shard_store: DocumentStore, site: str) -> "FaissRetriever | NumpyDenseRetriever":
+            index_dir = os.path.join(shard_root, site)
+            os.makedirs(index_dir, exist_ok=True)
+            return shard_cls(shard_store, index_dir=index_dir, embedder=embedder, query_cache=query_cache)
+
+        workers = os.getenv("RAG_SHARD_WORKERS")
+        return ShardedRetriever(store, factory=make_shard, max_workers=int(workers) if workers else None)
+
+    return _CACHED_SHARDED.get(build)
+
+
+def get_dense_retriever(use_api: bool = True) -> "FaissRetriever | NumpyDenseRetriever | ShardedRetriever":
+    """임베딩 검색기 반환
+
+    환경변수 FAISS_SHARDED=1 이면 사이트별 샤드 검색기. faiss를 import할 수 없으면
+    (faiss 휠이 없는 경량 컨테이너 등) 희소 검색으로 내려가지 않고 NumPy 전수 검색기를 씁니다.
+    """
+    if _env_flag("FAISS_SHARDED", False):
+        return get_sharded_retriever(use_api=use_api)
+    if not faiss_available():
+        print("faiss를 사용할 수 없어 NumPy 전수 검색기 사용")
+        return get_numpy_dense_retriever(use_api=use_api)
+    return get_faiss_retriever(use_api=use_api)
+
+
+def get_bm25_retriever() -> BM25Retriever:
+    """BM25 역색인 검색기 반환"""
+    return _CACHED_BM25.get(lambda: BM25Retriever(load_store()))
+
+
+def get_sparse_retriever():
+    """희소(키워드) 검색기 반환
+
+    환경변수 SPARSE_RETRIEVER=bm25|tfidf (기본 bm25)
+    """
+    if os.getenv("SPARSE_RETRIEVER", "bm25").lower() == "tfidf":
+        return get_retriever()
+    return get_bm25_retriever()
+
+
+def _loaded_retrievers() -> List[Any]:
+    loaded = (
+        _CACHED.peek(),
+        _CACHED_FAISS.peek(),
+        _CACHED_BM25.peek(),
+        _CACHED_SHARDED.peek(),
+        _CACHED_NUMPY.peek(),
+    )
+    return [r for r in loaded if r is not None]
+
+
+def add_reviews(texts: List[str], metadatas: Optional[List[Dict[str, Any]]] = None) -> List[int]:
+    """새 리뷰를 증분 기록에 남기고 이미 로드된 검색기들에 바로 반영. review id 목록 반환
+
+    아직 로드되지 않은 검색기는 다음 로드 때 기록을 다시 적용해 같은 상태가 됩니다.
+    """
+    added = as_document_store(texts, metadatas)
+    _delta_log().record_add(added)
+    ids = [int(i) for i in added.review_ids]
+    for retriever in _loaded_retrievers():
+        retriever.add_documents(added)
+    return ids
 
 
+def remove_reviews(review_ids: List[int]) -> None:
+    """review id로 리뷰를 삭제 기록에 남기고 이미 로드된 검색기들에서 제외"""
+    _delta_log().record_remove(review_ids)
+    for retriever in _loaded_retrievers():
+        retriever.remove_documents(review_ids)
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import heapq
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from st_app.rag.store import DocumentStore, RetrievedDocument, ReviewFilter, as_document_store
+
+
+ShardFactory = Callable[[DocumentStore, str], Any]
+
+
+def split_by_site(store: DocumentStore) -> Dict[str, DocumentStore]:
+    """site별 부분 저장소 (review id/삭제 표시/중복 수 유지)"""
+    shards: Dict[str, DocumentStore] = {}
+    for code, site in enumerate(store.site_names):
+        positions = np.flatnonzero(store.site_codes == code)
+        if len(positions):
+            shards[str(site)] = store.subset(positions)
+    return shards
+
+
+class ShardedRetriever:
+    """사이트(서점/컬렉션)별로 인덱스를 하나씩 두는 샤드 검색기.
+
+    - 질의는 스레드 풀에서 샤드별로 동시에 검색하고, 샤드별 상위 k개를 힙으로 합쳐 전체 상위 k개 반환
+    - filters.sites가 있으면 해당 샤드만 검색 (나머지 필터 조건은 샤드에 그대로 전달)
+    - 샤드 단위로 다시 구축(rebuild_shard)/교체(set_shard) 가능, 새 site 문서는 새 샤드로 추가
+    - 샤드가 같은 임베딩 모델과 질의 캐시를 공유하면(encode_queries) 질의는 검색 전에 한 번만 임베딩
+
+    점수는 샤드끼리 비교 가능해야 합니다 (같은 모델의 코사인 유사도 등).
+    BM25/TF-IDF처럼 샤드별 idf가 다른 점수는 근사적으로만 합쳐집니다.
+    """
+
+    def __init__(
+        self,
+        texts: "List[str] | DocumentStore",
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+        factory: Optional[ShardFactory] = None,
+        max_workers: Optional[int] = None,
+    ):
+        if factory is None:
+            from st_app.rag.bm25 import BM25Retriever
+
+            factory = lambda store, site: BM25Retriever(store)  # noqa: E731
+        self._factory = factory
+        self._lock = threading.Lock()
+        self._shards: Dict[str, Any] = {
+            site: factory(shard, site) for site, shard in sorted(split_by_site(as_document_store(texts, metadatas)).items())
+        }
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="rag-shard")
+        # 샤드 추가/삭제/재구축마다 증가 (결과 캐시 무효화용)
+        self.index_version = 0
+
+    @property
+    def shards(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._shards)
+
+    @property
+    def sites(self) -> List[str]:
+        return sorted(self.shards)
+
+    @property
+    def query_cache(self) -> Any:
+        """샤드들이 공유하는 질의 임베딩 캐시 (없으면 None)"""
+        for shard in self.shards.values():
+            cache = getattr(shard, "query_cache", None)
+            if cache is not None:
+                return cache
+        return None
+
+    def __len__(self) -> int:
+        return sum(len(s) for s in self.shards.values())
+
+    def set_shard(self, site: str, retriever: Any) -> None:
+        """샤드 교체 (다른 곳에서 다시 만들거나 다시 읽은 검색기)"""
+        with self._lock:
+            self._shards[site] = retriever
+            self.index_version += 1
+
+    def rebuild_shard(self, site: str, store: "DocumentStore | None" = None) -> Any:
+        """한 샤드만 다시 구축 (store가 없으면 현재 샤드의 저장소로). 새 샤드 반환"""
+        if store is None:
+            store = self.shards[site]._store
+        shard = self._factory(store, site)
+        self.set_shard(site, shard)
+        return shard
+
+    def drop_shard(self, site: str) -> None:
+        with self._lock:
+            if self._shards.pop(site, None) is not None:
+                self.index_version += 1
+
+    def add_documents(
+        self,
+        texts: "List[str] | DocumentStore",
+        metadatas: Optional[List[Dict[str, Any]]] = None,
+    ) -> List[int]:
+        """문서를 site별 샤드에 추가 (없는 site는 새 샤드 생성). 추가된 review id 반환"""
+        added = as_document_store(texts, metadatas)
+        new_ids: set = set()
+        for site, part in split_by_site(added).items():
+            shard = self.shards.get(site)
+            if shard is None:
+                self.set_shard(site, self._factory(part, site))
+                new_ids.update(int(i) for i in part.review_ids)
+            else:
+                new_ids.update(shard.add_documents(part))
+        if new_ids:
+            with self._lock:
+                self.index_version += 1
+        return [int(i) for i in added.review_ids if int(i) in new_ids]
+
+    def remove_documents(self, review_ids: List[int]) -> int:
+        """review id로 문서 삭제 (모든 샤드에 전달). 삭제된 문서 수 반환"""
+        removed = sum(shard.remove_documents(review_ids) for shard in self.shards.values())
+        if removed:
+            with self._lock:
+                self.index_version += 1
+        return removed
+
+    def _targets(self, filters: "ReviewFilter | Dict[str, Any] | None") -> List[Any]:
+        shards = self.shards
+        f = ReviewFilter.coerce(filters)
+        sites = sorted(shards) if f is None or f.sites is None else [s for s in sorted(shards) if s in f.sites]
+        return [shards[s] for s in sites]
+
+    def _fan_out(self, targets: List[Any], call: Callable[[Any], Any]) -> List[Any]:
+        if len(targets) <= 1:
+            return [call(t) for t in targets]
+        return list(self._executor.map(call, targets))
+
+    @staticmethod
+    def _prepare(targets: List[Any], queries: List[str]) -> None:
+        # 샤드들이 질의 캐시를 공유하므로 한 샤드에서 미리 임베딩해 두면 나머지는 캐시에서 읽음
+        for shard in targets:
+            encode = getattr(shard, "encode_queries", None)
+            if callable(encode):
+                encode([q for q in queries if q])
+                return
+
+    @staticmethod
+    def _merge(per_shard: List[List[RetrievedDocument]], k: Optional[int]) -> List[RetrievedDocument]:
+        # 샤드별 결과는 이미 점수 내림차순이므로 힙 병합 후 앞에서 k개만 꺼냄
+        merged = heapq.merge(*per_shard, key=lambda d: -d.score)
+        return list(itertools.islice(merged, k))
+
+    def get_relevant_documents(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filters: "ReviewFilter | Dict[str, Any] | None" = None,
+    ) -> List[RetrievedDocument]:
+        """모든(필터에 맞는) 샤드를 동시에 검색해 점수순 상위 k개 반환"""
+        if not query:
+            return []
+        return self.get_relevant_documents_batch([query], k=k, filters=filters)[0]
+
+    def get_relevant_documents_batch(
+        self,
+        queries: List[str],
+        k: Optional[int] = None,
+        filters: "ReviewFilter | Dict[str, Any] | None" = None,
+    ) -> List[List[RetrievedDocument]]:
+        targets = self._targets(filters)
+        if not targets or not any(queries):
+            return [[] for _ in queries]
+        self._prepare(targets, queries)
+        kwargs: Dict[str, Any] = {"filters": filters}
+        if k is not None:
+            kwargs["k"] = k
+        per_shard = self._fan_out(targets, lambda shard: shard.get_relevant_documents_batch(queries, **kwargs))
+        return [self._merge([docs[qi] for docs in per_shard], k) for qi in range(len(queries))]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
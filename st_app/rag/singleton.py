@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import Future
+from typing import Callable, Generic, Optional, TypeVar
+
+
+T = TypeVar("T")
+_MISSING = object()
+
+
+class SingleFlight(Generic[T]):
+    """스레드 안전한 지연 초기화 싱글턴.
+
+    - 처음 호출한 스레드만 factory를 실행하고, 그동안 들어온 호출은 같은 "building" Future를 기다림
+    - 만들어진 뒤에는 잠금 없이 바로 반환
+    - factory가 실패하면 기다리던 호출 모두에게 같은 예외를 전달하고, 다음 호출에서 다시 시도
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._value: object = _MISSING
+        self._building: Optional[Future] = None
+
+    def get(self, factory: Callable[[], T]) -> T:
+        value = self._value
+        if value is not _MISSING:
+            return value  # type: ignore[return-value]
+
+        with self._lock:
+            if self._value is not _MISSING:
+                return self._value  # type: ignore[return-value]
+            future = self._building
+            owner = future is None
+            if owner:
+                future = self._building = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            value = factory()
+        except BaseException as e:
+            with self._lock:
+                self._building = None
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._value = value
+            self._building = None
+        future.set_result(value)
+        return value  # type: ignore[return-value]
+
+    def peek(self) -> Optional[T]:
+        """만들어진 값 (아직 없으면 None, 만들기를 시작하지 않음)"""
+        value = self._value
+        return None if value is _MISSING else value  # type: ignore[return-value]
+
+    @property
+    def building(self) -> bool:
+        return self._building is not None
+
+    def reset(self) -> None:
+        """다음 get에서 새로 만들도록 값을 비움 (진행 중인 생성은 그대로 끝남)"""
+        with self._lock:
+            self._value = _MISSING
@@ -0,0 +1,551 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+# (CSV 파일명, 사이트) 목록
+REVIEW_CSV_FILES = [
+    ("preprocessed_reviews_yes24.csv", "yes24"),
+    ("preprocessed_reviews_aladin.csv", "aladin"),
+    ("preprocessed_reviews_kyobo.csv", "kyobo"),
+]
+
+# 텍스트 컬럼 후보 (다양한 컬럼명 대응, 앞쪽 우선)
+TEXT_COLUMNS = ("text", "review_text", "content", "review", "cleaned_text")
+
+MIN_TEXT_LENGTH = 10
+
+
+def _date_str(value: np.datetime64) -> str:
+    return "" if np.isnat(value) else str(value)
+
+
+@dataclass
+class DocumentStore:
+    """리뷰 문서를 병렬 배열로 보관하는 컴팩트 컬럼형 저장소.
+
+    - 텍스트: UTF-8 버퍼 하나 + 오프셋 배열 (문서 i = buffer[offsets[i]:offsets[i+1]])
+    - site: 범주형 코드(int8) + 이름 목록
+    - score(리뷰 평점), date: NumPy 배열
+    행 위치가 곧 문서 id이며, 검색 결과는 이 저장소를 가리키는 뷰로 만들어집니다.
+
+    증분 추가/삭제용으로 문서마다 내용 기반의 안정적인 review id를 두고,
+    삭제는 행을 지우지 않고 removed 마스크(tombstone)로 표시합니다.
+    add/remove는 새 저장소를 반환하므로 이미 반환된 검색 결과 뷰는 그대로 유효합니다.
+    """
+
+    text_buffer: bytes
+    text_offsets: np.ndarray  # int64, 길이 n+1
+    site_codes: np.ndarray    # int8
+    site_names: List[str]
+    scores: np.ndarray        # float32, 리뷰 평점
+    dates: np.ndarray         # datetime64[D], 없으면 NaT
+    removed: Optional[np.ndarray] = None  # bool, 삭제된 행 (None이면 없음)
+    dup_counts: Optional[np.ndarray] = None  # int32, 준중복으로 묶인 문서 수 (None이면 묶기 안 함)
+    _review_ids: Optional[np.ndarray] = field(default=None, repr=False, compare=False)
+    _filter_index: Optional["FilterIndex"] = field(default=None, init=False, repr=False, compare=False)
+    _id_order: Optional[np.ndarray] = field(default=None, init=False, repr=False, compare=False)
+
+    def __len__(self) -> int:
+        return len(self.site_codes)
+
+    @property
+    def review_ids(self) -> np.ndarray:
+        """문서별 안정 id (int64). site/날짜/본문 해시이며 같은 내용이 반복되면 등장 순번을 섞습니다."""
+        if self._review_ids is None:
+            self._review_ids = _compute_review_ids(self)
+        return self._review_ids
+
+    def positions_of(self, review_ids: Sequence[int]) -> np.ndarray:
+        """review id → 행 위치 (없으면 -1)"""
+        ids = np.asarray(review_ids, dtype=np.int64).reshape(-1)
+        if self._id_order is None:
+            self._id_order = np.argsort(self.review_ids, kind="stable")
+        sorted_ids = self.review_ids[self._id_order]
+        pos = np.searchsorted(sorted_ids, ids)
+        pos_ok = pos < len(sorted_ids)
+        found = np.zeros(len(ids), dtype=bool)
+        found[pos_ok] = sorted_ids[pos[pos_ok]] == ids[pos_ok]
+        out = np.full(len(ids), -1, dtype=np.int64)
+        out[found] = self._id_order[pos[found]]
+        return out
+
+    def alive_mask(self) -> Optional[np.ndarray]:
+        """삭제되지 않은 행 마스크 (삭제된 행이 없으면 None)"""
+        if self.removed is None or not self.removed.any():
+            return None
+        return ~self.removed
+
+    def alive_positions(self) -> np.ndarray:
+        alive = self.alive_mask()
+        return np.arange(len(self), dtype=np.int64) if alive is None else np.flatnonzero(alive)
+
+    @property
+    def num_alive(self) -> int:
+        return len(self) if self.removed is None else int(len(self) - self.removed.sum())
+
+    def fingerprint(self) -> str:
+        """살아 있는 문서 id 집합의 지문 (행 순서와 무관)"""
+        ids = np.sort(self.review_ids[self.alive_positions()]).astype("<i8")
+        return hashlib.sha1(ids.tobytes()).hexdigest()
+
+    def row_fingerprint(self) -> str:
+        """행 순서까지 반영한 전체 행 지문 (삭제 표시된 행 포함, 행 단위 산출물 검증용)"""
+        return hashlib.sha1(self.review_ids.astype("<i8").tobytes()).hexdigest()
+
+    def _removed_copy(self) -> np.ndarray:
+        return np.zeros(len(self), dtype=bool) if self.removed is None else self.removed.copy()
+
+    def add(self, other: "DocumentStore") -> Tuple["DocumentStore", np.ndarray]:
+        """문서 추가. (새 저장소, 새로 검색 대상이 된 행 위치) 반환.
+
+        이미 있는 review id는 건너뛰고, 삭제됐던 문서면 되살립니다.
+        따라서 같은 추가를 여러 번 적용해도 결과가 같습니다.
+        """
+        new_ids = other.review_ids
+        pos = self.positions_of(new_ids)
+        removed = self._removed_copy()
+        revived = pos[pos >= 0]
+        revived = revived[removed[revived]]
+        removed[revived] = False
+
+        fresh = np.flatnonzero(pos < 0)
+        if not len(fresh):
+            return replace(self, removed=removed, _review_ids=self.review_ids), np.sort(revived)
+        merged = DocumentStore.concat([self, other.subset(fresh)])
+        merged.removed = np.concatenate([removed, np.zeros(len(fresh), dtype=bool)])
+        merged._review_ids = np.concatenate([self.review_ids, new_ids[fresh]])
+        added = np.arange(len(self), len(merged), dtype=np.int64)
+        return merged, np.concatenate([np.sort(revived), added])
+
+    def remove(self, review_ids: Sequence[int]) -> Tuple["DocumentStore", np.ndarray]:
+        """review id로 문서 삭제 표시. (새 저장소, 새로 삭제된 행 위치) 반환"""
+        pos = self.positions_of(review_ids)
+        pos = pos[pos >= 0]
+        removed = self._removed_copy()
+        pos = np.unique(pos[~removed[pos]])
+        removed[pos] = True
+        return replace(self, removed=removed, _review_ids=self.review_ids), pos
+
+    def records(self, positions: Optional[Sequence[int]] = None) -> List[Dict[str, Any]]:
+        """JSON으로 저장 가능한 문서 목록 (증분 기록용)"""
+        rows = range(len(self)) if positions is None else positions
+        return [
+            {"text": self.text(int(i)), "site": self.site(int(i)), "score": float(self.scores[i]), "date": self.date(int(i))}
+            for i in rows
+        ]
+
+    @property
+    def filter_index(self) -> "FilterIndex":
+        if self._filter_index is None:
+            self._filter_index = FilterIndex(self)
+        return self._filter_index
+
+    def filter_mask(self, filters: "ReviewFilter | Dict[str, Any] | None") -> Optional[np.ndarray]:
+        """필터를 만족하고 삭제되지 않은 문서 마스크 (둘 다 해당 없으면 None)"""
+        filters = ReviewFilter.coerce(filters)
+        alive = self.alive_mask()
+        if filters is None:
+            return alive
+        mask = self.filter_index.mask(filters)
+        return mask if alive is None else mask & alive
+
+    def text(self, idx: int) -> str:
+        start, end = self.text_offsets[idx], self.text_offsets[idx + 1]
+        return self.text_buffer[start:end].decode("utf-8")
+
+    def iter_texts(self) -> Iterator[str]:
+        for i in range(len(self)):
+            yield self.text(i)
+
+    @property
+    def texts(self) -> List[str]:
+        """전체 텍스트 목록 (필요할 때만 디코딩)"""
+        return list(self.iter_texts())
+
+    @property
+    def sites(self) -> np.ndarray:
+        return np.asarray(self.site_names, dtype=object)[self.site_codes]
+
+    def site(self, idx: int) -> str:
+        return self.site_names[self.site_codes[idx]]
+
+    def date(self, idx: int) -> str:
+        return _date_str(self.dates[idx])
+
+    def metadata(self, idx: int) -> Dict[str, Any]:
+        site = self.site(idx)
+        meta = {
+            "source": site,
+            "score": float(self.scores[idx]),
+            "date": self.date(idx),
+            "site": site,
+        }
+        if self.dup_counts is not None:
+            meta["dup_count"] = int(self.dup_counts[idx])
+        return meta
+
+    def subset(self, indices: Sequence[int]) -> "DocumentStore":
+        """선택한 행만 담은 저장소 (review id/삭제 표시/중복 수 유지)"""
+        idx = np.asarray(indices, dtype=np.int64)
+        out = DocumentStore.from_columns(
+            texts=[self.text(int(i)) for i in idx],
+            sites=[self.site(int(i)) for i in idx],
+            scores=self.scores[idx],
+            dates=self.dates[idx],
+        )
+        out._review_ids = self.review_ids[idx]
+        out.removed = None if self.removed is None else self.removed[idx]
+        out.dup_counts = None if self.dup_counts is None else self.dup_counts[idx]
+        return out
+
+    @classmethod
+    def from_columns(
+        cls,
+        texts: Sequence[str],
+        sites: Sequence[str],
+        scores: Sequence[float],
+        dates: Sequence[Any],
+    ) -> "DocumentStore":
+        encoded = [t.encode("utf-8") for t in texts]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        if encoded:
+            np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        site_names, site_codes = np.unique(np.asarray(sites, dtype=object).astype(str), return_inverse=True)
+        return cls(
+            text_buffer=b"".join(encoded),
+            text_offsets=offsets,
+            site_codes=site_codes.astype(np.int8).reshape(-1),
+            site_names=[str(s) for s in site_names],
+            scores=np.asarray(scores, dtype=np.float32).reshape(-1),
+            dates=_to_dates(dates),
+        )
+
+    @classmethod
+    def from_records(cls, texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]) -> "DocumentStore":
+        """(텍스트, 메타데이터 dict) 목록으로부터 생성 (기존 API 호환용)"""
+        return cls.from_columns(
+            texts=texts,
+            sites=[m.get("site") or m.get("source") or "unknown" for m in metadatas],
+            scores=[float(m.get("score") or 0.0) for m in metadatas],
+            dates=[m.get("date") or "" for m in metadatas],
+        )
+
+    @classmethod
+    def empty(cls) -> "DocumentStore":
+        return cls.from_columns([], [], [], [])
+
+    @classmethod
+    def concat(cls, parts: Sequence["DocumentStore"]) -> "DocumentStore":
+        """저장소 이어붙이기 (텍스트 버퍼를 다시 인코딩하지 않음)"""
+        parts = [p for p in parts if len(p)]
+        if not parts:
+            return cls.empty()
+        site_names = sorted({name for p in parts for name in p.site_names})
+        offsets = [parts[0].text_offsets[:1]]
+        base = 0
+        for p in parts:
+            offsets.append(p.text_offsets[1:] + base)
+            base += int(p.text_offsets[-1])
+        return cls(
+            text_buffer=b"".join(p.text_buffer for p in parts),
+            text_offsets=np.concatenate(offsets).astype(np.int64),
+            site_codes=np.concatenate(
+                [np.searchsorted(site_names, np.asarray(p.site_names, dtype=str))[p.site_codes] for p in parts]
+            ).astype(np.int8),
+            site_names=site_names,
+            scores=np.concatenate([p.scores for p in parts]),
+            dates=np.concatenate([p.dates for p in parts]),
+            dup_counts=(
+                np.concatenate([np.ones(len(p), np.int32) if p.dup_counts is None else p.dup_counts for p in parts])
+                if any(p.dup_counts is not None for p in parts)
+                else None
+            ),
+        )
+
+
+@dataclass(frozen=True)
+class ReviewFilter:
+    """리뷰 메타데이터 검색 필터 (모든 조건은 AND, 범위는 양끝 포함)"""
+
+    sites: Optional[Tuple[str, ...]] = None
+    min_score: Optional[float] = None
+    max_score: Optional[float] = None
+    date_from: Optional[str] = None  # "YYYY-MM-DD"
+    date_to: Optional[str] = None
+
+    def __post_init__(self) -> None:
+        if self.sites is not None and not isinstance(self.sites, tuple):
+            sites = (self.sites,) if isinstance(self.sites, str) else tuple(self.sites)
+            object.__setattr__(self, "sites", sites)
+
+    def is_empty(self) -> bool:
+        return (
+            self.sites is None
+            and self.min_score is None
+            and self.max_score is None
+            and not self.date_from
+            and not self.date_to
+        )
+
+    @classmethod
+    def coerce(cls, value: "ReviewFilter | Dict[str, Any] | None") -> Optional["ReviewFilter"]:
+        """dict/None도 받아 ReviewFilter로 변환 (조건이 없으면 None)"""
+        if value is None:
+            return None
+        if isinstance(value, dict):
+            value = cls(**value)
+        return None if value.is_empty() else value
+
+
+class FilterIndex:
+    """필터용 사전 계산 구조.
+
+    - site별 비트맵 (boolean 마스크)
+    - 평점/날짜 오름차순 정렬 순서 → 범위 조건은 searchsorted로 구간만 선택
+    """
+
+    def __init__(self, store: DocumentStore) -> None:
+        n = len(store)
+        self._n = n
+        self._site_names = list(store.site_names)
+        self._site_bitmaps = [store.site_codes == code for code in range(len(self._site_names))]
+        self._score_order = np.argsort(store.scores, kind="stable")
+        self._sorted_scores = store.scores[self._score_order]
+        dated = np.flatnonzero(~np.isnat(store.dates))
+        self._date_order = dated[np.argsort(store.dates[dated], kind="stable")]
+        self._sorted_dates = store.dates[self._date_order]
+
+    def _range_mask(self, order: np.ndarray, sorted_vals: np.ndarray, lo: Any, hi: Any) -> np.ndarray:
+        start = 0 if lo is None else int(np.searchsorted(sorted_vals, lo, side="left"))
+        end = len(sorted_vals) if hi is None else int(np.searchsorted(sorted_vals, hi, side="right"))
+        mask = np.zeros(self._n, dtype=bool)
+        mask[order[start:end]] = True
+        return mask
+
+    def mask(self, filters: ReviewFilter) -> np.ndarray:
+        mask = np.ones(self._n, dtype=bool)
+        if filters.sites is not None:
+            site_mask = np.zeros(self._n, dtype=bool)
+            for site in filters.sites:
+                if site in self._site_names:
+                    site_mask |= self._site_bitmaps[self._site_names.index(site)]
+            mask &= site_mask
+        if filters.min_score is not None or filters.max_score is not None:
+            lo = None if filters.min_score is None else np.float32(filters.min_score)
+            hi = None if filters.max_score is None else np.float32(filters.max_score)
+            mask &= self._range_mask(self._score_order, self._sorted_scores, lo, hi)
+        if filters.date_from or filters.date_to:
+            lo = np.datetime64(filters.date_from, "D") if filters.date_from else None
+            hi = np.datetime64(filters.date_to, "D") if filters.date_to else None
+            mask &= self._range_mask(self._date_order, self._sorted_dates, lo, hi)
+        return mask
+
+
+def top_k_indices(scores: np.ndarray, k: Optional[int]) -> np.ndarray:
+    """점수 내림차순 상위 k개 인덱스.
+
+    전체 정렬 대신 argpartition으로 k개만 고른 뒤 그 k개만 정렬합니다.
+    """
+    n = scores.shape[0]
+    if k is None or k >= n:
+        return np.argsort(-scores, kind="stable")
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part], kind="stable")]
+
+
+def _compute_review_ids(store: DocumentStore) -> np.ndarray:
+    ids = np.empty(len(store), dtype=np.int64)
+    seen: Dict[bytes, int] = {}
+    for i, text in enumerate(store.iter_texts()):
+        digest = hashlib.sha1(f"{store.site(i)}\x1f{store.date(i)}\x1f{text}".encode("utf-8")).digest()
+        occurrence = seen.get(digest, 0)
+        seen[digest] = occurrence + 1
+        if occurrence:
+            digest = hashlib.sha1(digest + str(occurrence).encode("ascii")).digest()
+        # FAISS id(int64)로 쓰도록 양수 60비트로 제한
+        ids[i] = int.from_bytes(digest[:8], "little") >> 4
+    return ids
+
+
+def _to_dates(values: Sequence[Any]) -> np.ndarray:
+    arr = np.asarray(values)
+    if arr.dtype.kind == "M":
+        return arr.astype("datetime64[D]")
+    import pandas as pd
+
+    parsed = pd.to_datetime(pd.Series(arr, dtype=object).replace("", None), errors="coerce")
+    return parsed.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+
+
+class RetrievedDocument:
+    """검색된 문서를 나타내는 클래스.
+
+    저장소의 한 행을 가리키는 `__slots__` 뷰이며, page_content/metadata는
+    처음 접근할 때 만들어집니다. 직접 값을 넘겨 생성할 수도 있습니다.
+    """
+
+    __slots__ = ("score", "_store", "_idx", "_page_content", "_metadata")
+
+    def __init__(
+        self,
+        page_content: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        score: float = 0.0,
+    ):
+        self.score = score
+        self._store: Optional[DocumentStore] = None
+        self._idx = -1
+        self._page_content = page_content
+        self._metadata = metadata
+
+    @classmethod
+    def from_store(cls, store: DocumentStore, idx: int, score: float) -> "RetrievedDocument":
+        doc = cls(score=score)
+        doc._store = store
+        doc._idx = idx
+        return doc
+
+    @property
+    def doc_id(self) -> int:
+        """저장소 내 행 위치 (직접 생성한 문서는 -1)"""
+        return self._idx
+
+    @property
+    def review_id(self) -> Optional[int]:
+        """증분 추가/삭제에 쓰는 안정 id (직접 생성한 문서는 None)"""
+        return None if self._store is None else int(self._store.review_ids[self._idx])
+
+    @property
+    def page_content(self) -> str:
+        if self._page_content is None and self._store is not None:
+            self._page_content = self._store.text(self._idx)
+        return self._page_content or ""
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        if self._metadata is None:
+            if self._store is None:
+                self._metadata = {}
+            else:
+                # 기존과 같이 "score"는 검색 유사도, 리뷰 평점은 "rating"
+                meta = self._store.metadata(self._idx)
+                meta["rating"] = meta["score"]
+                meta["score"] = self.score
+                self._metadata = meta
+        return self._metadata
+
+    def __repr__(self) -> str:
+        return f"RetrievedDocument(score={self.score:.4f}, page_content={self.page_content[:30]!r})"
+
+
+def as_document_store(
+    texts: "Sequence[str] | DocumentStore",
+    metadatas: Optional[Sequence[Dict[str, Any]]] = None,
+) -> DocumentStore:
+    """검색기 생성자 인자를 DocumentStore로 통일"""
+    if isinstance(texts, DocumentStore):
+        return texts
+    return DocumentStore.from_records(list(texts), list(metadatas or [{} for _ in texts]))
+
+
+class DeltaLog:
+    """검색 코퍼스 증분 변경 기록 (JSON Lines).
+
+    한 줄에 하나씩 {"op": "add", "docs": [...]} 또는 {"op": "remove", "ids": [...]}를
+    덧붙이고, 재시작 시 CSV에서 읽은 저장소 위에 순서대로 다시 적용합니다.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+
+    def _append(self, record: Dict[str, Any]) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def record_add(self, store: DocumentStore) -> None:
+        if len(store):
+            self._append({"op": "add", "docs": store.records()})
+
+    def record_remove(self, review_ids: Sequence[int]) -> None:
+        ids = [int(i) for i in review_ids]
+        if ids:
+            self._append({"op": "remove", "ids": ids})
+
+    def replay(self, store: DocumentStore) -> DocumentStore:
+        """기록된 추가/삭제를 저장소에 적용 (이미 반영된 변경은 영향 없음)"""
+        if not os.path.exists(self.path):
+            return store
+        with open(self.path, "r", encoding="utf-8") as f:
+            for line_no, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                    if record["op"] == "add":
+                        docs = record["docs"]
+                        added = DocumentStore.from_records([d["text"] for d in docs], docs)
+                        store, _ = store.add(added)
+                    elif record["op"] == "remove":
+                        store, _ = store.remove(record["ids"])
+                except Exception as e:
+                    print(f"증분 기록 {self.path}:{line_no} 적용 실패: {e}")
+        return store
+
+
+def _read_review_csv(file_path: str, site: str) -> DocumentStore:
+    """CSV 하나를 필요한 컬럼만 읽어 벡터 연산으로 필터링"""
+    import pandas as pd
+
+    header = pd.read_csv(file_path, encoding="utf-8", nrows=0).columns
+    text_col = next((c for c in TEXT_COLUMNS if c in header), None)
+    if text_col is None:
+        return DocumentStore.empty()
+
+    wanted = {text_col, "score", "date"}
+    df = pd.read_csv(file_path, encoding="utf-8", usecols=lambda c: c in wanted)
+
+    texts = df[text_col].fillna("").astype(str).str.strip()
+    keep = ((texts.str.len() > MIN_TEXT_LENGTH) & (texts != "nan")).to_numpy()
+    n = int(keep.sum())
+
+    if "score" in df.columns:
+        scores = pd.to_numeric(df["score"], errors="coerce").fillna(0.0).to_numpy(dtype=np.float32)[keep]
+    else:
+        scores = np.zeros(n, dtype=np.float32)
+    if "date" in df.columns:
+        dates = pd.to_datetime(df["date"], errors="coerce").to_numpy(dtype="datetime64[ns]")[keep]
+    else:
+        dates = np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]")
+
+    return DocumentStore.from_columns(
+        texts=texts.to_numpy(dtype=object)[keep].tolist(),
+        sites=[site] * n,
+        scores=scores,
+        dates=dates,
+    )
+
+
+def load_review_store(base_dir: str) -> DocumentStore:
+    """전처리된 리뷰 CSV들을 컬럼형 저장소로 로드"""
+    parts: List[DocumentStore] = []
+    for csv_file, site in REVIEW_CSV_FILES:
+        file_path = os.path.join(base_dir, csv_file)
+        if not os.path.exists(file_path):
+            continue
+        try:
+            parts.append(_read_review_csv(file_path, site))
+        except Exception as e:
+            print(f"CSV 파일 {csv_file} 로드 실패: {e}")
+    return DocumentStore.concat(parts)
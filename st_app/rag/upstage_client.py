@@ -0,0 +1,218 @@
+"""Upstage 임베딩 API 배치 클라이언트.
+
+- keep-alive 연결 풀(requests.Session)을 공유하고, 여러 배치를 스레드 풀에서 동시에 전송 (동시성 상한)
+- 적응형 배치 크기: 성공하면 조금씩 키우고, 429/413/타임아웃이면 절반으로 줄임
+  (413이나 한 번에 처리하기 너무 큰 배치는 반으로 나눠 다시 대기열에 넣음)
+- 429/5xx/연결 오류는 지수 백오프(+지터, Retry-After 우선) 후 재시도
+- strict 모드(기본)에서는 실패한 배치를 다시 대기열에 넣고, 재시도를 다 써도 실패하면 예외를 올림
+  (영벡터로 인덱스/캐시를 오염시키지 않음). strict가 아니면 그 배치만 영벡터로 채움
+"""
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Deque, Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+
+
+RETRY_STATUS = frozenset({429, 500, 502, 503, 504})
+SHRINK_STATUS = frozenset({413, 429})
+
+
+class EmbeddingAPIError(RuntimeError):
+    """임베딩 배치 요청 실패 (status가 None이면 연결/타임아웃 오류)"""
+
+    def __init__(self, message: str, status: Optional[int] = None, retry_after: Optional[float] = None) -> None:
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status is None or self.status in RETRY_STATUS
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _retry_after(response: requests.Response) -> Optional[float]:
+    try:
+        return max(0.0, float(response.headers.get("Retry-After", "")))
+    except ValueError:
+        return None
+
+
+class UpstageEmbeddingClient:
+    """풀링/동시/재시도 배치 임베딩 클라이언트 (스레드 안전)"""
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str,
+        base_url: str = "https://api.upstage.ai",
+        concurrency: int = 4,
+        batch_size: int = 16,
+        max_batch_size: int = 100,
+        max_retries: int = 5,
+        backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        timeout: float = 30.0,
+        strict: bool = True,
+    ) -> None:
+        self.url = f"{base_url.rstrip('/')}/v1/embeddings"
+        self.model = model
+        self.concurrency = max(1, concurrency)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+        self.strict = strict
+        self.dimension: Optional[int] = None
+
+        self._batch_size = min(max(1, batch_size), self.max_batch_size)
+        self._size_lock = threading.Lock()
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+        self._session.mount("http://", adapter)
+        self._session.mount("https://", adapter)
+        self._session.headers.update({"Authorization": f"Bearer {api_key}", "Content-Type": "application/json"})
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="upstage-embed")
+
+    @classmethod
+    def from_env(cls, api_key: str, model: str) -> "UpstageEmbeddingClient":
+        """UPSTAGE_BASE_URL, UPSTAGE_EMBED_CONCURRENCY/_BATCH/_MAX_BATCH/_RETRIES/_TIMEOUT/_STRICT 로 조정"""
+        return cls(
+            api_key=api_key,
+            model=model,
+            base_url=os.getenv("UPSTAGE_BASE_URL", "https://api.upstage.ai"),
+            concurrency=_env_int("UPSTAGE_EMBED_CONCURRENCY", 4),
+            batch_size=_env_int("UPSTAGE_EMBED_BATCH", 16),
+            max_batch_size=_env_int("UPSTAGE_EMBED_MAX_BATCH", 100),
+            max_retries=_env_int("UPSTAGE_EMBED_RETRIES", 5),
+            timeout=float(_env_int("UPSTAGE_EMBED_TIMEOUT", 30)),
+            strict=os.getenv("UPSTAGE_EMBED_STRICT", "1").strip().lower() not in ("0", "false", "no", "off"),
+        )
+
+    @property
+    def batch_size(self) -> int:
+        """다음 배치에 쓸 (적응형) 배치 크기"""
+        return self._batch_size
+
+    def _grow(self) -> None:
+        with self._size_lock:
+            self._batch_size = min(self.max_batch_size, self._batch_size + max(1, self._batch_size // 4))
+
+    def _shrink(self, size: int) -> None:
+        with self._size_lock:
+            self._batch_size = max(1, min(self._batch_size, size) // 2)
+
+    def _delay(self, attempt: int, error: Optional[EmbeddingAPIError]) -> float:
+        if attempt == 0:
+            return 0.0
+        if error is not None and error.retry_after is not None:
+            return min(self.max_backoff, error.retry_after)
+        return min(self.max_backoff, self.backoff * 2 ** (attempt - 1)) * random.uniform(0.5, 1.0)
+
+    def _post(self, texts: List[str], delay: float) -> np.ndarray:
+        if delay > 0:
+            time.sleep(delay)
+        try:
+            response = self._session.post(self.url, json={"model": self.model, "input": texts}, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise EmbeddingAPIError(f"embedding request failed: {e}") from e
+        if response.status_code >= 400:
+            raise EmbeddingAPIError(
+                f"embedding request failed: HTTP {response.status_code} {response.text[:200]}",
+                status=response.status_code,
+                retry_after=_retry_after(response),
+            )
+        data = sorted(response.json()["data"], key=lambda item: item.get("index", 0))
+        vecs = np.asarray([item["embedding"] for item in data], dtype="float32")
+        if len(vecs) != len(texts):
+            raise EmbeddingAPIError(f"expected {len(texts)} embeddings, got {len(vecs)}", status=502)
+        return vecs
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """texts 순서대로 (len(texts), dim) 임베딩"""
+        if not texts:
+            return np.zeros((0, self.dimension or 0), dtype="float32")
+
+        done: Dict[int, np.ndarray] = {}  # 시작 위치 -> 벡터
+        failed: List[Tuple[int, int]] = []
+        retries: Deque[Tuple[int, int, int, Optional[EmbeddingAPIError]]] = deque()
+        running: Dict[Future, Tuple[int, int, int]] = {}
+        cursor = 0
+
+        def next_batch() -> Optional[Tuple[int, int, int, Optional[EmbeddingAPIError]]]:
+            nonlocal cursor
+            if retries:
+                return retries.popleft()
+            if cursor < len(texts):
+                start, cursor = cursor, min(len(texts), cursor + self._batch_size)
+                return start, cursor, 0, None
+            return None
+
+        try:
+            while True:
+                while len(running) < self.concurrency:
+                    batch = next_batch()
+                    if batch is None:
+                        break
+                    start, end, attempt, error = batch
+                    future = self._executor.submit(self._post, texts[start:end], self._delay(attempt, error))
+                    running[future] = (start, end, attempt)
+                if not running:
+                    break
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    start, end, attempt = running.pop(future)
+                    try:
+                        done[start] = future.result()
+                        self.dimension = done[start].shape[1]
+                        self._grow()
+                        continue
+                    except EmbeddingAPIError as e:
+                        error = e
+
+                    size = end - start
+                    if error.status in SHRINK_STATUS or error.status is None:
+                        self._shrink(size)
+                    if error.status == 413 and size > 1:
+                        # 배치가 너무 큼: 반으로 나눠 재시도 횟수 소모 없이 다시 대기열로
+                        mid = start + size // 2
+                        retries.extendleft([(mid, end, attempt, None), (start, mid, attempt, None)])
+                    elif error.retryable and attempt < self.max_retries:
+                        retries.append((start, end, attempt + 1, error))
+                    elif self.strict or not error.retryable:
+                        # 인증/요청 형식 오류(4xx)는 strict가 아니어도 그대로 올림
+                        raise error
+                    else:
+                        print(f"임베딩 배치 실패, 영벡터로 채움 ({size}개): {error}")
+                        failed.append((start, end))
+        finally:
+            for future in running:
+                future.cancel()
+
+        if failed and self.dimension is None:
+            raise EmbeddingAPIError("all embedding batches failed")
+        out = np.zeros((len(texts), self.dimension or 0), dtype="float32")
+        for start, vecs in done.items():
+            out[start : start + len(vecs)] = vecs
+        return out
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+        self._session.close()
@@ -0,0 +1,115 @@
+"""프로세스 시작 시 검색기/LLM 클라이언트를 백그라운드에서 미리 만들어 두는 warm-up.
+
+환경변수 RAG_WARMUP=1 일 때만 FastAPI startup / Streamlit 앱에서 시작합니다.
+getter들이 SingleFlight라서 warm-up 도중 들어온 요청은 같은 구축을 기다리고 다시 만들지 않습니다.
+"""
+from __future__ import annotations
+
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+
+Step = Tuple[str, Callable[[], Any]]
+
+
+def warmup_enabled() -> bool:
+    """RAG_WARMUP=1|true|yes|on 이면 warm-up 사용 (기본 꺼짐)"""
+    return os.getenv("RAG_WARMUP", "0").strip().lower() in ("1", "true", "yes", "on")
+
+
+def _warm_retriever() -> Any:
+    """rag_review_node와 같은 순서: API 임베딩 검색(FAISS 또는 NumPy), 실패하면 희소 검색"""
+    from st_app.rag.retriever import get_dense_retriever, get_sparse_retriever
+
+    try:
+        return get_dense_retriever(use_api=True)
+    except Exception as e:
+        print(f"[RAG] warm-up: 임베딩 검색 실패, 희소 검색으로 준비: {e}")
+        return get_sparse_retriever()
+
+
+def _warm_llm() -> Any:
+    from st_app.rag.llm import get_llm
+
+    return get_llm()
+
+
+DEFAULT_STEPS: List[Step] = [("retriever", _warm_retriever), ("llm", _warm_llm)]
+
+
+class WarmUp:
+    """단계별 warm-up을 한 번만 백그라운드 스레드로 실행하고 준비 상태를 노출.
+
+    시작하지 않았거나 모든 단계가 끝나면(실패 포함) ready. 실패한 단계는 errors에 남고
+    요청 시점에 원래 경로대로 다시 시도됩니다.
+    """
+
+    def __init__(self, steps: Optional[Sequence[Step]] = None) -> None:
+        self._steps = list(DEFAULT_STEPS if steps is None else steps)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._done = threading.Event()
+        self._finished: List[str] = []
+        self._errors: Dict[str, str] = {}
+        self._started_at: Optional[float] = None
+        self._elapsed: Optional[float] = None
+
+    def start(self) -> threading.Thread:
+        with self._lock:
+            if self._thread is None:
+                self._started_at = time.perf_counter()
+                self._thread = threading.Thread(target=self._run, name="rag-warmup", daemon=True)
+                self._thread.start()
+            return self._thread
+
+    def _run(self) -> None:
+        for name, step in self._steps:
+            t0 = time.perf_counter()
+            try:
+                step()
+                self._finished.append(name)
+                print(f"[RAG] warm-up: {name} ready ({time.perf_counter() - t0:.1f}s)")
+            except Exception as e:
+                self._errors[name] = str(e)
+                print(f"[RAG] warm-up: {name} failed: {e}")
+        self._elapsed = time.perf_counter() - (self._started_at or 0.0)
+        self._done.set()
+
+    @property
+    def started(self) -> bool:
+        return self._thread is not None
+
+    @property
+    def ready(self) -> bool:
+        return not self.started or self._done.is_set()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self.ready or self._done.wait(timeout)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "started": self.started,
+            "steps": [name for name, _ in self._steps],
+            "finished": list(self._finished),
+            "errors": dict(self._errors),
+            "seconds": None if self._elapsed is None else round(self._elapsed, 3),
+        }
+
+
+_WARMUP = WarmUp()
+
+
+def start_warmup() -> threading.Thread:
+    """기본 warm-up 시작 (이미 시작했으면 같은 스레드 반환)"""
+    return _WARMUP.start()
+
+
+def is_ready() -> bool:
+    return _WARMUP.ready
+
+
+def warmup_status() -> Dict[str, Any]:
+    return _WARMUP.status()
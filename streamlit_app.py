@@ -19,6 +19,7 @@ load_dotenv()
 try:
     from st_app.graph.router import run_graph
     from st_app.graph.router import get_graph_app
+    from st_app.rag.warmup import is_ready, start_warmup, warmup_enabled
     RAG_AVAILABLE = True
 except ImportError:
     RAG_AVAILABLE = False
@@ -48,6 +49,12 @@ def init_api_client():
     return None
 
 
+@st.cache_resource
+def start_rag_warmup():
+    """RAG 검색기/LLM warm-up을 프로세스당 한 번 백그라운드로 시작"""
+    return start_warmup()
+
+
 def init_session_state():
     """Streamlit 세션 상태 초기화"""
     if "chat_state" not in st.session_state:
@@ -104,6 +111,8 @@ def main():
     
     # 초기화
     init_session_state()
+    if RAG_AVAILABLE and warmup_enabled():
+        start_rag_warmup()
     
     # 사이드바 설정
     with st.sidebar:
@@ -129,6 +138,8 @@ def main():
             st.success("✅ API 키가 설정되어 있습니다!")
         else:
             st.error("❌ API 키가 설정되지 않았습니다. 환경변수를 확인해주세요.")
+        if RAG_AVAILABLE and warmup_enabled() and not is_ready():
+            st.info("⏳ 리뷰 검색 인덱스를 준비하는 중입니다...")
         
         # 모드 선택
         st.subheader("🔧 모드 선택")
@@ -0,0 +1,85 @@
+import zlib
+
+import numpy as np
+import pytest
+
+from st_app.rag.bm25 import BM25Retriever
+from st_app.rag.retriever import FaissRetriever, NumpyDenseRetriever, TfIdfRetriever
+
+
+TEXTS = [
+    "광주 민주화 운동을 다룬 소설",
+    "문장이 아름답고 슬픈 소설",
+    "배송이 빠르고 포장이 깔끔했어요",
+    "한강 작가의 소년이 온다 최고의 책",
+    "민주화 운동 당시의 광주를 기억해야 합니다",
+]
+
+
+METAS = [{"source": "yes24", "score": 10.0, "date": "2024-01-01", "site": "yes24"} for _ in TEXTS]
+
+
+FILTER_METAS = [
+    {"site": "yes24", "score": 10.0, "date": "2024-01-01"},
+    {"site": "aladin", "score": 4.0, "date": "2020-05-05"},
+    {"site": "kyobo", "score": 10.0, "date": "2025-03-01"},
+    {"site": "aladin", "score": 8.0, "date": "2025-06-01"},
+    {"site": "yes24", "score": 2.0, "date": ""},
+]
+
+
+class FakeEmbedder:
+    """Deterministic character-bigram hashing embedder for offline tests."""
+
+    model = "fake-bigram"
+    dimension = 64
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, use_cache=True):
+        self.calls.append(list(texts))
+        out = np.zeros((len(texts), self.dimension), dtype="float32")
+        for row, text in enumerate(texts):
+            for a, b in zip(text, text[1:]):
+                out[row, zlib.crc32((a + b).encode()) % self.dimension] += 1.0
+        return out
+
+
+@pytest.fixture
+def fake_embedder():
+    return FakeEmbedder()
+
+
+@pytest.fixture
+def tfidf_retriever():
+    return TfIdfRetriever(TEXTS, METAS)
+
+
+@pytest.fixture
+def bm25_retriever():
+    return BM25Retriever(TEXTS, METAS)
+
+
+@pytest.fixture
+def faiss_retriever():
+    return FaissRetriever(TEXTS, METAS, embedder=FakeEmbedder())
+
+
+def _dense_factory(cls):
+    def make(texts=TEXTS, metadatas=METAS, embedder=None, **kwargs):
+        return cls(texts, metadatas, embedder=FakeEmbedder() if embedder is None else embedder, **kwargs)
+
+    return make
+
+
+@pytest.fixture
+def make_faiss():
+    """Build a FaissRetriever over the shared corpus (fresh FakeEmbedder unless one is given)."""
+    return _dense_factory(FaissRetriever)
+
+
+@pytest.fixture
+def make_numpy_dense():
+    """Build a NumpyDenseRetriever over the shared corpus (fresh FakeEmbedder unless one is given)."""
+    return _dense_factory(NumpyDenseRetriever)
@@ -0,0 +1,69 @@
+import multiprocessing
+import os
+
+import pytest
+
+from st_app.rag.atomic_io import dir_lock, write_files, write_json
+from st_app.rag.retriever import FaissRetriever, TfIdfRetriever
+from test.conftest import METAS, TEXTS, FakeEmbedder
+
+
+def _open_faiss(index_dir):
+    embedder = FakeEmbedder()
+    retriever = FaissRetriever(TEXTS, METAS, index_dir=index_dir, embedder=embedder)
+    return sum(len(c) for c in embedder.calls), [d.page_content for d in retriever.get_relevant_documents("광주", k=2)]
+
+
+def _open_tfidf(index_dir):
+    return [d.page_content for d in TfIdfRetriever(TEXTS, METAS, index_dir=index_dir).get_relevant_documents("광주", k=2)]
+
+
+def test_published_files_follow_umask(tmp_path):
+    """Test that published files get the usual 0666 & ~umask mode instead of mkstemp's owner-only 0600."""
+    from st_app.rag.atomic_io import _UMASK
+    from st_app.rag.embedding_cache import EmbeddingCache
+
+    target = tmp_path / "meta.json"
+    write_files([(str(target), write_json({"v": 1}))])
+    assert os.stat(target).st_mode & 0o777 == 0o666 & ~_UMASK
+
+    cache = EmbeddingCache(str(tmp_path / "cache"), "m")
+    cache.put_many(["a"], [[1.0, 2.0]])
+    cache.flush()
+    for name in os.listdir(cache.path):
+        assert os.stat(os.path.join(cache.path, name)).st_mode & 0o777 == 0o666 & ~_UMASK
+
+
+def test_write_files_leaves_no_temp_files_on_failure(tmp_path):
+    """Test that a failing writer removes its temp files and replaces nothing."""
+    target = tmp_path / "meta.json"
+    write_files([(str(target), write_json({"v": 1}))])
+
+    def fail(path):
+        raise OSError("disk full")
+
+    with pytest.raises(OSError):
+        write_files([(str(target), write_json({"v": 2})), (str(tmp_path / "index.faiss"), fail)])
+    assert target.read_text() == '{"v": 1}'
+    assert sorted(os.listdir(tmp_path)) == ["meta.json"]
+
+
+def test_dir_lock_is_reentrant_within_a_thread(tmp_path):
+    """Test that nested locks on the same directory do not deadlock."""
+    with dir_lock(str(tmp_path)):
+        with dir_lock(str(tmp_path)):
+            pass
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_concurrent_workers_build_index_once(tmp_path):
+    """Test that workers opening the same empty directory build it once and the rest load it."""
+    ctx = multiprocessing.get_context("fork")
+    with ctx.Pool(4) as pool:
+        faiss_results = pool.map(_open_faiss, [str(tmp_path / "faiss")] * 4)
+        tfidf_results = pool.map(_open_tfidf, [str(tmp_path / "tfidf")] * 4)
+
+    assert sum(embedded for embedded, _ in faiss_results) == len(TEXTS)
+    assert len({tuple(docs) for _, docs in faiss_results}) == 1
+    assert len({tuple(docs) for docs in tfidf_results}) == 1
+    assert not [n for n in os.listdir(tmp_path / "faiss") if n.endswith(".tmp")]
@@ -0,0 +1,41 @@
+import numpy as np
+
+from st_app.rag.bm25 import BM25Retriever, char_ngrams
+from test.conftest import TEXTS
+
+
+def test_char_ngrams_handles_korean_particles():
+    """Test that inflected Korean words share bigrams with their stem."""
+    assert char_ngrams("소설이 좋아요!") == ["소설", "설이", "좋아", "아요"]
+    assert set(char_ngrams("소설을")) & set(char_ngrams("소설이")) == {"소설"}
+    assert char_ngrams("책 A") == ["책", "a"]
+
+
+def test_bm25_ranks_matching_documents(bm25_retriever):
+    """Test that BM25 returns the documents sharing query terms, best first."""
+    docs = bm25_retriever.get_relevant_documents("광주의 민주화 운동", k=2)
+
+    assert {d.page_content for d in docs} == {TEXTS[0], TEXTS[4]}
+    assert docs[0].score >= docs[1].score
+    assert bm25_retriever.get_relevant_documents("없는단어", k=2) == []
+
+
+def test_bm25_top_k_pruning_matches_exhaustive_scoring():
+    """Test that MaxScore early termination returns the exhaustive top-k."""
+    rng = np.random.default_rng(0)
+    syllables = list("가나다라마바사아자차카타파하소설책리뷰좋아요")
+    texts = ["".join(rng.choice(syllables, size=rng.integers(12, 40))) for _ in range(500)]
+    retriever = BM25Retriever(texts, [{"site": "yes24"} for _ in texts])
+
+    for query in texts[:20]:
+        exhaustive = retriever.get_relevant_documents(query[:8])
+        pruned = retriever.get_relevant_documents(query[:8], k=5)
+        assert [round(d.score, 5) for d in pruned] == [round(d.score, 5) for d in exhaustive[:5]]
+
+
+def test_bm25_batch(bm25_retriever):
+    """Test that the batch API mirrors single queries."""
+    batch = bm25_retriever.get_relevant_documents_batch(["배송", ""], k=1)
+
+    assert batch[0][0].page_content == TEXTS[2]
+    assert batch[1] == []
@@ -0,0 +1,85 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from st_app.rag.build_index import build
+from st_app.rag.faiss_index import IndexConfig
+from st_app.rag.retriever import FaissRetriever
+from st_app.rag.store import as_document_store
+from test.conftest import METAS, TEXTS, FakeEmbedder
+
+
+class FlakyEmbedder(FakeEmbedder):
+    """Fails on the n-th encode call to simulate an interrupted build."""
+
+    def __init__(self, fail_on):
+        super().__init__()
+        self.fail_on = fail_on
+
+    def encode(self, texts, use_cache=True):
+        if len(self.calls) == self.fail_on:
+            self.calls.append(None)
+            raise RuntimeError("embedding API down")
+        return super().encode(texts, use_cache)
+
+
+def test_interrupted_build_resumes_from_checkpoint(tmp_path):
+    """Test that a rerun only embeds the chunks after the last checkpoint and then publishes."""
+    store = as_document_store(TEXTS, METAS)
+    index_dir = str(tmp_path / "faiss_index")
+
+    flaky = FlakyEmbedder(fail_on=2)
+    with pytest.raises(RuntimeError, match="embedding API down"):
+        build(store, flaky, index_dir, IndexConfig(), chunk_size=2)
+    with open(os.path.join(index_dir, ".build", "checkpoint.json")) as f:
+        assert json.load(f)["done"] == 4
+    assert not os.path.exists(os.path.join(index_dir, "index.faiss"))
+
+    embedder = FakeEmbedder()
+    stats = build(store, embedder, index_dir, IndexConfig(), chunk_size=2)
+
+    assert embedder.calls == [TEXTS[4:]]
+    assert stats["resumed_from"] == 4 and stats["num_texts"] == len(TEXTS)
+    assert sorted(os.listdir(index_dir)) == [".lock", "index.faiss", "meta.json"]
+
+
+def test_published_index_is_loaded_without_embedding(tmp_path, monkeypatch):
+    """Test that serving loads the offline-built index as-is and prebuilt-only mode never embeds."""
+    store = as_document_store(TEXTS, METAS)
+    index_dir = str(tmp_path / "faiss_index")
+    build(store, FakeEmbedder(), index_dir, IndexConfig(), chunk_size=3)
+
+    monkeypatch.setenv("FAISS_PREBUILT_ONLY", "1")
+    embedder = FakeEmbedder()
+    retriever = FaissRetriever(store, index_dir=index_dir, embedder=embedder, index_config=IndexConfig())
+    assert embedder.calls == []
+    expected = FaissRetriever(store, embedder=FakeEmbedder()).get_relevant_documents("광주 민주화 운동", k=2)
+    docs = retriever.get_relevant_documents("광주 민주화 운동", k=2)
+    assert [d.review_id for d in docs] == [d.review_id for d in expected]
+    np.testing.assert_allclose([d.score for d in docs], [d.score for d in expected], rtol=1e-5)
+
+    changed = as_document_store(TEXTS + ["새로 들어온 리뷰"], METAS + METAS[:1])
+    with pytest.raises(RuntimeError, match="build_index"):
+        FaissRetriever(changed, index_dir=index_dir, embedder=FakeEmbedder(), index_config=IndexConfig())
+
+
+def test_prebuilt_only_adopts_index_config_from_meta(tmp_path, monkeypatch):
+    """Test that prebuilt-only serving uses the index config recorded at build time, not the env defaults."""
+    store = as_document_store(TEXTS, METAS)
+    index_dir = str(tmp_path / "faiss_index")
+    built = IndexConfig(index_type="hnsw", hnsw_m=8, storage="sq8")
+    build(store, FakeEmbedder(), index_dir, built, chunk_size=3)
+
+    for name in ("FAISS_INDEX_TYPE", "FAISS_STORAGE", "FAISS_HNSW_M"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("FAISS_PREBUILT_ONLY", "1")
+    monkeypatch.setenv("FAISS_EF_SEARCH", "32")
+    embedder = FakeEmbedder()
+    retriever = FaissRetriever(store, index_dir=index_dir, embedder=embedder)
+    assert embedder.calls == []
+    assert (retriever._index_config.index_type, retriever._index_config.storage) == ("hnsw", "sq8")
+    assert retriever._index_config.hnsw_m == 8
+    assert retriever._index_config.ef_search == 32
+    assert len(retriever.get_relevant_documents("광주 민주화 운동", k=2)) == 2
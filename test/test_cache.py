@@ -0,0 +1,102 @@
+from st_app.rag.cache import CachedRetriever, LRUCache, cached_retriever, normalize_query
+from st_app.rag.retriever import TfIdfRetriever
+from test.conftest import METAS, TEXTS, FakeEmbedder
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_cache_evicts_least_recently_used():
+    """Test that the cache keeps at most maxsize entries and evicts the coldest one."""
+    cache = LRUCache(maxsize=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.stats()["hits"] == 3 and cache.stats()["misses"] == 1
+
+
+def test_lru_cache_expires_after_ttl():
+    """Test that entries older than the TTL are treated as misses."""
+    clock = FakeClock()
+    cache = LRUCache(maxsize=10, ttl=60, clock=clock)
+    cache.put("q", "v")
+    clock.now = 59
+    assert cache.get("q") == "v"
+    clock.now = 61
+    assert cache.get("q") is None
+    assert len(cache) == 0
+
+
+def test_normalize_query():
+    """Test that whitespace and case variants map to the same key."""
+    assert normalize_query("  리뷰   요약해줘\n") == normalize_query("리뷰 요약해줘")
+    assert normalize_query("Best BOOK") == "best book"
+
+
+def test_repeated_query_skips_the_embedder(make_faiss):
+    """Test that FaissRetriever embeds a repeated question only once."""
+    embedder = FakeEmbedder()
+    retriever = make_faiss(embedder=embedder, query_cache=LRUCache(maxsize=8))
+    embedder.calls.clear()
+
+    first = retriever.get_relevant_documents("배송이 빠르고", k=2)
+    second = retriever.get_relevant_documents(" 배송이  빠르고 ", k=2)
+    retriever.get_relevant_documents_batch(["배송이 빠르고", "광주 민주화 운동"], k=1)
+
+    assert embedder.calls == [["배송이 빠르고"], ["광주 민주화 운동"]]
+    assert [d.page_content for d in first] == [d.page_content for d in second]
+    assert retriever.query_cache.stats()["hits"] == 2
+
+
+class CountingRetriever:
+    def __init__(self, inner):
+        self.inner = inner
+        self.calls = 0
+
+    @property
+    def index_version(self):
+        return self.inner.index_version
+
+    def get_relevant_documents(self, query, k=None, filters=None):
+        self.calls += 1
+        return self.inner.get_relevant_documents(query, k=k, filters=filters)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+def test_result_cache_keys_on_query_k_filters_and_version(tfidf_retriever):
+    """Test that repeated retrievals are served from memory until the index version changes."""
+    inner = CountingRetriever(tfidf_retriever)
+    retriever = CachedRetriever(inner, LRUCache(maxsize=16))
+
+    first = retriever.get_relevant_documents("광주 민주화 운동", k=2)
+    assert retriever.get_relevant_documents("광주  민주화 운동", k=2) == first
+    assert inner.calls == 1
+
+    retriever.get_relevant_documents("광주 민주화 운동", k=3)
+    retriever.get_relevant_documents("광주 민주화 운동", k=2, filters={"sites": ["yes24"]})
+    retriever.get_relevant_documents("광주 민주화 운동", k=2, filters={"sites": ("yes24",)})
+    assert inner.calls == 3
+
+    [new_id] = retriever.add_documents(["광주 민주화 운동을 다룬 새 리뷰"])
+    refreshed = retriever.get_relevant_documents("광주 민주화 운동", k=2)
+    assert inner.calls == 4
+    assert new_id in [d.review_id for d in refreshed]
+    assert len(retriever.cache) == 1
+
+
+def test_cached_retriever_is_shared_per_retriever(tfidf_retriever):
+    """Test that the node-level helper reuses one cache per retriever object."""
+    retriever = tfidf_retriever
+    assert cached_retriever(retriever) is cached_retriever(retriever)
+    assert cached_retriever(TfIdfRetriever(TEXTS, METAS)) is not cached_retriever(retriever)
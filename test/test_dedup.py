@@ -0,0 +1,69 @@
+import numpy as np
+
+from st_app.graph.nodes.rag_review_node import _format_docs
+from st_app.rag.dedup import collapse_duplicates, duplicate_groups
+from st_app.rag.store import DocumentStore, RetrievedDocument
+
+
+BASE = "배송이 빠르고 포장이 꼼꼼해서 아주 만족스러운 구매였습니다 다음에도 이 서점에서 주문할게요"
+
+
+def test_duplicate_groups_finds_exact_and_near_duplicates():
+    """Test that normalized copies and lightly edited copies share the earliest row as representative."""
+    texts = [
+        BASE,
+        "광주 민주화 운동을 다룬 소설로 읽는 내내 마음이 아팠습니다",
+        "  " + BASE.upper() + "!!",
+        BASE + "요",
+        "표지가 예쁘고 글씨가 커서 부모님께 선물하기 좋아요",
+    ]
+    rep = duplicate_groups(texts, threshold=0.8)
+    np.testing.assert_array_equal(rep, [0, 1, 0, 0, 4])
+    np.testing.assert_array_equal(duplicate_groups(texts, threshold=1.0), [0, 1, 0, 3, 4])
+
+
+def test_collapse_duplicates_keeps_one_representative_with_count():
+    """Test that collapsing keeps review ids, skips removed rows and surfaces dup_count."""
+    store = DocumentStore.from_columns(
+        texts=[BASE, "광주 민주화 운동을 다룬 소설로 읽는 내내 마음이 아팠습니다", BASE + "요", BASE + "!!"],
+        sites=["yes24", "kyobo", "yes24", "yes24"],
+        scores=[10, 9, 8, 7],
+        dates=["2024-01-01", "", "", ""],
+    )
+    store, _ = store.remove([int(store.review_ids[3])])
+
+    collapsed = collapse_duplicates(store)
+
+    assert collapsed.texts == [store.text(0), store.text(1)]
+    np.testing.assert_array_equal(collapsed.review_ids, store.review_ids[:2])
+    assert collapsed.metadata(0)["dup_count"] == 2
+    assert collapsed.metadata(1)["dup_count"] == 1
+    assert "dup_count" not in store.metadata(0)
+
+    again = collapse_duplicates(collapsed)
+    np.testing.assert_array_equal(again.dup_counts, [2, 1])
+
+    context = _format_docs([RetrievedDocument.from_store(collapsed, 0, 1.0)])
+    assert "SOURCE: yes24 (유사 리뷰 2건)" in context
+
+
+def test_duplicates_are_only_collapsed_within_a_site():
+    """Test that the same review on two sites stays searchable under each site's filter."""
+    store = DocumentStore.from_columns(
+        texts=[BASE, BASE + "요", BASE, "광주 민주화 운동을 다룬 소설로 읽는 내내 마음이 아팠습니다"],
+        sites=["yes24", "yes24", "aladin", "kyobo"],
+        scores=[10, 9, 8, 7],
+        dates=["", "", "", ""],
+    )
+
+    collapsed = collapse_duplicates(store)
+
+    assert [collapsed.site(i) for i in range(len(collapsed))] == ["yes24", "aladin", "kyobo"]
+    np.testing.assert_array_equal(collapsed.dup_counts, [2, 1, 1])
+    np.testing.assert_array_equal(duplicate_groups([BASE, BASE], groups=[0, 1]), [0, 1])
+
+
+def test_empty_normalized_texts_are_not_grouped():
+    """Test that reviews with no words left after normalization are never merged together."""
+    texts = ["!!!", "ㅎ", "^^;;", "...", BASE, BASE + "!"]
+    np.testing.assert_array_equal(duplicate_groups(texts), [0, 1, 2, 3, 4, 4])
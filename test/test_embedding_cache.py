@@ -0,0 +1,138 @@
+import os
+
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+
+from st_app.rag.embedder import UpstageEmbedder
+from st_app.rag.embedding_cache import EmbeddingCache, cached_encode, text_key
+
+
+def _fake_vectors(texts):
+    return np.array([[len(t), 1.0, 2.0] for t in texts], dtype="float32")
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    return str(tmp_path / "embedding_cache")
+
+
+def test_cached_encode_only_encodes_missing(cache_dir):
+    """Test that only texts missing from the cache are encoded."""
+    encode_fn = MagicMock(side_effect=_fake_vectors)
+    cache = EmbeddingCache(cache_dir, "model-a")
+
+    first = cached_encode(cache, ["a", "bb"], encode_fn)
+    second = cached_encode(cache, ["bb", "ccc", "a"], encode_fn)
+
+    assert encode_fn.call_count == 2
+    assert encode_fn.call_args_list[1].args[0] == ["ccc"]
+    np.testing.assert_array_equal(second[0], first[1])
+    np.testing.assert_array_equal(second[2], first[0])
+
+
+def test_cache_survives_restart(cache_dir):
+    """Test that a warm restart needs zero encode calls."""
+    cached_encode(EmbeddingCache(cache_dir, "model-a"), ["a", "bb"], _fake_vectors)
+
+    encode_fn = MagicMock(side_effect=_fake_vectors)
+    out = cached_encode(EmbeddingCache(cache_dir, "model-a"), ["bb", "a"], encode_fn)
+
+    encode_fn.assert_not_called()
+    assert out.shape == (2, 3)
+
+
+def test_cache_is_keyed_by_model(cache_dir):
+    """Test that a different model does not reuse cached vectors."""
+    cached_encode(EmbeddingCache(cache_dir, "model-a"), ["a"], _fake_vectors)
+
+    encode_fn = MagicMock(side_effect=_fake_vectors)
+    cached_encode(EmbeddingCache(cache_dir, "model-b"), ["a"], encode_fn)
+
+    encode_fn.assert_called_once()
+
+
+def test_failed_zero_vectors_are_not_cached(cache_dir):
+    """Test that zero fallback vectors are re-encoded next time."""
+    cache = EmbeddingCache(cache_dir, "model-a")
+    cached_encode(cache, ["a"], lambda texts: np.zeros((len(texts), 3), dtype="float32"))
+
+    encode_fn = MagicMock(side_effect=_fake_vectors)
+    cached_encode(EmbeddingCache(cache_dir, "model-a"), ["a"], encode_fn)
+
+    encode_fn.assert_called_once()
+
+
+def test_upstage_embedder_consults_cache(cache_dir):
+    """Test that UpstageEmbedder skips the API for cached texts."""
+    embedder = UpstageEmbedder(api_key="test-key", cache_dir=cache_dir)
+    embedder._encode_remote = MagicMock(side_effect=_fake_vectors)
+    embedder.encode(["리뷰 하나", "리뷰 둘"])
+
+    restarted = UpstageEmbedder(api_key="test-key", cache_dir=cache_dir)
+    restarted._encode_remote = MagicMock(side_effect=_fake_vectors)
+    restarted.encode(["리뷰 둘", "리뷰 하나"])
+    restarted.encode(["리뷰 하나"], use_cache=False)
+
+    restarted._encode_remote.assert_called_once_with(["리뷰 하나"])
+
+
+def _shard_bytes(cache):
+    return sum(os.path.getsize(os.path.join(cache.path, n)) for n in os.listdir(cache.path))
+
+
+def test_flush_appends_without_rewriting_old_vectors(cache_dir):
+    """Test that each flush writes one new shard and leaves earlier shards untouched."""
+    cache = EmbeddingCache(cache_dir, "model-a")
+    cached_encode(cache, [f"a{i}" for i in range(50)], _fake_vectors)
+    first = {n: os.path.getmtime(os.path.join(cache.path, n)) for n in os.listdir(cache.path)}
+    size_after_first = _shard_bytes(cache)
+
+    cached_encode(cache, [f"b{i}" for i in range(50)], _fake_vectors)
+    assert all(os.path.getmtime(os.path.join(cache.path, n)) == t for n, t in first.items())
+    assert len(os.listdir(cache.path)) == 4
+    assert _shard_bytes(cache) == 2 * size_after_first
+
+
+def test_vectors_are_memory_mapped_not_resident(cache_dir):
+    """Test that cached vectors are read from a read-only mapping and returned as copies."""
+    cached_encode(EmbeddingCache(cache_dir, "model-a"), ["a", "bb"], _fake_vectors)
+    cache = EmbeddingCache(cache_dir, "model-a")
+    found = cache.get_many([text_key("bb")])
+    np.testing.assert_array_equal(found[0], _fake_vectors(["bb"])[0])
+    assert all(isinstance(v, np.memmap) for v in cache._shards.values())
+    assert found[0].base is None
+
+
+def test_other_process_shards_are_picked_up(cache_dir):
+    """Test that a cache sees vectors another instance flushed after it loaded."""
+    reader = EmbeddingCache(cache_dir, "model-a")
+    assert len(reader) == 0
+    cached_encode(EmbeddingCache(cache_dir, "model-a"), ["a"], _fake_vectors)
+
+    encode_fn = MagicMock(side_effect=_fake_vectors)
+    cached_encode(reader, ["a"], encode_fn)
+    encode_fn.assert_not_called()
+
+
+def test_compaction_merges_shards(cache_dir, monkeypatch):
+    """Test that exceeding MAX_SHARDS merges everything into one shard with all vectors kept."""
+    monkeypatch.setattr(EmbeddingCache, "MAX_SHARDS", 3)
+    cache = EmbeddingCache(cache_dir, "model-a")
+    texts = [f"t{i}" * (i + 1) for i in range(5)]
+    for text in texts:
+        cached_encode(cache, [text], _fake_vectors)
+    assert len(cache._shard_ids()) <= 3
+
+    restarted = EmbeddingCache(cache_dir, "model-a")
+    np.testing.assert_array_equal(cached_encode(restarted, texts, MagicMock()), _fake_vectors(texts))
+
+
+def test_legacy_npz_cache_is_migrated(cache_dir):
+    """Test that a single-file cache from the previous format is converted into a shard."""
+    os.makedirs(cache_dir)
+    np.savez(os.path.join(cache_dir, "model-a.npz"), keys=np.asarray([text_key("a")]), vecs=_fake_vectors(["a"]))
+    encode_fn = MagicMock(side_effect=_fake_vectors)
+    cached_encode(EmbeddingCache(cache_dir, "model-a"), ["a"], encode_fn)
+    encode_fn.assert_not_called()
+    assert not os.path.exists(os.path.join(cache_dir, "model-a.npz"))
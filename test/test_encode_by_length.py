@@ -0,0 +1,27 @@
+import numpy as np
+
+from st_app.rag.embedder import encode_by_length
+
+
+def test_encode_by_length_batches_similar_lengths_and_restores_order():
+    """Test that batches are built from length-sorted texts and results come back in input order."""
+    texts = ["a" * n for n in [3, 40, 1, 25, 2, 39, 24, 4]]
+    batches = []
+
+    def encode(batch):
+        batches.append([len(t) for t in batch])
+        return np.array([[len(t), 1.0] for t in batch], dtype="float32")
+
+    out = encode_by_length(texts, encode, batch_size=3)
+
+    np.testing.assert_array_equal(out[:, 0], [len(t) for t in texts])
+    assert batches == [[40, 39, 25], [24, 4, 3], [2, 1]]
+    # 패딩 = 배치 최대 길이까지 채우는 토큰 수: 입력 순서 배치보다 적어야 함
+    padding = lambda bs: sum(max(b) * len(b) - sum(b) for b in bs)  # noqa: E731
+    naive = [[len(t) for t in texts[i : i + 3]] for i in range(0, len(texts), 3)]
+    assert padding(batches) < padding(naive)
+
+
+def test_encode_by_length_handles_empty_input():
+    """Test that an empty input never calls the encoder."""
+    assert encode_by_length([], lambda batch: 1 / 0, batch_size=4).shape == (0, 0)
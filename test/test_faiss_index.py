@@ -0,0 +1,121 @@
+import json
+
+import pytest
+
+from st_app.rag.faiss_index import IndexConfig
+from st_app.rag.index_bench import make_queries, run_benchmark, synthetic_vectors
+from test.conftest import FILTER_METAS, TEXTS, FakeEmbedder
+
+
+@pytest.mark.parametrize("index_type", ["ivf", "hnsw"])
+def test_faiss_retriever_persists_index_type(tmp_path, index_type, make_faiss):
+    """Test that approximate index types are built, searched and recorded in meta.json."""
+    config = IndexConfig(index_type=index_type, nprobe=4, ef_search=32)
+    retriever = make_faiss(index_dir=str(tmp_path), index_config=config)
+
+    meta = json.loads((tmp_path / "meta.json").read_text(encoding="utf-8"))
+    assert meta["index"]["index_type"] == index_type
+    assert meta["index"]["factory"] == config.factory_string(len(TEXTS))
+    assert retriever.get_relevant_documents("배송이 빠르고", k=1)[0].page_content == TEXTS[2]
+
+
+def test_changing_index_type_reuses_vectors(tmp_path, make_faiss):
+    """Test that switching flat -> hnsw rebuilds the structure without re-embedding."""
+    make_faiss(index_dir=str(tmp_path))
+
+    embedder = FakeEmbedder()
+    make_faiss(index_dir=str(tmp_path), embedder=embedder, index_config=IndexConfig(index_type="hnsw"))
+
+    assert embedder.calls == []
+    meta = json.loads((tmp_path / "meta.json").read_text(encoding="utf-8"))
+    assert meta["index"]["factory"].startswith("HNSW")
+
+
+def test_unknown_index_type_is_rejected():
+    """Test that a typo in the index type fails loudly."""
+    with pytest.raises(ValueError):
+        IndexConfig(index_type="annoy")
+
+
+def test_index_benchmark_reports_recall_against_flat():
+    """Test that the benchmark measures every configuration against the flat baseline."""
+    vecs = synthetic_vectors(2000, 16)
+    rows = run_benchmark(vecs, make_queries(vecs, 20), k=5, nprobes=(1, 50), ef_searches=(8,))
+
+    assert [r["index"].split()[0] for r in rows] == ["flat", "IVF51,Flat", "IVF51,Flat", "HNSW32,Flat"]
+    assert rows[0]["recall"] == 1.0
+    assert rows[2]["recall"] == pytest.approx(1.0)
+    assert all(r["p99_ms"] >= r["p50_ms"] for r in rows)
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_saved_index_is_memory_mapped_without_private_vector_copy(tmp_path, index_type, make_faiss):
+    """Test that the persisted index is served from a read-only mapping and no vector copy is kept."""
+    config = IndexConfig(index_type=index_type)
+    built = make_faiss(index_dir=str(tmp_path), index_config=config)
+    restarted = make_faiss(index_dir=str(tmp_path), index_config=config)
+    private = make_faiss(index_dir=str(tmp_path), index_config=config, mmap=False)
+
+    assert built._mapped and restarted._mapped and not private._mapped
+    assert not hasattr(restarted, "_vecs_norm")
+    assert restarted.get_relevant_documents("배송이 빠르고", k=1)[0].page_content == TEXTS[2]
+
+    # 매핑된 인덱스는 수정 시 사본으로 다시 읽은 뒤 저장하고 다시 매핑
+    restarted.add_documents(["새로 크롤링된 리뷰 본문"])
+    assert restarted._mapped
+    assert restarted.get_relevant_documents("새로 크롤링된 리뷰", k=1)[0].page_content == "새로 크롤링된 리뷰 본문"
+
+
+@pytest.mark.parametrize(
+    "config",
+    [
+        IndexConfig(storage="fp16"),
+        IndexConfig(storage="sq8", rerank=0),
+        IndexConfig(storage="pq"),
+        IndexConfig(index_type="ivf", storage="pq", rerank=0),
+        IndexConfig(index_type="hnsw", storage="sq8"),
+    ],
+)
+def test_compressed_storage_searches_filters_and_mutates(tmp_path, config, make_faiss):
+    """Test that compressed codes (with or without exact re-rank) keep search, filters and deltas working."""
+    retriever = make_faiss(metadatas=FILTER_METAS, index_dir=str(tmp_path), index_config=config)
+
+    meta = json.loads((tmp_path / "meta.json").read_text(encoding="utf-8"))
+    assert meta["index"]["storage"] == config.storage
+    assert meta["index"]["factory"].endswith(",RFlat") == config.refined
+    # 재정렬 없는 PQ는 근사값이므로 상위 몇 개 안에만 들면 됨
+    k = 3 if config.storage == "pq" and not config.refined else 1
+    assert TEXTS[2] in [d.page_content for d in retriever.get_relevant_documents("배송이 빠르고", k=k)]
+    docs = retriever.get_relevant_documents("소설", k=5, filters={"sites": ["aladin"]})
+    assert docs and {d.metadata["site"] for d in docs} == {"aladin"}
+
+    [new_id] = retriever.add_documents(["새로 크롤링된 리뷰 본문"])
+    assert retriever.remove_documents([new_id]) == 1
+    assert len(retriever) == len(TEXTS)
+
+
+def test_storage_config_validation():
+    """Test that PQ sub-quantizers divide the dimension and unsupported combinations fail loudly."""
+    assert IndexConfig(storage="pq").factory_string(20000, 384) == "IVF1,PQ96x8,RFlat"
+    assert IndexConfig(index_type="ivf", storage="pq", pq_m=10, rerank=0).factory_string(100, 64) == "IVF2,PQ8x1"
+    assert IndexConfig(index_type="hnsw", storage="fp16").factory_string(100) == "HNSW32,SQfp16,RFlat"
+    with pytest.raises(ValueError):
+        IndexConfig(index_type="hnsw", storage="pq")
+    with pytest.raises(ValueError):
+        IndexConfig(storage="int4")
+
+
+def test_mmap_fallback_on_old_faiss_warns(tmp_path, monkeypatch, capsys):
+    """Test that loading with mmap on a faiss without IO_FLAG_MMAP_IFC still works but warns once."""
+    import faiss
+
+    from st_app.rag import faiss_index
+
+    path = str(tmp_path / "index.faiss")
+    faiss.write_index(faiss.IndexFlatIP(4), path)
+    monkeypatch.delattr(faiss, "IO_FLAG_MMAP_IFC", raising=False)
+    monkeypatch.setattr(faiss_index, "_WARNED", set())
+
+    assert faiss_index.read_index(path, mmap=True).d == 4
+    faiss_index.read_index(path, mmap=True)
+    assert capsys.readouterr().out.count("IO_FLAG_MMAP_IFC") == 1
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from st_app.rag.model_registry import check_dimension, known_dimension
+from st_app.rag.retriever import FaissRetriever, resolve_dimension
+
+
+TEXTS = ["배송이 빠르고 포장이 깔끔했어요", "문장이 아름답고 슬픈 소설", "광주 민주화 운동을 다룬 소설"]
+
+
+class UnknownModelEmbedder:
+    """Embedder whose dimension is only known by encoding (counts probe calls)."""
+
+    model = "unknown-model"
+
+    def __init__(self):
+        self.probes = 0
+        self.known_dimension = None
+
+    def assume_dimension(self, dim):
+        self.known_dimension = dim
+
+    @property
+    def dimension(self):
+        self.probes += 1
+        return 8
+
+    def encode(self, texts, use_cache=True):
+        out = np.zeros((len(texts), 8), dtype="float32")
+        for row, text in enumerate(texts):
+            out[row, len(text) % 8] = 1.0
+            out[row, (row + 3) % 8] += 0.5
+        return out
+
+
+def test_known_dimension_ignores_backend_suffix_and_prefix():
+    """Test that registry lookups accept backend-suffixed and unprefixed model names."""
+    assert known_dimension("solar-1-mini-embedding") == 4096
+    assert known_dimension("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2#onnx-int8") == 384
+    assert known_dimension("paraphrase-multilingual-MiniLM-L12-v2") == 384
+    assert known_dimension("unknown-model") is None
+    assert known_dimension(None) is None
+
+
+def test_check_dimension_rejects_mismatch():
+    """Test that only a real batch with a different width fails the check."""
+    check_dimension("m", 4, np.zeros((2, 4)))
+    check_dimension("m", None, np.zeros((2, 3)))
+    check_dimension("m", 4, np.zeros((0, 0)))
+    with pytest.raises(RuntimeError):
+        check_dimension("m", 4, np.zeros((2, 3)))
+
+
+def test_resolve_dimension_reads_index_meta_before_probing():
+    """Test that a matching index meta supplies the dimension and a foreign one does not."""
+    embedder = UnknownModelEmbedder()
+    assert resolve_dimension(embedder, {"model": "other-model", "dim": 16}) == 8
+    assert embedder.probes == 1
+
+    embedder = UnknownModelEmbedder()
+    assert resolve_dimension(embedder, {"model": "unknown-model", "dim": 8}) == 8
+    assert embedder.probes == 0
+    assert embedder.known_dimension == 8
+
+
+def test_faiss_restart_skips_dimension_probe(tmp_path):
+    """Test that reopening a saved index takes the dimension from meta.json instead of the embedder."""
+    first = UnknownModelEmbedder()
+    FaissRetriever(TEXTS, index_dir=str(tmp_path), embedder=first)
+    assert first.probes == 1
+
+    restarted = UnknownModelEmbedder()
+    retriever = FaissRetriever(TEXTS, index_dir=str(tmp_path), embedder=restarted)
+    assert restarted.probes == 0
+    assert retriever.get_relevant_documents(TEXTS[0], k=1)
@@ -0,0 +1,89 @@
+import sys
+
+import numpy as np
+
+import st_app.rag.retriever as retriever_module
+from st_app.rag.retriever import NumpyDenseRetriever
+from test.conftest import FILTER_METAS, METAS, TEXTS, FakeEmbedder
+
+
+QUERIES = ["광주 민주화", "아름다운 소설", "배송 포장", "한강 작가"]
+
+
+def _ranking(docs):
+    return [(d.page_content, round(d.score, 5)) for d in docs]
+
+
+def test_matches_faiss_flat_results(make_numpy_dense, make_faiss):
+    """Test that brute-force NumPy search returns the same documents and scores as a flat FAISS index."""
+    dense = make_numpy_dense()
+    faiss_retriever = make_faiss()
+    for query in QUERIES:
+        assert {d.page_content for d in dense.get_relevant_documents(query, k=3)} == {
+            d.page_content for d in faiss_retriever.get_relevant_documents(query, k=3)
+        }
+        np.testing.assert_allclose(
+            [d.score for d in dense.get_relevant_documents(query, k=3)],
+            [d.score for d in faiss_retriever.get_relevant_documents(query, k=3)],
+            rtol=1e-5,
+        )
+
+
+def test_chunked_scan_and_batch_match_single_queries(make_numpy_dense):
+    """Test that chunked scans and the batched GEMM path rank exactly like one-chunk single queries."""
+    full = make_numpy_dense()
+    chunked = make_numpy_dense(chunk_size=2)
+    batch = chunked.get_relevant_documents_batch(QUERIES + [""], k=4)
+    assert batch[-1] == []
+    for query, docs in zip(QUERIES, batch):
+        assert _ranking(docs) == _ranking(full.get_relevant_documents(query, k=4))
+        assert _ranking(chunked.get_relevant_documents(query, k=4)) == _ranking(docs)
+    assert len(full.get_relevant_documents(QUERIES[0], k=50)) == len(TEXTS)
+
+
+def test_float16_storage_keeps_ranking(make_numpy_dense):
+    """Test that float16 storage halves the matrix and keeps the top results."""
+    full = make_numpy_dense()
+    half = make_numpy_dense(dtype="float16")
+    assert half._matrix.nbytes * 2 == full._matrix.nbytes
+    for query in QUERIES:
+        assert half.get_relevant_documents(query, k=1)[0].page_content == full.get_relevant_documents(query, k=1)[0].page_content
+
+
+def test_filters_and_removed_documents_are_excluded(make_numpy_dense):
+    """Test that filtered-out and removed reviews never appear, even when fewer than k remain."""
+    dense = make_numpy_dense(metadatas=FILTER_METAS, chunk_size=2)
+    docs = dense.get_relevant_documents("소설", k=5, filters={"sites": ["aladin"]})
+    assert docs and all(d.metadata["site"] == "aladin" for d in docs)
+
+    removed = dense._store.review_ids[0]
+    assert dense.remove_documents([removed]) == 1
+    assert all(d.review_id != removed for d in dense.get_relevant_documents(TEXTS[0], k=5))
+    assert len(dense.get_relevant_documents(TEXTS[0], k=5)) == len(TEXTS) - 1
+
+
+def test_add_remove_and_restart_reuse_vectors(tmp_path, make_numpy_dense):
+    """Test that updates embed only new reviews and a restart loads saved vectors without embedding."""
+    embedder = FakeEmbedder()
+    dense = make_numpy_dense(index_dir=str(tmp_path), embedder=embedder)
+    embedder.calls.clear()
+    added = dense.add_documents(["새로 들어온 리뷰 입니다"], [METAS[0]])
+    assert embedder.calls == [["새로 들어온 리뷰 입니다"]]
+    assert dense.get_relevant_documents("새로 들어온 리뷰", k=1)[0].review_id == added[0]
+    dense.remove_documents([int(dense._store.review_ids[1])])
+
+    restarted_embedder = FakeEmbedder()
+    restarted = NumpyDenseRetriever(dense._store, index_dir=str(tmp_path), embedder=restarted_embedder)
+    assert restarted_embedder.calls == []
+    assert len(restarted) == len(TEXTS)
+    assert _ranking(restarted.get_relevant_documents("광주", k=3)) == _ranking(dense.get_relevant_documents("광주", k=3))
+
+
+def test_dense_getter_falls_back_to_numpy_without_faiss(monkeypatch):
+    """Test that a failing faiss import selects the NumPy retriever instead of sparse search."""
+    monkeypatch.setitem(sys.modules, "faiss", None)
+    monkeypatch.delenv("FAISS_SHARDED", raising=False)
+    sentinel = object()
+    monkeypatch.setattr(retriever_module, "get_numpy_dense_retriever", lambda use_api=True: sentinel)
+    assert retriever_module.faiss_available() is False
+    assert retriever_module.get_dense_retriever() is sentinel
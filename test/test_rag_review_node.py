@@ -0,0 +1,32 @@
+from st_app.graph.nodes import rag_review_node as node
+from st_app.rag.upstage_client import EmbeddingAPIError
+from test.conftest import TEXTS
+
+
+class FailingDenseRetriever:
+    """Dense retriever whose query embedding always fails (strict Upstage client out of retries)."""
+
+    index_version = 0
+
+    def get_relevant_documents(self, query, k=None, filters=None):
+        raise EmbeddingAPIError("embedding request failed: timeout", status=503)
+
+
+class EchoLLM:
+    def invoke(self, prompt):
+        return prompt
+
+
+def test_query_embedding_failure_falls_back_to_sparse_search(monkeypatch, bm25_retriever):
+    """Test that a failed query embedding still answers from the sparse retriever instead of returning an error."""
+    sparse = bm25_retriever
+    monkeypatch.setattr(node, "get_dense_retriever", lambda use_api=True: FailingDenseRetriever())
+    monkeypatch.setattr(node, "get_sparse_retriever", lambda: sparse)
+    monkeypatch.setattr(node, "get_llm", lambda: EchoLLM())
+
+    state = node.rag_review_node({"messages": [{"role": "user", "content": "광주 민주화 운동"}], "k": 2})
+
+    assert state["last_route"] == "rag_review"
+    assert "error" not in state
+    assert TEXTS[0] in state["messages"][-1]["content"]
+    assert len(state["citations"]) == 2
@@ -0,0 +1,49 @@
+import pandas as pd
+import pytest
+
+from st_app.rag.retrieval_bench import (
+    LabeledQuery,
+    format_rows,
+    load_benchmark_store,
+    load_queries,
+    recall_at_k,
+    reciprocal_rank,
+    run_benchmark,
+)
+from test.conftest import TEXTS
+
+
+def test_recall_and_reciprocal_rank():
+    """Test that recall@k is capped by the number of relevant docs and MRR uses the first hit."""
+    assert recall_at_k([1, 2, 3, 4], {2, 4, 9}, k=2) == 0.5
+    assert recall_at_k([1, 2, 3, 4], {2, 4, 9}, k=4) == pytest.approx(2 / 3)
+    assert recall_at_k([1, 2], {7}, k=1) == 0.0
+    assert reciprocal_rank([5, 6, 7], {7}) == pytest.approx(1 / 3)
+    assert reciprocal_rank([5, 6], set()) == 0.0
+
+
+def test_bundled_query_set_has_relevant_reviews():
+    """Test that every labeled query matches at least one bundled review."""
+    store = load_benchmark_store()
+    queries = load_queries()
+    assert len(queries) >= 10
+    assert all(q.relevant_ids(store) for q in queries)
+
+
+def test_run_benchmark_offline_with_stub_embedder(tmp_path):
+    """Test that the suite reports quality, build time, memory and latency for each retriever."""
+    pd.DataFrame({"text": TEXTS, "score": [10] * len(TEXTS)}).to_csv(
+        tmp_path / "preprocessed_reviews_yes24.csv", index=False
+    )
+    store = load_benchmark_store(str(tmp_path))
+    queries = [LabeledQuery("광주 민주화 운동", ("광주",)), LabeledQuery("배송 빠른 곳", ("배송",))]
+
+    rows = run_benchmark(store, queries, retrievers=["tfidf", "bm25", "faiss"], ks=[1, 3], embedder="stub", repeat=2)
+
+    assert [r["retriever"] for r in rows] == ["tfidf", "bm25", "faiss"]
+    for r in rows:
+        assert 0.0 <= r["recall@1"] <= 1.0 and 0.0 <= r["mrr"] <= 1.0
+        assert r["build_s"] >= 0 and r["memory_mb"] > 0
+        assert r["p50_ms"] <= r["p95_ms"] <= r["p99_ms"]
+    assert rows[1]["recall@1"] == 1.0
+    assert "recall@3" in format_rows(rows, [1, 3])
@@ -0,0 +1,311 @@
+import json
+
+import numpy as np
+import pytest
+
+from st_app.rag.retriever import FaissRetriever, TfIdfRetriever
+from st_app.rag.store import top_k_indices
+from test.conftest import FILTER_METAS, METAS, TEXTS, FakeEmbedder
+
+
+def test_top_k_indices_matches_full_sort():
+    """Test that partial top-k selection agrees with a full sort."""
+    scores = np.random.default_rng(0).random(1000).astype(np.float32)
+    expected = np.argsort(-scores, kind="stable")[:10]
+    np.testing.assert_array_equal(top_k_indices(scores, 10), expected)
+    assert len(top_k_indices(scores, 0)) == 0
+    assert len(top_k_indices(scores, None)) == 1000
+
+
+def test_tfidf_returns_only_k_results(tfidf_retriever):
+    """Test that TfIdfRetriever materializes only k documents, best first."""
+    docs = tfidf_retriever.get_relevant_documents("광주 민주화 운동", k=2)
+
+    assert len(docs) == 2
+    assert docs[0].score >= docs[1].score
+    assert {d.page_content for d in docs} == {TEXTS[0], TEXTS[4]}
+    assert docs[0].metadata["score"] == docs[0].score
+
+
+def test_tfidf_without_k_ranks_every_document(tfidf_retriever):
+    """Test that omitting k keeps the previous rank-everything behavior."""
+    docs = tfidf_retriever.get_relevant_documents("소설")
+
+    assert len(docs) == len(TEXTS)
+    assert [d.score for d in docs] == sorted((d.score for d in docs), reverse=True)
+
+
+def test_tfidf_empty_query(tfidf_retriever):
+    """Test that an empty query returns nothing."""
+    assert tfidf_retriever.get_relevant_documents("", k=3) == []
+
+
+def test_tfidf_batch_matches_single_queries(tfidf_retriever):
+    """Test that batched TF-IDF search returns the same ranking as single calls."""
+    queries = ["광주 민주화", "", "배송 포장"]
+    batch = tfidf_retriever.get_relevant_documents_batch(queries, k=2)
+
+    assert batch[1] == []
+    for query, docs in zip(queries, batch):
+        if not query:
+            continue
+        single = tfidf_retriever.get_relevant_documents(query, k=2)
+        assert [d.page_content for d in docs] == [d.page_content for d in single]
+        assert [d.score for d in docs] == pytest.approx([d.score for d in single])
+
+
+def test_faiss_batch_embeds_queries_in_one_call(faiss_retriever):
+    """Test that batched FAISS search embeds all queries with one encode call."""
+    embedder = faiss_retriever._embedder
+    embedder.calls.clear()
+
+    batch = faiss_retriever.get_relevant_documents_batch(["광주 민주화 운동", "배송이 빠르고"], k=1)
+
+    assert len(embedder.calls) == 1
+    assert batch[0][0].page_content in (TEXTS[0], TEXTS[4])
+    assert batch[1][0].page_content == TEXTS[2]
+
+
+def test_faiss_warm_restart_skips_embedding(tmp_path, make_faiss):
+    """Test that a matching corpus fingerprint loads the saved index without encoding."""
+    make_faiss(index_dir=str(tmp_path))
+
+    embedder = FakeEmbedder()
+    restarted = make_faiss(index_dir=str(tmp_path), embedder=embedder)
+
+    assert embedder.calls == []
+    assert restarted.get_relevant_documents("배송이 빠르고", k=1)[0].page_content == TEXTS[2]
+
+
+def test_faiss_changed_corpus_encodes_only_delta(tmp_path, make_faiss):
+    """Test that a recrawl re-embeds only new texts and keeps row order in sync."""
+    make_faiss(index_dir=str(tmp_path))
+
+    new_texts = TEXTS[1:] + ["새로 크롤링된 리뷰 본문"]
+    embedder = FakeEmbedder()
+    retriever = make_faiss(new_texts, index_dir=str(tmp_path), embedder=embedder)
+
+    assert embedder.calls == [["새로 크롤링된 리뷰 본문"]]
+    assert retriever.get_relevant_documents("새로 크롤링된 리뷰", k=1)[0].page_content == new_texts[-1]
+    assert retriever.get_relevant_documents("배송이 빠르고", k=1)[0].page_content == TEXTS[2]
+
+
+def test_faiss_model_change_forces_full_rebuild(tmp_path, make_faiss):
+    """Test that an index built by another embedder is not reused."""
+    make_faiss(index_dir=str(tmp_path))
+
+    embedder = FakeEmbedder()
+    embedder.model = "another-model"
+    make_faiss(index_dir=str(tmp_path), embedder=embedder)
+
+    assert embedder.calls == [TEXTS]
+
+
+@pytest.mark.parametrize(
+    "filters, expected",
+    [
+        ({"sites": ["aladin"]}, {1, 3}),
+        ({"max_score": 4}, {1, 4}),
+        ({"sites": "aladin", "min_score": 5}, {3}),
+        ({"date_from": "2025-01-01"}, {2, 3}),
+        ({"date_to": "2024-12-31", "min_score": 5}, {0}),
+    ],
+)
+def test_filters_are_applied_inside_every_retriever(filters, expected, make_faiss):
+    """Test that site/score/date filters restrict TF-IDF, BM25 and FAISS results."""
+    from st_app.rag.bm25 import BM25Retriever
+
+    retrievers = [
+        TfIdfRetriever(TEXTS, FILTER_METAS),
+        BM25Retriever(TEXTS, FILTER_METAS),
+        make_faiss(metadatas=FILTER_METAS),
+    ]
+    query = "소설 책 리뷰 광주 배송 민주화 한강"
+    for retriever in retrievers:
+        docs = retriever.get_relevant_documents(query, k=5, filters=filters)
+        assert {d.doc_id for d in docs} <= expected, type(retriever).__name__
+        assert all(d.metadata["site"] in ("yes24", "aladin", "kyobo") for d in docs)
+    faiss_docs = retrievers[2].get_relevant_documents(query, k=5, filters=filters)
+    assert {d.doc_id for d in faiss_docs} == expected
+
+
+def test_filter_without_matches_returns_nothing(faiss_retriever, tfidf_retriever):
+    """Test that an unsatisfiable filter returns an empty result instead of failing."""
+    assert faiss_retriever.get_relevant_documents("소설", k=3, filters={"sites": ["nowhere"]}) == []
+    assert tfidf_retriever.get_relevant_documents("소설", k=3, filters={"min_score": 11}) == []
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "hnsw"])
+def test_faiss_add_and_remove_documents_persist(tmp_path, index_type, make_faiss):
+    """Test that incremental add/remove embed only new texts and survive a restart."""
+    from st_app.rag.faiss_index import IndexConfig
+
+    config = IndexConfig(index_type=index_type)
+    embedder = FakeEmbedder()
+    retriever = make_faiss(index_dir=str(tmp_path), embedder=embedder, index_config=config)
+    embedder.calls.clear()
+
+    [new_id] = retriever.add_documents(["새로 크롤링된 리뷰 본문"], [{"site": "kyobo", "score": 9.0}])
+    assert embedder.calls == [["새로 크롤링된 리뷰 본문"]]
+    top = retriever.get_relevant_documents("새로 크롤링된 리뷰", k=1)[0]
+    assert top.review_id == new_id
+
+    removed_id = retriever.get_relevant_documents("배송이 빠르고", k=1)[0].review_id
+    assert retriever.remove_documents([removed_id]) == 1
+    assert retriever.remove_documents([removed_id]) == 0
+    assert len(retriever) == len(TEXTS)
+    assert TEXTS[2] not in [d.page_content for d in retriever.get_relevant_documents("배송이 빠르고", k=10)]
+
+    # 재시작 시 같은 코퍼스(CSV + 증분)를 주면 임베딩 없이 로드
+    store, _ = retriever._store.remove([removed_id])
+    restarted_embedder = FakeEmbedder()
+    restarted = FaissRetriever(store, index_dir=str(tmp_path), embedder=restarted_embedder, index_config=config)
+    assert restarted_embedder.calls == []
+    assert restarted.get_relevant_documents("새로 크롤링된 리뷰", k=1)[0].review_id == new_id
+
+
+def test_tfidf_add_and_remove_documents(tfidf_retriever):
+    """Test that the sparse retriever takes new rows with the existing vocabulary and hides removed ones."""
+    [new_id] = tfidf_retriever.add_documents(["광주 민주화 운동 소설 추천합니다"])
+    assert tfidf_retriever.add_documents(["광주 민주화 운동 소설 추천합니다"]) == []
+
+    docs = tfidf_retriever.get_relevant_documents("광주 민주화 운동", k=3)
+    assert new_id in [d.review_id for d in docs]
+
+    old_id = next(d.review_id for d in docs if d.review_id != new_id)
+    assert tfidf_retriever.remove_documents([new_id, old_id]) == 2
+    remaining = tfidf_retriever.get_relevant_documents("광주 민주화 운동")
+    assert len(remaining) == len(TEXTS) - 1
+    assert {new_id, old_id}.isdisjoint(d.review_id for d in remaining)
+
+
+def test_tfidf_index_is_persisted_and_reloaded_without_fitting(tmp_path, monkeypatch):
+    """Test that a matching corpus loads the saved vocabulary/idf/matrix instead of refitting."""
+    from st_app.rag.embedder import TfidfEmbedder
+
+    built = TfIdfRetriever(TEXTS, METAS, index_dir=str(tmp_path))
+    [new_id] = built.add_documents(["광주 민주화 운동 소설 추천합니다"])
+    expected = [(d.review_id, d.score) for d in built.get_relevant_documents("광주 민주화 운동", k=3)]
+
+    def _no_fit(self, texts):
+        raise AssertionError("TF-IDF가 다시 학습됨")
+
+    monkeypatch.setattr(TfidfEmbedder, "fit_transform", _no_fit)
+    # 재시작: CSV + 증분 기록으로 만든 같은 코퍼스
+    restarted = TfIdfRetriever(built._store, index_dir=str(tmp_path))
+    got = [(d.review_id, d.score) for d in restarted.get_relevant_documents("광주 민주화 운동", k=3)]
+    assert [i for i, _ in got] == [i for i, _ in expected]
+    assert np.allclose([s for _, s in got], [s for _, s in expected])
+    assert new_id in [i for i, _ in got]
+
+
+def test_tfidf_index_refits_when_corpus_changes(tmp_path):
+    """Test that a saved index built from other CSV contents is treated as stale."""
+    TfIdfRetriever(TEXTS, METAS, index_dir=str(tmp_path))
+    manifest = json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8"))
+
+    changed = TfIdfRetriever(TEXTS[::-1], METAS, index_dir=str(tmp_path))
+
+    new_manifest = json.loads((tmp_path / "manifest.json").read_text(encoding="utf-8"))
+    assert new_manifest["corpus_fingerprint"] != manifest["corpus_fingerprint"]
+    assert changed.get_relevant_documents("배송이 빠르고", k=1)[0].page_content == TEXTS[2]
+
+
+class SlowAddEmbedder(FakeEmbedder):
+    """FakeEmbedder whose document batches block until released (queries stay fast)."""
+
+    def __init__(self):
+        super().__init__()
+        import threading
+
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def encode(self, texts, use_cache=True):
+        if use_cache and self.calls:
+            self.started.set()
+            self.release.wait(5)
+        return super().encode(texts, use_cache)
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_search_is_not_blocked_by_slow_add(tmp_path, mmap):
+    """Test that searches keep using the previous index while add_documents embeds and publishes."""
+    import threading
+    import time
+
+    from st_app.rag.retriever import NumpyDenseRetriever
+
+    for cls, kwargs in ((FaissRetriever, {"mmap": mmap}), (NumpyDenseRetriever, {})):
+        embedder = SlowAddEmbedder()
+        retriever = cls(TEXTS, METAS, index_dir=str(tmp_path / cls.__name__ / str(mmap)), embedder=embedder, **kwargs)
+        worker = threading.Thread(target=retriever.add_documents, args=(["느리게 추가되는 리뷰"], [METAS[0]]))
+        worker.start()
+        assert embedder.started.wait(5)
+
+        t0 = time.perf_counter()
+        docs = retriever.get_relevant_documents("광주 민주화", k=3)
+        assert time.perf_counter() - t0 < 1.0
+        assert len(docs) == 3 and len(retriever) == len(TEXTS)
+
+        embedder.release.set()
+        worker.join(5)
+        assert len(retriever) == len(TEXTS) + 1
+        assert retriever.get_relevant_documents("느리게 추가되는 리뷰", k=1)[0].page_content == "느리게 추가되는 리뷰"
+
+
+def test_faiss_filter_selectors_are_built_once_per_filter(monkeypatch, make_faiss):
+    """Test that repeated filtered queries reuse one IDSelector until the index changes."""
+    import st_app.rag.retriever as retriever_module
+
+    built = []
+    original = retriever_module.id_selector
+    monkeypatch.setattr(retriever_module, "id_selector", lambda index, ids: built.append(len(ids)) or original(index, ids))
+
+    retriever = make_faiss(metadatas=FILTER_METAS)
+    site_selectors = len(built)
+    assert site_selectors == len({m["site"] for m in FILTER_METAS})
+
+    filters = {"sites": ["aladin"], "min_score": 5.0}
+    first = [d.page_content for d in retriever.get_relevant_documents("소설", k=3, filters=filters)]
+    for _ in range(3):
+        assert [d.page_content for d in retriever.get_relevant_documents("소설", k=3, filters=filters)] == first
+        retriever.get_relevant_documents("소설", k=3, filters={"sites": ["aladin"]})
+    assert len(built) == site_selectors + 1
+
+    built.clear()
+    retriever.add_documents(["알라딘 새 소설 리뷰"], [{"site": "aladin", "score": 9.0}])
+    assert "알라딘 새 소설 리뷰" in [d.page_content for d in retriever.get_relevant_documents("소설", k=5, filters=filters)]
+    assert len(built) == site_selectors + 1
+
+
+def test_sparse_searches_see_consistent_index_during_adds(capsys):
+    """Test that BM25/TF-IDF searches running alongside add_documents never read a half-swapped index."""
+    import threading
+
+    from st_app.rag.bm25 import BM25Retriever
+
+    for retriever in (BM25Retriever(TEXTS, METAS), TfIdfRetriever(TEXTS, METAS)):
+        errors = []
+        done = threading.Event()
+
+        def search():
+            while not done.is_set():
+                try:
+                    retriever.get_relevant_documents("광주 민주화 운동 소설", k=3)
+                    retriever.get_relevant_documents_batch(["소설", "새 리뷰"], k=2)
+                except Exception as e:  # pragma: no cover - 실패 시 원인 보고용
+                    errors.append(e)
+
+        readers = [threading.Thread(target=search) for _ in range(3)]
+        for reader in readers:
+            reader.start()
+        for i in range(30):
+            retriever.add_documents([f"새 리뷰 {i} 광주 소설 민주화 " * (i % 5 + 1)], [METAS[0]])
+        done.set()
+        for reader in readers:
+            reader.join(5)
+
+        assert errors == []
+        assert "검색 오류" not in capsys.readouterr().out
+        assert len(retriever) == len(TEXTS) + 30
@@ -0,0 +1,56 @@
+import sys
+import types
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+
+client = TestClient(app)
+
+
+@pytest.fixture
+def captured_state(monkeypatch):
+    """Replace the RAG node with a stub that records the state it receives."""
+    seen = {}
+
+    def rag_review_node(state):
+        seen.update(state)
+        return {"messages": [{"role": "assistant", "content": "ok"}], "citations": [], "last_route": "rag_review"}
+
+    module = types.ModuleType("nodes.rag_review_node")
+    module.rag_review_node = rag_review_node
+    monkeypatch.setitem(sys.modules, "nodes.rag_review_node", module)
+    return seen
+
+
+def test_rag_filters_are_validated_and_normalized(captured_state):
+    """Test that valid filters reach the node as a plain dict with ISO date strings."""
+    response = client.post(
+        "/review/rag",
+        json={"question": "추천", "filters": {"sites": ["aladin"], "min_score": "8", "date_from": "2024-01-01"}},
+    )
+    assert response.status_code == 200
+    assert captured_state["filters"] == {"sites": ["aladin"], "min_score": 8.0, "date_from": "2024-01-01"}
+
+
+@pytest.mark.parametrize(
+    "filters",
+    [
+        {"site": "aladin"},
+        {"min_score": "high"},
+        {"date_to": "yesterday"},
+        {"min_score": 9, "max_score": 2},
+    ],
+)
+def test_invalid_rag_filters_are_rejected(captured_state, filters):
+    """Test that unknown keys, bad types and inverted ranges return 422 without running the node."""
+    response = client.post("/review/rag", json={"question": "추천", "filters": filters})
+    assert response.status_code == 422
+    assert captured_state == {}
+
+
+def test_empty_filters_are_dropped(captured_state):
+    """Test that an empty filter object does not add a filters entry to the state."""
+    assert client.post("/review/rag", json={"question": "추천", "filters": {}}).status_code == 200
+    assert "filters" not in captured_state
@@ -0,0 +1,140 @@
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from st_app.rag import embedder as embedder_module
+from st_app.rag.embedder import SentenceTransformerEmbedder
+
+MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+
+class FakeSentenceTransformer:
+    """Deterministic stand-in for sentence_transformers.SentenceTransformer (no torch needed)."""
+
+    fail_backends = set()
+    instances = []
+
+    def __init__(self, name, backend="torch", model_kwargs=None):
+        if backend in self.fail_backends:
+            raise RuntimeError(f"{backend} runtime missing")
+        self.name = name
+        self.backend = backend
+        self.encoded = []
+        self.pool_inputs = []
+        self.pool_env = None
+        self.stopped = []
+        self.instances.append(self)
+
+    def get_sentence_embedding_dimension(self):
+        return 384
+
+    def _vectors(self, texts):
+        out = np.zeros((len(texts), 384), dtype="float32")
+        out[:, 0] = [len(t) for t in texts]
+        out[:, 1] = 1.0
+        return out
+
+    def encode(self, texts, batch_size=32, normalize_embeddings=False, convert_to_numpy=True):
+        self.encoded.append(list(texts))
+        return self._vectors(texts)
+
+    def start_multi_process_pool(self, target_devices=None):
+        self.pool_env = os.environ.get("OMP_NUM_THREADS")
+        return {"devices": list(target_devices)}
+
+    def encode_multi_process(self, texts, pool, batch_size=32):
+        self.pool_inputs.append(list(texts))
+        return self._vectors(texts)
+
+    def stop_multi_process_pool(self, pool):
+        self.stopped.append(pool)
+
+
+@pytest.fixture
+def fake_st(monkeypatch):
+    module = types.ModuleType("sentence_transformers")
+    module.SentenceTransformer = FakeSentenceTransformer
+    monkeypatch.setitem(sys.modules, "sentence_transformers", module)
+    monkeypatch.setattr(FakeSentenceTransformer, "fail_backends", set())
+    monkeypatch.setattr(FakeSentenceTransformer, "instances", [])
+    monkeypatch.setattr(embedder_module.atexit, "register", lambda fn: fn)
+    for name in ("EMBEDDING_MODEL", "EMBEDDING_BACKEND", "EMBEDDING_WORKERS", "EMBEDDING_BATCH_SIZE"):
+        monkeypatch.delenv(name, raising=False)
+    return FakeSentenceTransformer
+
+
+def test_onnx_load_failure_falls_back_to_torch(fake_st, tmp_path):
+    """Test that a failing ONNX backend falls back to torch and keeps the plain model id and cache."""
+    fake_st.fail_backends = {"onnx"}
+    embedder = SentenceTransformerEmbedder(MODEL, cache_dir=str(tmp_path), backend="onnx")
+    assert embedder.backend == "torch"
+    assert embedder.model == MODEL
+    assert embedder.cache.model_name == MODEL
+    assert embedder._model.backend == "torch"
+
+
+def test_onnx_backend_suffixes_model_id_and_cache(fake_st, tmp_path):
+    """Test that a non-torch backend is part of the model id so caches and indexes are not shared with torch."""
+    onnx = SentenceTransformerEmbedder(MODEL, cache_dir=str(tmp_path), backend="onnx")
+    torch = SentenceTransformerEmbedder(MODEL, cache_dir=str(tmp_path), backend="torch")
+    assert onnx.model == f"{MODEL}#onnx"
+    assert onnx.cache.model_name == f"{MODEL}#onnx"
+    assert onnx.cache.path != torch.cache.path
+    assert onnx.known_dimension == 384
+
+
+def test_unknown_backend_is_rejected(fake_st):
+    """Test that an unsupported backend name raises instead of silently using torch."""
+    with pytest.raises(ValueError, match="EMBEDDING_BACKEND"):
+        SentenceTransformerEmbedder(MODEL, backend="tensorrt")
+
+
+def test_large_inputs_use_pool_and_restore_order(fake_st, monkeypatch):
+    """Test that inputs of at least workers*batch_size go to the process pool sorted by length and come back in order."""
+    monkeypatch.delenv("OMP_NUM_THREADS", raising=False)
+    embedder = SentenceTransformerEmbedder(MODEL, workers=2, batch_size=2)
+    texts = ["a" * n for n in [3, 10, 1, 7, 5]]
+
+    out = embedder.encode(texts, use_cache=False)
+
+    model = embedder._model
+    np.testing.assert_array_equal(out[:, 0], [len(t) for t in texts])
+    assert [len(t) for t in model.pool_inputs[0]] == [10, 7, 5, 3, 1]
+    assert model.encoded == []
+    # 워커에는 스레드 제한을 넘기지만 부모 환경은 그대로
+    assert model.pool_env == str(max(1, (os.cpu_count() or 1) // 2))
+    assert "OMP_NUM_THREADS" not in os.environ
+
+
+def test_pool_keeps_user_thread_setting(fake_st, monkeypatch):
+    """Test that an OMP_NUM_THREADS set by the user is passed through unchanged."""
+    monkeypatch.setenv("OMP_NUM_THREADS", "3")
+    embedder = SentenceTransformerEmbedder(MODEL, workers=2, batch_size=1)
+    embedder.encode(["a", "bb"], use_cache=False)
+    assert embedder._model.pool_env == "3"
+    assert os.environ["OMP_NUM_THREADS"] == "3"
+
+
+def test_small_inputs_skip_pool(fake_st):
+    """Test that inputs below workers*batch_size are encoded in-process without starting a pool."""
+    embedder = SentenceTransformerEmbedder(MODEL, workers=2, batch_size=4)
+    embedder.encode(["a", "bb", "ccc"], use_cache=False)
+    assert embedder._pool is None
+    assert embedder._model.pool_inputs == []
+    assert len(embedder._model.encoded) == 1
+
+
+def test_close_stops_pool_once(fake_st):
+    """Test that close() stops the process pool and is safe to call again."""
+    embedder = SentenceTransformerEmbedder(MODEL, workers=2, batch_size=1)
+    embedder.encode(["a", "bb"], use_cache=False)
+    pool = embedder._pool
+    assert pool is not None
+
+    embedder.close()
+    embedder.close()
+    assert embedder._model.stopped == [pool]
+    assert embedder._pool is None
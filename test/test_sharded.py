@@ -0,0 +1,91 @@
+import threading
+
+import pytest
+
+from st_app.rag.bm25 import BM25Retriever
+from st_app.rag.cache import LRUCache
+from st_app.rag.retriever import FaissRetriever
+from st_app.rag.sharded import ShardedRetriever
+from test.conftest import TEXTS
+
+
+SITES = ["yes24", "aladin", "kyobo", "yes24", "aladin"]
+METAS = [{"site": s, "score": 8.0 + i, "date": "2024-01-0%d" % (i + 1)} for i, s in enumerate(SITES)]
+
+
+class RecordingShard:
+    def __init__(self, inner, site, seen):
+        self.inner, self.site, self.seen = inner, site, seen
+
+    def get_relevant_documents_batch(self, queries, **kwargs):
+        self.seen.append((self.site, threading.current_thread().name))
+        return self.inner.get_relevant_documents_batch(queries, **kwargs)
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+
+@pytest.fixture
+def sharded(fake_embedder):
+    cache = LRUCache(maxsize=16)
+    return ShardedRetriever(
+        TEXTS, METAS, factory=lambda store, site: FaissRetriever(store, embedder=fake_embedder, query_cache=cache)
+    )
+
+
+def test_sharded_search_matches_single_index(sharded, fake_embedder):
+    """Test that merging per-site top-k gives the same ranking as one index over all sites."""
+    single = FaissRetriever(TEXTS, METAS, embedder=fake_embedder)
+    assert sharded.sites == ["aladin", "kyobo", "yes24"]
+    assert len(sharded) == len(TEXTS)
+
+    for query in ["광주 민주화 운동", "배송 포장", "소설"]:
+        expected = single.get_relevant_documents(query, k=3)
+        merged = sharded.get_relevant_documents(query, k=3)
+        assert [d.review_id for d in merged] == [d.review_id for d in expected]
+        assert [d.score for d in merged] == pytest.approx([d.score for d in expected])
+
+
+def test_query_is_embedded_once_and_shards_run_in_the_pool(sharded, fake_embedder):
+    """Test that shards share one query embedding and are searched on pool threads."""
+    seen = []
+    for site, shard in sharded.shards.items():
+        sharded.set_shard(site, RecordingShard(shard, site, seen))
+    fake_embedder.calls.clear()
+
+    sharded.get_relevant_documents("광주 민주화 운동", k=2)
+
+    assert fake_embedder.calls == [["광주 민주화 운동"]]
+    assert sorted(site for site, _ in seen) == ["aladin", "kyobo", "yes24"]
+    assert all(name.startswith("rag-shard") for _, name in seen)
+
+
+def test_site_filter_only_searches_matching_shards():
+    """Test that filters.sites prunes shards and other conditions still apply inside a shard."""
+    seen = []
+    sharded = ShardedRetriever(
+        TEXTS, METAS, factory=lambda store, site: RecordingShard(BM25Retriever(store), site, seen)
+    )
+
+    docs = sharded.get_relevant_documents("광주 소년이 온다", k=5, filters={"sites": ["yes24"], "min_score": 11.0})
+
+    assert [site for site, _ in seen] == ["yes24"]
+    assert [d.page_content for d in docs] == [TEXTS[3]]
+
+
+def test_shards_are_updated_independently(sharded):
+    """Test that new sites become new shards and add/remove/rebuild bump the index version."""
+    yes24 = sharded.shards["yes24"]
+
+    [new_id] = sharded.add_documents(["리디북스에서 산 광주 민주화 운동 소설"], [{"site": "ridi"}])
+    assert sharded.sites == ["aladin", "kyobo", "ridi", "yes24"]
+    assert sharded.shards["yes24"] is yes24
+    assert sharded.get_relevant_documents("리디북스", k=1, filters={"sites": ["ridi"]})[0].review_id == new_id
+
+    assert sharded.remove_documents([new_id]) == 1
+    assert sharded.get_relevant_documents("리디북스", k=1, filters={"sites": ["ridi"]}) == []
+
+    version = sharded.index_version
+    rebuilt = sharded.rebuild_shard("yes24")
+    assert rebuilt is not yes24 and sharded.shards["yes24"] is rebuilt
+    assert sharded.index_version > version
@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import st_app.rag.retriever as retriever_module
+from st_app.rag.singleton import SingleFlight
+from st_app.rag.store import as_document_store
+from test.conftest import METAS, TEXTS
+
+
+def test_concurrent_callers_share_one_build():
+    """Test that callers arriving during a build wait for it instead of building again."""
+    flight = SingleFlight()
+    calls = []
+    started = threading.Event()
+
+    def factory():
+        calls.append(1)
+        started.set()
+        time.sleep(0.2)
+        return object()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        first = pool.submit(flight.get, factory)
+        started.wait()
+        assert flight.building
+        others = [pool.submit(flight.get, factory) for _ in range(7)]
+        results = [first.result()] + [f.result() for f in others]
+
+    assert len(calls) == 1
+    assert all(r is results[0] for r in results)
+    assert flight.peek() is results[0] and not flight.building
+
+
+def test_failed_build_is_shared_and_retried():
+    """Test that waiters see the builder's exception and the next call tries again."""
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def failing():
+        release.wait()
+        raise RuntimeError("boom")
+
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        futures = [pool.submit(flight.get, failing) for _ in range(4)]
+        while not flight.building:
+            time.sleep(0.01)
+        release.set()
+        for f in futures:
+            with pytest.raises(RuntimeError, match="boom"):
+                f.result()
+
+    assert flight.peek() is None
+    assert flight.get(lambda: "ok") == "ok"
+
+
+def test_get_bm25_retriever_builds_once_under_concurrency(monkeypatch):
+    """Test that parallel get_bm25_retriever calls load the corpus and build the index once."""
+    loads = []
+
+    def slow_load():
+        loads.append(1)
+        time.sleep(0.2)
+        return as_document_store(TEXTS, METAS)
+
+    monkeypatch.setattr(retriever_module, "load_store", slow_load)
+    monkeypatch.setattr(retriever_module, "_CACHED_BM25", SingleFlight())
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(lambda _: retriever_module.get_bm25_retriever(), range(8)))
+
+    assert len(loads) == 1
+    assert all(r is results[0] for r in results)
+    assert results[0] in retriever_module._loaded_retrievers()
@@ -0,0 +1,90 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from st_app.rag.store import DeltaLog, DocumentStore, RetrievedDocument, load_review_store
+
+
+@pytest.fixture
+def database_dir(tmp_path):
+    pd.DataFrame(
+        {
+            "text": ["정말 감동적인 소설이었습니다", "짧음", None, "  다시 읽고 싶은 책입니다.  "],
+            "date": ["2024-01-01", "2024-01-02", "2024-01-03", None],
+            "score": [10, 8, 6, None],
+            "tfidf_0": [0.1, 0.2, 0.3, 0.4],
+        }
+    ).to_csv(tmp_path / "preprocessed_reviews_yes24.csv", index=False)
+    pd.DataFrame({"cleaned_text": ["알라딘에서 구매한 리뷰 본문"], "score": [5]}).to_csv(
+        tmp_path / "preprocessed_reviews_aladin.csv", index=False
+    )
+    return str(tmp_path)
+
+
+def test_load_review_store_filters_and_builds_columns(database_dir):
+    """Test that the columnar loader filters short/empty texts and fills parallel arrays."""
+    store = load_review_store(database_dir)
+
+    assert store.texts == ["정말 감동적인 소설이었습니다", "다시 읽고 싶은 책입니다.", "알라딘에서 구매한 리뷰 본문"]
+    assert list(store.sites) == ["yes24", "yes24", "aladin"]
+    np.testing.assert_array_equal(store.scores, [10.0, 0.0, 5.0])
+    assert [store.date(i) for i in range(len(store))] == ["2024-01-01", "", ""]
+    assert store.metadata(0) == {"source": "yes24", "score": 10.0, "date": "2024-01-01", "site": "yes24"}
+
+
+def test_load_review_store_missing_directory(tmp_path):
+    """Test that a directory without CSVs yields an empty store."""
+    assert len(load_review_store(str(tmp_path))) == 0
+
+
+def test_document_store_is_compact():
+    """Test that texts share one buffer and sites are categorical codes."""
+    store = DocumentStore.from_columns(
+        texts=["첫 번째 리뷰", "두 번째", "세 번째 리뷰"],
+        sites=["yes24", "kyobo", "yes24"],
+        scores=[10, 8, 6],
+        dates=["2024-01-01", "", "2023-05-05"],
+    )
+
+    assert isinstance(store.text_buffer, bytes)
+    assert store.text_offsets.tolist()[0] == 0
+    assert store.text(1) == "두 번째"
+    assert store.site_codes.dtype == np.int8
+    assert store.site_names == ["kyobo", "yes24"]
+    assert store.scores.dtype == np.float32
+    assert store.dates.dtype == np.dtype("datetime64[D]")
+    assert store.subset([2, 0]).texts == ["세 번째 리뷰", "첫 번째 리뷰"]
+
+
+def test_retrieved_document_is_a_slotted_view():
+    """Test that retrieved documents read lazily from the store without a __dict__."""
+    store = DocumentStore.from_columns(["리뷰 본문입니다"], ["aladin"], [7.0], ["2024-02-03"])
+    doc = RetrievedDocument.from_store(store, 0, 0.25)
+
+    assert not hasattr(doc, "__dict__")
+    assert doc.page_content == "리뷰 본문입니다"
+    assert doc.metadata == {
+        "source": "aladin",
+        "score": 0.25,
+        "date": "2024-02-03",
+        "site": "aladin",
+        "rating": 7.0,
+    }
+    assert RetrievedDocument("직접 생성", {"source": "x"}, 0.5).metadata == {"source": "x"}
+
+
+def test_delta_log_replays_adds_and_removes(tmp_path):
+    """Test that logged deltas rebuild the same corpus on top of a fresh CSV load, idempotently."""
+    base = DocumentStore.from_columns(["기존 리뷰 하나", "기존 리뷰 둘"], ["yes24", "kyobo"], [9, 3], ["2024-01-01", ""])
+    log = DeltaLog(str(tmp_path / "deltas.jsonl"))
+
+    added = DocumentStore.from_records(["새 리뷰입니다"], [{"site": "aladin", "score": 7.0, "date": "2025-01-02"}])
+    log.record_add(added)
+    log.record_remove([int(base.review_ids[0])])
+
+    store = log.replay(base)
+    assert store.num_alive == 2
+    assert store.fingerprint() == log.replay(store).fingerprint()
+    assert store.positions_of(added.review_ids).tolist() == [2]
+    assert store.metadata(2) == {"source": "aladin", "score": 7.0, "date": "2025-01-02", "site": "aladin"}
+    assert store.filter_mask(None).tolist() == [False, True, True]
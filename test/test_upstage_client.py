@@ -0,0 +1,182 @@
+import json
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pytest
+
+from st_app.rag.embedder import UpstageEmbedder
+from st_app.rag.upstage_client import EmbeddingAPIError, UpstageEmbeddingClient
+
+
+def _vector(text):
+    return [float(len(text)), float(zlib.crc32(text.encode()) % 1000), 1.0]
+
+
+class StubUpstage:
+    """Local stand-in for the Upstage /v1/embeddings endpoint.
+
+    `failures` is a list of status codes returned (in order) before answering normally;
+    batches larger than `max_batch` get 413.
+    """
+
+    def __init__(self, failures=(), max_batch=None, delay=0.0):
+        self.failures = list(failures)
+        self.max_batch = max_batch
+        self.delay = delay
+        self.batches = []
+        self.ports = set()
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.lock = threading.Lock()
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                status, payload = stub.handle(body, self.client_address[1])
+                raw = json.dumps(payload).encode()
+                self.send_response(status)
+                if status == 429:
+                    self.send_header("Retry-After", "0")
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(raw)))
+                self.end_headers()
+                self.wfile.write(raw)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def handle(self, body, port):
+        texts = body["input"]
+        with self.lock:
+            self.ports.add(port)
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+            failure = self.failures.pop(0) if self.failures else None
+        try:
+            time.sleep(self.delay)
+            if failure is not None:
+                return failure, {"error": "stub failure"}
+            if self.max_batch is not None and len(texts) > self.max_batch:
+                return 413, {"error": "batch too large"}
+            with self.lock:
+                self.batches.append(len(texts))
+            # 순서를 섞어 보내도 index로 정렬되는지 확인
+            data = [{"index": i, "embedding": _vector(t)} for i, t in enumerate(texts)][::-1]
+            return 200, {"data": data}
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def stub_factory():
+    stubs = []
+
+    def make(**kwargs):
+        stubs.append(StubUpstage(**kwargs))
+        return stubs[-1]
+
+    yield make
+    for stub in stubs:
+        stub.close()
+
+
+def _client(stub, **kwargs):
+    kwargs.setdefault("backoff", 0.001)
+    return UpstageEmbeddingClient(api_key="test-key", model="stub-embedding", base_url=stub.url, **kwargs)
+
+
+TEXTS = [f"리뷰 {i} " + "가" * (i % 7) for i in range(40)]
+EXPECTED = np.array([_vector(t) for t in TEXTS], dtype="float32")
+
+
+def test_batches_run_concurrently_over_pooled_connections(stub_factory):
+    """Test that batches are sent in parallel, reuse keep-alive connections and come back in order."""
+    stub = stub_factory(delay=0.05)
+    client = _client(stub, concurrency=4, batch_size=4, max_batch_size=4)
+
+    out = client.embed(TEXTS)
+
+    np.testing.assert_array_equal(out, EXPECTED)
+    assert stub.batches == [4] * 10
+    assert stub.max_in_flight > 1
+    assert len(stub.ports) <= 4
+
+
+def test_rate_limits_and_server_errors_are_retried(stub_factory):
+    """Test that 429/5xx responses back off and retry instead of returning zero vectors."""
+    stub = stub_factory(failures=[429, 503, 500])
+    client = _client(stub, concurrency=1, batch_size=8)
+
+    out = client.embed(TEXTS)
+
+    np.testing.assert_array_equal(out, EXPECTED)
+    assert not np.any(np.all(out == 0, axis=1))
+
+
+def test_batch_size_adapts_to_server_limit(stub_factory):
+    """Test that oversized batches are split on 413 and later batches use the smaller size."""
+    stub = stub_factory(max_batch=5)
+    client = _client(stub, concurrency=2, batch_size=16)
+
+    out = client.embed(TEXTS)
+
+    np.testing.assert_array_equal(out, EXPECTED)
+    assert max(stub.batches) <= 5
+    assert client.batch_size <= 8
+
+
+def test_strict_mode_raises_instead_of_poisoning_the_cache(stub_factory, tmp_path, monkeypatch):
+    """Test that exhausted retries raise in strict mode and only zero-fill failed batches otherwise."""
+    stub = stub_factory(failures=[500] * 100)
+    with pytest.raises(EmbeddingAPIError):
+        _client(stub, max_retries=2).embed(TEXTS[:4])
+
+    stub.failures = [500] * 3
+    lenient = _client(stub, concurrency=1, batch_size=2, max_batch_size=2, max_retries=2, strict=False)
+    out = lenient.embed(TEXTS[:4])
+    np.testing.assert_array_equal(out[:2], 0)
+    np.testing.assert_array_equal(out[2:], EXPECTED[2:4])
+
+    monkeypatch.setenv("UPSTAGE_BASE_URL", stub.url)
+    monkeypatch.setenv("UPSTAGE_EMBED_RETRIES", "1")
+    monkeypatch.setenv("UPSTAGE_EMBED_STRICT", "0")
+    monkeypatch.setenv("UPSTAGE_EMBED_CONCURRENCY", "1")
+    monkeypatch.setenv("UPSTAGE_EMBED_BATCH", "1")
+    stub.failures = [500] * 2
+    stub.batches.clear()
+    embedder = UpstageEmbedder(api_key="test-key", model_name="stub-embedding", cache_dir=str(tmp_path))
+    first = embedder.encode(TEXTS[:2])
+    assert not np.any(first[0])
+    np.testing.assert_array_equal(first[1], EXPECTED[1])
+
+    # 영벡터는 캐시되지 않아 실패했던 텍스트만 다시 요청
+    np.testing.assert_array_equal(embedder.encode(TEXTS[:2]), EXPECTED[:2])
+    assert stub.batches == [1, 1]
+
+
+def test_known_model_dimension_needs_no_request(stub_factory, monkeypatch):
+    """Test that a registered model reports its dimension without calling the API and checks the first batch."""
+    stub = stub_factory()
+    monkeypatch.setenv("UPSTAGE_BASE_URL", stub.url)
+    embedder = UpstageEmbedder(api_key="test-key", model_name="solar-1-mini-embedding")
+    assert embedder.dimension == 4096
+    assert stub.batches == []
+
+    # 스텁은 3차원 벡터를 돌려주므로 첫 실제 배치에서 불일치로 실패
+    with pytest.raises(RuntimeError, match="차원 불일치"):
+        embedder.encode(TEXTS[:2], use_cache=False)
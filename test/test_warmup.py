@@ -0,0 +1,49 @@
+import threading
+
+from fastapi.testclient import TestClient
+
+import app.main as main_module
+from st_app.rag.warmup import WarmUp
+
+
+def test_warmup_runs_steps_in_background_and_reports_ready():
+    """Test that warm-up is not ready until every step ran and failures are recorded."""
+    release = threading.Event()
+    built = []
+
+    def slow():
+        release.wait()
+        built.append("retriever")
+
+    def failing():
+        raise RuntimeError("no key")
+
+    warmup = WarmUp([("retriever", slow), ("llm", failing)])
+    assert warmup.ready and not warmup.started
+
+    thread = warmup.start()
+    assert warmup.start() is thread
+    assert not warmup.ready
+
+    release.set()
+    assert warmup.wait(5)
+    status = warmup.status()
+    assert status["ready"] and built == ["retriever"]
+    assert status["finished"] == ["retriever"]
+    assert status["errors"] == {"llm": "no key"}
+
+
+def test_ready_endpoint_reflects_warmup_state(monkeypatch):
+    """Test that /ready answers 503 while warming up and 200 afterwards."""
+    release = threading.Event()
+    warmup = WarmUp([("retriever", release.wait)])
+    monkeypatch.setattr(main_module, "is_ready", lambda: warmup.ready)
+    monkeypatch.setattr(main_module, "warmup_status", warmup.status)
+    client = TestClient(main_module.app)
+
+    warmup.start()
+    assert client.get("/ready").status_code == 503
+    release.set()
+    warmup.wait(5)
+    response = client.get("/ready")
+    assert response.status_code == 200 and response.json()["finished"] == ["retriever"]